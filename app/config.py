@@ -2,7 +2,119 @@ import os
 
 # OpenAI API 키
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "your-api-key-here")  # 환경 변수에서 가져오거나 기본값 사용
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # OpenAI 호환 서버 주소 (벤치마크용 가짜 서버 등, 기본값은 공식 API)
 
 # Milvus 설정
 MILVUS_HOST = "localhost"  # Milvus 서버 호스트
-MILVUS_PORT = "19530"     # Milvus 서버 포트
\ No newline at end of file
+MILVUS_PORT = "19530"     # Milvus 서버 포트
+MILVUS_COLLECTION = os.getenv("MILVUS_COLLECTION", "faq_collection")  # FAQ 컬렉션 이름
+MILVUS_INDEX_TYPE = os.getenv("MILVUS_INDEX_TYPE", "IVF_FLAT")  # 벡터 인덱스: FLAT, IVF_FLAT, IVF_SQ8, IVF_PQ, HNSW
+MILVUS_INDEX_PARAMS = os.getenv("MILVUS_INDEX_PARAMS", "")  # 인덱스 생성 파라미터 JSON (비우면 인덱스 종류별 기본값, 예: {"M": 16, "efConstruction": 200})
+MILVUS_SEARCH_PARAMS = os.getenv("MILVUS_SEARCH_PARAMS", "")  # 검색 파라미터 JSON (비우면 인덱스 종류별 기본값, 예: {"ef": 64})
+
+# 벡터 검색 설정
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "milvus")  # 검색 백엔드: "milvus" 또는 "local" (프로세스 내 NumPy 인덱스)
+SEARCH_SCORE_THRESHOLD = float(os.getenv("SEARCH_SCORE_THRESHOLD", "0.3"))  # 이 점수 이하의 검색 결과는 제외
+SEARCH_NPROBE = int(os.getenv("SEARCH_NPROBE", "10"))  # IVF 검색 시 탐색할 클러스터 수
+SEARCH_HNSW_EF = int(os.getenv("SEARCH_HNSW_EF", "64"))  # HNSW 검색 시 후보 목록 크기 (top_k 이상)
+SEARCH_BATCH_WINDOW_MS = float(os.getenv("SEARCH_BATCH_WINDOW_MS", "2"))  # 동시 검색 요청을 모으는 시간(ms)
+SEARCH_MAX_BATCH_SIZE = int(os.getenv("SEARCH_MAX_BATCH_SIZE", "32"))  # 한 번에 검색할 최대 벡터 수
+
+# 어휘 색인(문자 n-gram BM25) 설정
+LEXICAL_ENABLED = os.getenv("LEXICAL_ENABLED", "true").lower() == "true"
+LEXICAL_NGRAM_SIZES = tuple(int(n) for n in os.getenv("LEXICAL_NGRAM_SIZES", "2,3").split(","))  # 문자 n-gram 크기
+LEXICAL_FAST_PATH_THRESHOLD = float(os.getenv("LEXICAL_FAST_PATH_THRESHOLD", "0.75"))  # 임베딩/벡터 검색을 생략할 최소 n-gram 자카드 유사도
+RRF_K = int(os.getenv("RRF_K", "60"))  # 어휘/벡터 검색 결과 융합(RRF) 상수
+SEARCH_TOP_K = int(os.getenv("SEARCH_TOP_K", "10"))  # 프롬프트에 넣을 유사 질문 수
+
+# 프롬프트 FAQ 맥락 구성 설정
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2500"))  # FAQ 맥락 전체 토큰 예산
+CONTEXT_MAX_ANSWER_TOKENS = int(os.getenv("CONTEXT_MAX_ANSWER_TOKENS", "600"))  # 답변 하나에 쓸 최대 토큰 (초과 시 관련 문장만 발췌)
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))  # 이 이상 겹치는 답변은 중복으로 제외
+CONTEXT_TOKENIZER_ENCODING = os.getenv("CONTEXT_TOKENIZER_ENCODING", "o200k_base")  # tiktoken 인코딩 (gpt-4o-mini)
+
+# 추측 실행 설정: 질문 정제와 동시에 원 질문으로 임베딩/검색을 미리 수행
+SPECULATIVE_RETRIEVAL_ENABLED = os.getenv("SPECULATIVE_RETRIEVAL_ENABLED", "false").lower() == "true"
+SPECULATION_OVERLAP_THRESHOLD = float(os.getenv("SPECULATION_OVERLAP_THRESHOLD", "0.6"))  # 추측 결과를 쓸 최소 top-k 겹침(자카드)
+STREAM_COALESCING_ENABLED = os.getenv("STREAM_COALESCING_ENABLED", "true").lower() == "true"  # 같은 질문/맥락의 동시 답변 요청을 LLM 스트림 하나로 합침
+
+# SSE 응답 설정
+SSE_COALESCE_INTERVAL_MS = float(os.getenv("SSE_COALESCE_INTERVAL_MS", "50"))  # LLM 토큰을 모아 한 이벤트로 보내는 최대 대기 시간(ms, 0이면 토큰마다 전송)
+SSE_COALESCE_MAX_BYTES = int(os.getenv("SSE_COALESCE_MAX_BYTES", "256"))  # 모은 토큰이 이 바이트 수를 넘으면 바로 전송
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))  # 이벤트가 없을 때 keep-alive 주석을 보내는 간격(초, 0이면 보내지 않음)
+
+# 로컬 벡터 인덱스 설정 (VECTOR_BACKEND=local)
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "local_index")  # 스냅샷 저장 디렉터리 (워커 간 mmap 공유)
+LOCAL_INDEX_RELOAD_INTERVAL_SECONDS = float(os.getenv("LOCAL_INDEX_RELOAD_INTERVAL_SECONDS", "30"))  # 스냅샷 변경 확인 주기
+LOCAL_INDEX_KEEP_GENERATIONS = max(2, int(os.getenv("LOCAL_INDEX_KEEP_GENERATIONS", "2")))  # 디스크에 남길 스냅샷 세대 수 (현재 + 이전, 다른 워커가 아직 읽는 중일 수 있음)
+
+# Redis 설정
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")  # Redis 서버 호스트
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))  # Redis 서버 포트
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))  # 워커당 Redis 커넥션 풀 크기
+
+# 세션(대화 맥락) 저장 설정
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(24 * 3600)))  # 마지막 접근 후 세션 유지 시간(초)
+SESSION_RESPONSE_MODE = os.getenv("SESSION_RESPONSE_MODE", "digest")  # 답변 저장 방식: "full", "summary" (앞부분만), "digest" (해시만), "none"
+SESSION_RESPONSE_SUMMARY_CHARS = int(os.getenv("SESSION_RESPONSE_SUMMARY_CHARS", "200"))  # summary 모드에서 저장할 최대 글자 수
+SESSION_LOCAL_CACHE_SIZE = int(os.getenv("SESSION_LOCAL_CACHE_SIZE", "1000"))  # 워커별로 캐시할 세션 수 (0이면 사용 안 함)
+SESSION_LOCAL_CACHE_TTL_SECONDS = float(os.getenv("SESSION_LOCAL_CACHE_TTL_SECONDS", "30"))  # 워커별 세션 캐시 유효 시간(초)
+
+# 임베딩 설정
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))  # 임베딩 차원 수 (text-embedding-3 모델은 dimensions 옵션으로 줄일 수 있음, 예: 512)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))  # 임베딩 API 요청 1회당 텍스트 수
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))  # 동시에 보낼 임베딩 API 요청 수
+
+# OpenAI 호출 스케줄러 설정 (워커 프로세스 단위)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))  # 전체 동시 OpenAI 호출 수
+LLM_CONCURRENCY_LIMITS = os.getenv("LLM_CONCURRENCY_LIMITS", "answer=32,refine=32,embedding=16,keywords=4")  # 호출 종류별 동시 호출 수
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))  # 분당 토큰 예산 (0이면 제한 없음, 조직 한도 / 워커 수로 설정)
+LLM_MAX_QUEUE_DEPTH = int(os.getenv("LLM_MAX_QUEUE_DEPTH", "100"))  # 사용자 요청 대기가 이 수 이상이면 새 /chat 요청을 503으로 거절
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30"))  # 호출 슬롯을 기다리는 최대 시간(초)
+LLM_RETRY_ATTEMPTS = int(os.getenv("LLM_RETRY_ATTEMPTS", "4"))  # 429/5xx/연결 오류 시 최대 시도 횟수
+LLM_RETRY_MAX_WAIT_SECONDS = float(os.getenv("LLM_RETRY_MAX_WAIT_SECONDS", "8"))  # 재시도 간 최대 대기 시간(초, 지수 백오프 + 지터)
+LLM_ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("LLM_ADMISSION_RETRY_AFTER_SECONDS", "2"))  # 거절 시 Retry-After 값(초)
+
+# 데이터 적재 설정
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "512"))  # 존재 확인/삽입을 묶어서 처리할 행 수
+FAQ_DATA_FILE = os.getenv("FAQ_DATA_FILE", "final_result.pkl")  # 적재/동기화할 FAQ 파일 (.pkl 또는 .parquet)
+FAQ_CORPUS_FILE = os.getenv("FAQ_CORPUS_FILE", "faq_corpus.parquet")  # 임베딩이 포함된 코퍼스 (있으면 최초 적재 시 API 호출 없이 사용)
+FAQ_SYNC_INTERVAL_SECONDS = float(os.getenv("FAQ_SYNC_INTERVAL_SECONDS", "0"))  # FAQ 파일 변경 확인 주기 (0이면 주기 동기화 안 함)
+FAQ_SYNC_LOCK_TTL_SECONDS = int(os.getenv("FAQ_SYNC_LOCK_TTL_SECONDS", "600"))  # 워커 간 동기화 잠금 유지 시간
+FAQ_INITIAL_LOAD_POLL_SECONDS = float(os.getenv("FAQ_INITIAL_LOAD_POLL_SECONDS", "1"))  # 다른 워커의 초기 적재 완료 확인 주기
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # 관리자 API 토큰 (비어 있으면 관리자 API 비활성화)
+
+# 임베딩 캐시 설정
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))  # 프로세스 내 LRU 최대 항목 수
+EMBEDDING_CACHE_REDIS_ENABLED = os.getenv("EMBEDDING_CACHE_REDIS_ENABLED", "true").lower() == "true"  # Redis 공유 캐시 사용 여부
+EMBEDDING_CACHE_TTL_SECONDS = int(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))  # Redis 캐시 유효 시간(초)
+
+# 시맨틱 응답 캐시 설정
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))  # 캐시 적중으로 볼 최소 코사인 유사도
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))  # 캐시 항목 유효 시간(초)
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))  # 최대 캐시 항목 수 (초과 시 LRU 제거)
+
+# 분석 작업(키워드 추출, 보강 필요 질문 기록) 백그라운드 처리 설정
+ANALYTICS_WORKER_ENABLED = os.getenv("ANALYTICS_WORKER_ENABLED", "true").lower() == "true"
+ANALYTICS_QUEUE_SIZE = int(os.getenv("ANALYTICS_QUEUE_SIZE", "1000"))  # 대기열 최대 크기 (초과 시 버림)
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "20"))  # 키워드 추출 프롬프트 1회당 질문 수
+ANALYTICS_FLUSH_INTERVAL_SECONDS = float(os.getenv("ANALYTICS_FLUSH_INTERVAL_SECONDS", "2.0"))  # 배치를 모으는 최대 대기 시간
+ANALYTICS_LAG_WARN_SECONDS = float(os.getenv("ANALYTICS_LAG_WARN_SECONDS", "30"))  # 이 시간 이상 지연되면 지연 항목으로 집계
+ANALYTICS_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("ANALYTICS_SHUTDOWN_TIMEOUT_SECONDS", "10"))  # 종료 시 대기열 처리 최대 시간
+
+# 보강 필요 질문 군집 설정
+GAP_CLUSTER_SIMILARITY_THRESHOLD = float(os.getenv("GAP_CLUSTER_SIMILARITY_THRESHOLD", "0.9"))  # 같은 군집으로 합칠 최소 코사인 유사도
+GAP_CLUSTER_MAX = int(os.getenv("GAP_CLUSTER_MAX", "500"))  # 최대 군집 수 (초과 시 건수가 적고 오래된 군집부터 제거)
+GAP_CLUSTER_SAMPLE_SIZE = int(os.getenv("GAP_CLUSTER_SAMPLE_SIZE", "5"))  # 군집별로 보관할 예시 질문 수
+
+# 키워드 통계 설정
+KEYWORD_HOURLY_RETENTION_HOURS = int(os.getenv("KEYWORD_HOURLY_RETENTION_HOURS", str(14 * 24)))  # 시간 단위 구간 보관 기간(시간)
+KEYWORD_DAILY_RETENTION_DAYS = int(os.getenv("KEYWORD_DAILY_RETENTION_DAYS", "400"))  # 일 단위 구간 보관 기간(일)
+KEYWORD_BUCKET_MAX_MEMBERS = int(os.getenv("KEYWORD_BUCKET_MAX_MEMBERS", "0"))  # 구간당 최대 키워드 수 (0이면 제한 없음, 초과 시 근사 상위 키워드만 유지)
+
+# 관측(지표/로그) 설정
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # 로그 레벨 (DEBUG로 두면 스트리밍 토큰을 샘플링해 기록)
+LOG_STREAM_SAMPLE_RATE = int(os.getenv("LOG_STREAM_SAMPLE_RATE", "50"))  # 스트리밍 메시지 N개마다 하나만 DEBUG 로그로 기록
+SSE_STAGE_TIMINGS_ENABLED = os.getenv("SSE_STAGE_TIMINGS_ENABLED", "false").lower() == "true"  # 응답 끝에 단계별 처리 시간 이벤트 전송
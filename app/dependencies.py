@@ -0,0 +1,28 @@
+from fastapi import HTTPException, Request
+from app.services.faq_services import FAQService
+
+def get_faq_service(request: Request) -> FAQService:
+    """
+    앱 lifespan에서 만든 FAQService 인스턴스를 반환합니다.
+    """
+    return request.app.state.faq_service
+
+def get_ready_faq_service(request: Request) -> FAQService:
+    """
+    준비가 끝난 FAQService를 반환합니다. 아직 초기화 중이면 503을 반환합니다.
+    """
+    faq_service = get_faq_service(request)
+    if not faq_service.ready:
+        raise HTTPException(status_code=503, detail="서비스를 준비 중입니다.", headers={"Retry-After": "5"})
+    return faq_service
+
+def get_admitted_faq_service(request: Request) -> FAQService:
+    """
+    새 답변 요청을 받을 여유가 있는 FAQService를 반환합니다.
+    OpenAI 호출 대기열이 깊거나 토큰 예산이 바닥났으면 스트리밍을 시작하기 전에 503을 반환합니다.
+    """
+    faq_service = get_ready_faq_service(request)
+    retry_after = faq_service.openai_repo.scheduler.admission_retry_after()
+    if retry_after is not None:
+        raise HTTPException(status_code=503, detail="요청이 많아 잠시 후 다시 시도해주세요.", headers={"Retry-After": str(retry_after)})
+    return faq_service
@@ -1,35 +1,101 @@
+import time
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+
+API_BASE_URL = "http://localhost:8000"
+RENDER_INTERVAL_SECONDS = 0.1  # 답변 조각은 이 간격으로 모아서 다시 그림 (조각마다 마크다운 전체를 다시 그리지 않음)
 
 # Streamlit 앱 제목
 st.set_page_config(page_title="Naver Store Chatbot", layout="centered")
 st.title("💬 Naver Store Chatbot")
 
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """
+    모든 사용자가 함께 쓰는 HTTP 세션. (요청마다 새 연결을 맺지 않도록 커넥션 풀을 재사용)
+    """
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+    return session
+
+# 브라우저 세션(사용자)마다 대화 세션 ID와 대화 기록을 따로 유지
+if "session_id" not in st.session_state:
+    st.session_state.session_id = ""  # 첫 응답의 session 이벤트로 서버가 발급
+if "messages" not in st.session_state:
+    st.session_state.messages = []
+
 # SSE 응답을 처리하는 제너레이터
 def sse_stream(question: str):
     """
-    SSE(Server-Sent Events) 응답을 처리하는 제너레이터.
+    SSE(Server-Sent Events) 응답을 (이벤트 이름, 데이터) 단위로 돌려주는 제너레이터.
+    빈 줄까지를 이벤트 하나로 보고, 여러 data: 줄은 개행으로 이어 붙입니다. (: 로 시작하는 keep-alive 주석은 무시)
     """
-    try:
-        with requests.get(f"http://localhost:8000/chat?session_id=test_session&question={question}", stream=True) as response:
-            for line in response.iter_lines():
-                if line:
-                    message = line.decode("utf-8").replace("data: ", "")
-                    if message == "[END]":
-                        break
-                    yield message  # 실시간으로 메시지를 스트리밍
-    except Exception as e:
-        yield f"Error: {e}"
+    body = {"question": question, "session_id": st.session_state.session_id}
+    with get_http_session().post(f"{API_BASE_URL}/chat/", json=body, stream=True, timeout=(5, 120)) as response:
+        if response.status_code == 503:
+            yield "error", f"요청이 많아 잠시 후 다시 시도해주세요. ({response.headers.get('Retry-After', '?')}초 후)"
+            return
+        response.raise_for_status()
+        event, data = "message", []
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                if line.startswith(":"):
+                    continue
+                field, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if field == "event":
+                    event = value
+                elif field == "data":
+                    data.append(value)
+                continue
+            if data:
+                yield event, "\n".join(data)
+            event, data = "message", []
+
+def render(placeholder, header: list, answer: str):
+    text = "  \n".join(header)
+    placeholder.markdown(f"{text}\n\n{answer}" if answer else text)
+
+# 이전 대화 출력
+for message in st.session_state.messages:
+    with st.chat_message(message["role"]):
+        st.markdown(message["content"])
 
 # 사용자 입력 처리
 if prompt := st.chat_input("Ask me anything about Smart Store..."):
     # 사용자 메시지 출력
+    st.session_state.messages.append({"role": "user", "content": prompt})
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # 봇의 응답을 실시간으로 출력
+    # 봇의 응답을 하나의 영역에 이어 붙여 출력 (이벤트마다 새 마크다운 블록을 만들지 않음)
     with st.chat_message("bot"):
-        for message in sse_stream(prompt):
-            # 개행 문자를 HTML <br> 태그로 변환
-            formatted_message = message.replace("\n", "<br>")
-            st.markdown(formatted_message, unsafe_allow_html=True)
\ No newline at end of file
+        placeholder = st.empty()
+        header, answer_parts, in_answer = [], [], False
+        rendered_at = 0.0
+        try:
+            for event, data in sse_stream(prompt):
+                if event == "session":
+                    st.session_state.session_id = data
+                    continue
+                if event == "end":
+                    break
+                if event == "error":
+                    header.append(f"⚠️ {data}")
+                elif event != "message":  # timings 등
+                    continue
+                elif in_answer:
+                    answer_parts.append(data)
+                    if time.monotonic() - rendered_at < RENDER_INTERVAL_SECONDS:
+                        continue
+                elif data == "---":  # 정제된 질문/유사 질문 다음부터 답변
+                    in_answer = True
+                else:
+                    header.append(data)
+                render(placeholder, header, "".join(answer_parts))
+                rendered_at = time.monotonic()
+        except requests.RequestException as e:
+            header.append(f"Error: {e}")
+        render(placeholder, header, "".join(answer_parts))  # 마지막으로 모인 조각까지 반영
+    st.session_state.messages.append({"role": "bot", "content": "  \n".join(header) + "\n\n" + "".join(answer_parts)})
@@ -1,24 +1,35 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from app.routers.chat_router import chat_router
+import asyncio
+import logging
+from app.config import LOG_LEVEL
 from app.services.faq_services import FAQService
+from app.routers.chat_router import chat_router
+from app.routers.admin_router import admin_router
+from app.routers.health_router import health_router
+from app.routers.metrics_router import metrics_router
 
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logging.getLogger("httpx").setLevel(logging.WARNING)  # OpenAI 요청마다 남는 INFO 로그 억제
 
-# FAQService 인스턴스 생성
-faq_service = FAQService()
 
-# Milvus 초기화 및 데이터 로딩
+# 서비스 생성 및 백그라운드 초기화
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     FastAPI lifespan 이벤트를 처리하는 함수.
+    워커당 하나의 FAQService를 만들어 app.state에 두고, 초기화(컬렉션 로드, 색인 생성)는 백그라운드로 진행합니다.
+    초기화가 끝날 때까지 /readyz 는 503을 반환합니다.
     """
-    if faq_service.is_initialized():  # Milvus 컬렉션이 비어 있는지 확인
-        print("✅ Milvus 컬렉션이 이미 초기화되어 있습니다. 데이터를 로드하지 않습니다.")
-    else:
-        await faq_service.load_and_store_pkl()
+    faq_service = getattr(app.state, "faq_service", None) or FAQService()  # 미리 주입된 서비스가 있으면 사용
+    app.state.faq_service = faq_service
+    startup_task = asyncio.create_task(faq_service.startup())
     yield  # FastAPI가 lifespan 이벤트를 처리할 수 있도록 함
-    
+
+    if not startup_task.done():
+        startup_task.cancel()
+    await asyncio.gather(startup_task, return_exceptions=True)
+    await faq_service.shutdown()  # 워커, Redis, 벡터 저장소, OpenAI 연결 정리
     print("🛑 Lifespan 종료: 리소스 정리 완료")
 
 # FastAPI 애플리케이션 생성
@@ -26,4 +37,6 @@ app = FastAPI(lifespan=lifespan)
 
 # 라우터 등록
 app.include_router(chat_router, prefix="/chat", tags=["Chat"])
-
+app.include_router(admin_router, prefix="/admin", tags=["Admin"])
+app.include_router(health_router, tags=["Health"])
+app.include_router(metrics_router, tags=["Metrics"])
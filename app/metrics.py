@@ -0,0 +1,181 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+import threading
+import time
+
+# 단계별 지연 시간 히스토그램 버킷(초)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 프롬프트 토큰 수 히스토그램 버킷
+TOKEN_BUCKETS = (0, 50, 100, 250, 500, 1000, 1500, 2000, 3000, 4000, 8000)
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: Dict[str, str] = None) -> str:
+    pairs = list(zip(labelnames, labelvalues)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class Counter:
+    """
+    단조 증가 카운터 (Prometheus counter)
+    """
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        key = tuple(str(value) for value in labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+class Histogram:
+    """
+    누적 버킷 히스토그램 (Prometheus histogram)
+    """
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], List] = {}  # 라벨 -> [버킷별 개수..., 합계, 개수]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        key = tuple(str(v) for v in labelvalues)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, {'le': repr(bound)})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, {'le': '+Inf'})} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+class Registry:
+    """
+    지표 모음. render()는 Prometheus 텍스트 형식(0.0.4)을 반환합니다.
+    """
+
+    def __init__(self):
+        self.metrics: List = []
+        self.collectors: List[Callable[[], Iterable[Tuple[str, str, str, float]]]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, float]]]):
+        """
+        스크랩 시점에 값을 계산하는 게이지 수집기를 등록합니다.
+        :param collector: (이름, 타입, 설명, 값) 튜플을 반환하는 함수
+        """
+        self.collectors.append(collector)
+
+    def unregister_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, float]]]):
+        if collector in self.collectors:
+            self.collectors.remove(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.collect())
+        for collector in self.collectors:
+            for name, type_name, documentation, value in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {type_name}")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "chat_stage_duration_seconds", "Latency of each answer_question stage", ("stage",)
+))
+OPENAI_REQUESTS = REGISTRY.register(Counter(
+    "openai_requests_total", "OpenAI API requests", ("call",)
+))
+OPENAI_TOKENS = REGISTRY.register(Counter(
+    "openai_tokens_total", "OpenAI tokens reported in usage", ("call", "kind")
+))
+OPENAI_ERRORS = REGISTRY.register(Counter(
+    "openai_errors_total", "OpenAI API errors", ("call", "error")
+))
+PROMPT_CONTEXT_TOKENS = REGISTRY.register(Histogram(
+    "chat_prompt_context_tokens", "FAQ context tokens per answer request", ("kind",), buckets=TOKEN_BUCKETS
+))
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_LATENCY.observe(seconds, stage)
+
+@contextmanager
+def measure_stage(stage: str):
+    """
+    with 블록의 실행 시간을 단계 히스토그램에 기록합니다.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+def observe_prompt_context(stats: Dict):
+    """
+    요청별 FAQ 맥락 토큰 수(줄이기 전/후, 절약분)를 히스토그램에 기록합니다.
+    :param stats: ContextBuilder.build()가 반환한 요청별 통계
+    """
+    PROMPT_CONTEXT_TOKENS.observe(stats["original_tokens"], "original")
+    PROMPT_CONTEXT_TOKENS.observe(stats["context_tokens"], "prompt")
+    PROMPT_CONTEXT_TOKENS.observe(stats["saved_tokens"], "saved")
+
+@contextmanager
+def track_openai_call(call: str):
+    """
+    OpenAI 호출 수와 오류 수를 기록합니다. (오류는 그대로 다시 발생)
+    :param call: 호출 종류 (embedding, refine, answer, keywords)
+    """
+    OPENAI_REQUESTS.inc(call)
+    try:
+        yield
+    except Exception as e:
+        OPENAI_ERRORS.inc(call, type(e).__name__)
+        raise
+
+def record_openai_usage(call: str, usage):
+    """
+    OpenAI 응답의 usage를 토큰 카운터에 반영합니다.
+    """
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    OPENAI_TOKENS.inc(call, "prompt", amount=prompt_tokens)
+    if completion_tokens:
+        OPENAI_TOKENS.inc(call, "completion", amount=completion_tokens)
@@ -1,74 +1,269 @@
 from typing import Dict, List
-import redis
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError, WatchError
+from cachetools import TTLCache
+import asyncio
+import hashlib
 import json
+import struct
+import uuid
+from app.config import (
+    REDIS_HOST,
+    REDIS_PORT,
+    REDIS_MAX_CONNECTIONS,
+    SESSION_TTL_SECONDS,
+    SESSION_RESPONSE_MODE,
+    SESSION_RESPONSE_SUMMARY_CHARS,
+    SESSION_LOCAL_CACHE_SIZE,
+    SESSION_LOCAL_CACHE_TTL_SECONDS,
+)
+
+# 대화 한 턴의 바이너리 형식: 헤더(형식 버전, 답변 저장 방식, 질문 바이트 수) + 질문(UTF-8) + 답변(방식에 따라 원문/앞부분/해시/없음)
+MESSAGE_HEADER = struct.Struct(">BBH")
+MESSAGE_FORMAT_VERSION = 1
+RESPONSE_MODES = {"none": 0, "digest": 1, "summary": 2, "full": 3}
+MIGRATE_ATTEMPTS = 5  # 세션 이전 중 다른 워커의 저장과 겹칠 때 키당 재시도 횟수
+
+def encode_message(question: str, response: str, mode: str = SESSION_RESPONSE_MODE) -> bytes:
+    """
+    대화 한 턴을 바이너리로 인코딩합니다.
+    :param question: 사용자 질문
+    :param response: 봇 응답
+    :param mode: 답변 저장 방식 ("full", "summary", "digest", "none")
+    """
+    question_bytes = question.encode("utf-8")[:0xFFFF]
+    if mode == "full":
+        payload = response.encode("utf-8")
+    elif mode == "summary":
+        payload = response[:SESSION_RESPONSE_SUMMARY_CHARS].encode("utf-8")
+    elif mode == "digest":
+        payload = hashlib.sha256(response.encode("utf-8")).digest()[:8]
+    else:
+        payload = b""
+    return MESSAGE_HEADER.pack(MESSAGE_FORMAT_VERSION, RESPONSE_MODES[mode], len(question_bytes)) + question_bytes + payload
+
+def decode_message(raw: bytes) -> Dict:
+    """
+    대화 한 턴을 디코딩합니다. 이전 형식(JSON 문자열)도 읽을 수 있습니다.
+    :return: {"question", "response"} (digest 모드는 답변 해시의 hex 문자열, none 모드는 빈 문자열)
+    """
+    if raw[:1] == b"{":
+        message = json.loads(raw)
+        return {"question": message["question"], "response": message.get("response", "")}
+    _, mode, question_length = MESSAGE_HEADER.unpack_from(raw)
+    body = raw[MESSAGE_HEADER.size:]
+    question = body[:question_length].decode("utf-8", errors="ignore")
+    payload = body[question_length:]
+    if mode == RESPONSE_MODES["digest"]:
+        response = payload.hex()
+    else:
+        response = payload.decode("utf-8", errors="ignore")
+    return {"question": question, "response": response}
 
 class ContextRepository:
+    """
+    세션별 최근 대화를 Redis list에 바이너리로 저장합니다.
+    세션 키는 접근할 때마다 TTL이 갱신되며, 맥락에는 질문만 쓰이므로 답변은 설정에 따라 해시나 앞부분만 저장합니다.
+    자주 쓰이는 세션은 워커별 TTL 캐시에 질문 목록과 세션 버전(저장할 때마다 INCR)을 함께 두고,
+    읽을 때 Redis의 버전과 같을 때만 캐시를 씁니다. (다른 워커가 저장한 턴이 빠지지 않음)
+    버전 확인과 TTL 갱신은 한 번의 파이프라인으로 보내므로, 캐시는 목록 전송과 디코딩을 줄여 줍니다.
+    """
     # 슬라이딩 윈도우 크기 설정
     WINDOW_SIZE = 3
+    KEY_PREFIX = "context"
+    VERSION_PREFIX = "context_version"  # context:* 스캔(migrate_sessions)에 섞이지 않도록 다른 접두사 사용
+
+    def __init__(
+        self,
+        redis_host=REDIS_HOST,
+        redis_port=REDIS_PORT,
+        db=0,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        ttl_seconds: int = SESSION_TTL_SECONDS,
+        response_mode: str = SESSION_RESPONSE_MODE,
+        cache_size: int = SESSION_LOCAL_CACHE_SIZE,
+        cache_ttl_seconds: float = SESSION_LOCAL_CACHE_TTL_SECONDS,
+    ):
+        if response_mode not in RESPONSE_MODES:
+            raise ValueError(f"지원하지 않는 SESSION_RESPONSE_MODE 입니다: {response_mode}")
+        # 이벤트 루프를 막지 않도록 커넥션 풀 기반 asyncio Redis 클라이언트 초기화 (바이너리 값을 다루므로 decode_responses 끔)
+        self.pool = aioredis.ConnectionPool(
+            host=redis_host, port=redis_port, db=db, max_connections=max_connections
+        )
+        self.client = aioredis.Redis(connection_pool=self.pool)
+        self.ttl_seconds = ttl_seconds
+        self.response_mode = response_mode
+        # 세션 ID -> (세션 버전, 최근 질문 목록)
+        self.local = TTLCache(maxsize=cache_size, ttl=cache_ttl_seconds) if cache_size > 0 else None
+        self.local_hits = 0
+        self.redis_reads = 0
 
-    def __init__(self, redis_host="localhost", redis_port=6379, db=0):
-        # Redis 클라이언트 초기화
-        self.client = redis.StrictRedis(host=redis_host, port=redis_port, db=db, decode_responses=True)
+    def _key(self, session_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{session_id}"
 
-    def create_session(self) -> str:
+    def _version_key(self, session_id: str) -> str:
+        return f"{self.VERSION_PREFIX}:{session_id}"
+
+    async def ping(self) -> bool:
+        """
+        Redis 연결을 확인합니다. (시작 시 커넥션을 미리 열어 첫 요청의 연결 지연을 없앰)
+        :return: 연결 성공 여부
         """
-        새로운 세션 ID를 생성합니다.
+        try:
+            return await self.client.ping()
+        except RedisError as e:
+            print(f"⚠️ Redis 연결 실패: {e}")
+            return False
+
+    async def close(self):
+        """
+        Redis 커넥션 풀을 정리합니다.
+        """
+        await self.client.aclose()
+        await self.pool.disconnect()
+
+    async def create_session(self) -> str:
+        """
+        새로운 세션 ID를 생성합니다. (Redis 카운터 없이 만들어 왕복과 회수되지 않는 키를 없앰)
         :return: 생성된 세션 ID
         """
-        session_id = self.client.incr("session_id_counter")
-        return f"session_{session_id}"
+        return f"session_{uuid.uuid4().hex}"
 
-    def get_context(self, session_id: str) -> str:
+    async def _get_questions(self, session_id: str) -> List[str]:
+        """
+        세션의 최근 질문 목록을 가져옵니다. 캐시 여부와 관계없이 세션 키의 TTL을 갱신합니다.
+        로컬 캐시가 있으면 버전 확인과 EXPIRE만 보내고, 버전이 다르거나 캐시가 없으면 LRANGE까지 한 번에 보냅니다.
+        """
+        context_key, version_key = self._key(session_id), self._version_key(session_id)
+        cached = self.local.get(session_id) if self.local is not None else None
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.get(version_key)
+            pipe.expire(context_key, self.ttl_seconds)
+            pipe.expire(version_key, self.ttl_seconds)
+            if cached is None:
+                pipe.lrange(context_key, -self.WINDOW_SIZE, -1)
+            results = await pipe.execute()
+        version = int(results[0] or 0)
+        if cached is not None:
+            if cached[0] == version:
+                self.local_hits += 1
+                return cached[1]
+            # 다른 워커가 그사이 저장함: 목록을 다시 읽음
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.get(version_key)
+                pipe.lrange(context_key, -self.WINDOW_SIZE, -1)
+                raw_version, messages = await pipe.execute()
+            version = int(raw_version or 0)
+        else:
+            messages = results[3]
+        self.redis_reads += 1
+        questions = [decode_message(message)["question"] for message in messages]
+        if self.local is not None:
+            self.local[session_id] = (version, questions)
+        return questions
+
+    async def get_context(self, session_id: str) -> str:
         """
         세션 ID를 기반으로 이전 대화 맥락을 가져옵니다.
         :param session_id: 사용자 세션 ID
         :return: 이전 대화 맥락 (문자열)
         """
-        context_key = f"context:{session_id}"
-        messages = self.client.lrange(context_key, 0, -1)
-        return "\n".join([json.loads(msg)["question"] for msg in messages])
+        return "\n".join(await self._get_questions(session_id))
 
-    def save_user_message(self, session_id: str, question: str, response: str):
+    async def save_user_message(self, session_id: str, question: str, response: str):
         """
         사용자 질문과 봇 응답을 세션 데이터에 저장합니다.
+        RPUSH, LTRIM, EXPIRE와 세션 버전 INCR을 MULTI 트랜잭션 한 번으로 처리합니다.
         :param session_id: 사용자 세션 ID
         :param question: 사용자가 입력한 질문
         :param response: 봇의 응답
         """
-        context_key = f"context:{session_id}"
-        message = {"question": question, "response": response}
-        self.client.rpush(context_key, json.dumps(message))
-
-        # 슬라이딩 윈도우 방식으로 최대 WINDOW_SIZE개의 대화만 유지
-        if self.client.llen(context_key) > self.WINDOW_SIZE:
-            self.client.ltrim(context_key, -self.WINDOW_SIZE, -1)
+        context_key, version_key = self._key(session_id), self._version_key(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.rpush(context_key, encode_message(question, response, self.response_mode))
+            # 슬라이딩 윈도우 방식으로 최대 WINDOW_SIZE개의 대화만 유지
+            pipe.ltrim(context_key, -self.WINDOW_SIZE, -1)
+            pipe.expire(context_key, self.ttl_seconds)
+            pipe.incr(version_key)
+            pipe.expire(version_key, self.ttl_seconds)
+            results = await pipe.execute()
+        if self.local is not None:
+            version = results[3]
+            cached = self.local.get(session_id)
+            if cached is not None and cached[0] == version - 1:
+                # 캐시 이후 이 저장만 있었으면 캐시를 이어서 갱신, 아니면 다음 읽기에서 다시 읽음
+                self.local[session_id] = (version, (cached[1] + [question])[-self.WINDOW_SIZE:])
+            else:
+                self.local.pop(session_id, None)
 
-    def get_important_context(self, session_id: str) -> str:
+    async def get_important_context(self, session_id: str) -> str:
         """
         중요도가 높은 최근 대화 맥락을 가져옵니다.
         :param session_id: 사용자 세션 ID
         :return: 최근 대화 맥락 (문자열)
         """
-        context_key = f"context:{session_id}"
-        messages = self.client.lrange(context_key, -self.WINDOW_SIZE, -1)
-        return "\n".join([json.loads(msg)["question"] for msg in messages])
-    
-    def save_keywords(self, keywords: List[str]):
-        """
-        키워드 출현 빈도를 업데이트합니다.
-        :param keywords: 키워드 리스트
-        """
-        keyword_key = "keywords"
-        for keyword in keywords:
-            self.client.hincrby(keyword_key, keyword, 1)
-    
-    def log_insuffiecient_context_question(self, question: str, embedding: List[float]):
-        """
-        유사 질문이 부족한 경우 질문과 임베딩을 로그로 저장합니다.
-        hash 구조를 이용하여 질문과 임베딩을 저장합니다.
-        :param question: 질문
-        :param embedding: 질문의 임베딩
-        """
-        log_key = "insufficient_context_questions"
-        question_key = f"{question}"
-        self.client.hset(log_key, question_key, json.dumps(embedding))
\ No newline at end of file
+        return "\n".join(await self._get_questions(session_id))
+
+    async def migrate_sessions(self, batch_size: int = 500) -> Dict:
+        """
+        기존 context:* 키를 바이너리 형식으로 바꾸고 TTL을 설정합니다. (이미 바뀐 키는 TTL만 설정)
+        키마다 WATCH -> LRANGE -> MULTI로 바꾸므로, 그사이 다른 워커가 저장한 턴이 있으면 다시 읽어 바꿉니다.
+        :return: {"scanned", "migrated"}
+        """
+        scanned = migrated = 0
+        async for key in self.client.scan_iter(match=f"{self.KEY_PREFIX}:*", count=batch_size):
+            scanned += 1
+            if await self._migrate_key(key):
+                migrated += 1
+            if scanned % batch_size == 0:
+                print(f"🔄 세션 이전 진행: 확인 {scanned}개, 변환 {migrated}개")
+        await self.client.delete("session_id_counter")  # 더 이상 쓰지 않는 세션 카운터
+        return {"scanned": scanned, "migrated": migrated}
+
+    async def _migrate_key(self, key, attempts: int = MIGRATE_ATTEMPTS) -> bool:
+        """
+        세션 키 하나를 바이너리 형식으로 바꾸고 TTL을 설정합니다.
+        :return: 이전 형식이어서 바꿨는지 여부
+        """
+        for attempt in range(1, attempts + 1):
+            try:
+                async with self.client.pipeline(transaction=True) as pipe:
+                    await pipe.watch(key)
+                    messages = await pipe.lrange(key, -self.WINDOW_SIZE, -1)
+                    legacy = any(message[:1] == b"{" for message in messages)
+                    pipe.multi()
+                    if legacy:
+                        pipe.delete(key)
+                        for message in messages:
+                            decoded = decode_message(message)
+                            pipe.rpush(key, encode_message(decoded["question"], decoded["response"], self.response_mode))
+                    pipe.expire(key, self.ttl_seconds)
+                    await pipe.execute()
+                return legacy
+            except WatchError:
+                if attempt == attempts:
+                    print(f"⚠️ 세션 이전 실패: {key!r} (저장이 계속 겹쳐 건너뜀)")
+        return False
+
+    def get_stats(self) -> Dict:
+        reads = self.local_hits + self.redis_reads
+        return {
+            "response_mode": self.response_mode,
+            "local_cache_size": len(self.local) if self.local is not None else 0,
+            "local_hits": self.local_hits,
+            "redis_reads": self.redis_reads,
+            "local_hit_rate": self.local_hits / reads if reads else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    # 기존 세션 키 이전: python -m app.repositories.context_repository
+    async def run_migration():
+        repo = ContextRepository()
+        try:
+            result = await repo.migrate_sessions()
+            print(f"✅ 세션 이전 완료: 확인 {result['scanned']}개, 변환 {result['migrated']}개")
+        finally:
+            await repo.close()
+
+    asyncio.run(run_migration())
@@ -0,0 +1,206 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import asyncio
+import os
+import time
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from app.config import EMBEDDING_DIMENSIONS, EMBEDDING_MODEL, INGEST_BATCH_SIZE
+from app.repositories.manifest_repository import answer_hash
+from app.utils.text_cleaning import clean_text
+
+# 코퍼스 한 배치: (질문 목록, 답변 목록, 답변 해시 목록, (N, dim) float32 임베딩 행렬)
+CorpusBatch = Tuple[List[str], List[str], List[str], np.ndarray]
+
+def reduce_dimensions(embeddings: np.ndarray, dimensions: int) -> np.ndarray:
+    """
+    임베딩 앞쪽 차원만 남기고 다시 정규화합니다.
+    text-embedding-3 모델은 이렇게 줄인 벡터가 dimensions 옵션으로 받은 벡터와 같으므로 다시 임베딩하지 않아도 됩니다.
+    :param embeddings: (N, dim) 임베딩 행렬
+    :param dimensions: 줄일 차원 수
+    """
+    if embeddings.shape[1] == dimensions:
+        return embeddings
+    truncated = np.ascontiguousarray(embeddings[:, :dimensions], dtype=np.float32)
+    norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+    return truncated / np.maximum(norms, 1e-12)
+
+def supports_reduction(model: str) -> bool:
+    """
+    차원을 줄여 쓸 수 있는 (Matryoshka 방식으로 학습된) 임베딩 모델인지 확인합니다.
+    """
+    return model.startswith("text-embedding-3")
+
+class CorpusRepository:
+    """
+    임베딩을 미리 계산해 둔 FAQ 코퍼스 (Parquet).
+    컬럼: question, answer (정제된 텍스트), content_hash (답변 해시, 적재 목록과 같은 값), model, embedding (float32 고정 길이 리스트)
+    파일은 메모리 매핑으로 열고 레코드 배치 단위로 읽으므로, 새 노드에서 API 호출 없이 적은 메모리로 적재할 수 있습니다.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @staticmethod
+    def schema(dimensions: int, model: str) -> pa.Schema:
+        return pa.schema(
+            [
+                pa.field("question", pa.string()),
+                pa.field("answer", pa.string()),
+                pa.field("content_hash", pa.string()),
+                pa.field("model", pa.string()),
+                pa.field("embedding", pa.list_(pa.float32(), dimensions)),
+            ],
+            metadata={"model": model, "dimensions": str(dimensions)},
+        )
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _open(self) -> pq.ParquetFile:
+        return pq.ParquetFile(self.path, memory_map=True)
+
+    def metadata(self) -> Dict:
+        """
+        :return: {"model", "dimensions", "count"}
+        """
+        parquet_file = self._open()
+        meta = parquet_file.schema_arrow.metadata or {}
+        return {
+            "model": meta.get(b"model", b"").decode(),
+            "dimensions": int(meta.get(b"dimensions", b"0")),
+            "count": parquet_file.metadata.num_rows,
+        }
+
+    def is_compatible(self, model: str = EMBEDDING_MODEL, dimensions: int = EMBEDDING_DIMENSIONS) -> bool:
+        """
+        코퍼스의 임베딩을 현재 설정의 모델/차원으로 쓸 수 있는지 확인합니다. (차원은 줄여서 쓸 수 있으면 호환)
+        """
+        meta = self.metadata()
+        if meta["model"] != model:
+            return False
+        return meta["dimensions"] == dimensions or (meta["dimensions"] > dimensions and supports_reduction(model))
+
+    def iter_batches(self, batch_size: int = INGEST_BATCH_SIZE, with_embeddings: bool = True,
+                     dimensions: Optional[int] = None) -> Iterator[CorpusBatch]:
+        """
+        레코드 배치 단위로 읽습니다. 임베딩 행렬은 Arrow 버퍼를 복사 없이 numpy로 봅니다.
+        :param batch_size: 배치 행 수
+        :param with_embeddings: False면 임베딩 컬럼을 읽지 않음 (질문/답변만 필요할 때)
+        :param dimensions: 주면 임베딩을 이 차원으로 줄여서 반환
+        """
+        columns = ["question", "answer", "content_hash"] + (["embedding"] if with_embeddings else [])
+        for batch in self._open().iter_batches(batch_size=batch_size, columns=columns):
+            embeddings = None
+            if with_embeddings:
+                column = batch.column("embedding")
+                embeddings = column.flatten().to_numpy(zero_copy_only=False).reshape(len(column), column.type.list_size)
+                if dimensions:
+                    embeddings = reduce_dimensions(embeddings, dimensions)
+            yield (
+                batch.column("question").to_pylist(),
+                batch.column("answer").to_pylist(),
+                batch.column("content_hash").to_pylist(),
+                embeddings,
+            )
+
+    def iter_faqs(self, batch_size: int = INGEST_BATCH_SIZE) -> Iterator[Tuple[str, str]]:
+        """
+        (질문, 답변)만 순회합니다.
+        """
+        for questions, answers, _, _ in self.iter_batches(batch_size, with_embeddings=False):
+            yield from zip(questions, answers)
+
+    def write(self, batches: Iterable[Tuple[List[str], List[str], np.ndarray]], model: str = EMBEDDING_MODEL,
+              dimensions: int = EMBEDDING_DIMENSIONS) -> int:
+        """
+        (질문, 답변, 임베딩 행렬) 배치를 row group 단위로 씁니다. 임시 파일에 쓴 뒤 원자적으로 교체합니다.
+        :return: 쓴 행 수
+        """
+        schema = self.schema(dimensions, model)
+        tmp_path = f"{self.path}.tmp"
+        written = 0
+        with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+            for questions, answers, embeddings in batches:
+                if not questions:
+                    continue
+                vectors = np.ascontiguousarray(embeddings, dtype=np.float32).reshape(len(questions), dimensions)
+                table = pa.Table.from_arrays(
+                    [
+                        pa.array(questions, pa.string()),
+                        pa.array(answers, pa.string()),
+                        pa.array([answer_hash(answer) for answer in answers], pa.string()),
+                        pa.array([model] * len(questions), pa.string()),
+                        pa.FixedSizeListArray.from_arrays(pa.array(vectors.reshape(-1), pa.float32()), dimensions),
+                    ],
+                    schema=schema,
+                )
+                writer.write_table(table)
+                written += len(questions)
+        os.replace(tmp_path, self.path)
+        return written
+
+async def convert_pickle(pkl_path: str, corpus_path: str, openai_repo, batch_size: int = INGEST_BATCH_SIZE) -> int:
+    """
+    기존 .pkl ({질문: 답변})을 정제하고 임베딩하여 코퍼스로 변환합니다. (임베딩 API는 변환 시 한 번만 호출)
+    :return: 쓴 행 수
+    """
+    import pickle
+    with open(pkl_path, "rb") as f:
+        data = pickle.load(f)
+    cleaned: Dict[str, str] = {}
+    for question, answer in data.items():
+        cleaned.setdefault(clean_text(question), clean_text(answer))
+    del data
+
+    questions = list(cleaned)
+    batches = []
+    for start in range(0, len(questions), batch_size):
+        batch = questions[start:start + batch_size]
+        embeddings = await openai_repo.generate_embeddings(batch)
+        batches.append((batch, [cleaned[q] for q in batch], np.asarray(embeddings, dtype=np.float32)))
+        print(f"📦 임베딩 진행: {start + len(batch)}/{len(questions)}")
+    return await asyncio.to_thread(CorpusRepository(corpus_path).write, batches)
+
+def export_store(vector_repo, corpus_path: str, batch_size: int = INGEST_BATCH_SIZE) -> int:
+    """
+    벡터 저장소(Milvus 또는 로컬 인덱스)의 내용을 임베딩과 함께 코퍼스로 내보냅니다.
+    :return: 쓴 행 수
+    """
+    return CorpusRepository(corpus_path).write(vector_repo.iter_records(batch_size))
+
+
+if __name__ == "__main__":
+    # 변환: python -m app.repositories.corpus_repository convert final_result.pkl faq_corpus.parquet
+    # 내보내기: python -m app.repositories.corpus_repository export faq_corpus.parquet
+    import argparse
+    parser = argparse.ArgumentParser(description="FAQ Parquet 코퍼스 변환/내보내기")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser("convert", help=".pkl을 임베딩하여 코퍼스로 변환")
+    convert_parser.add_argument("pkl_path")
+    convert_parser.add_argument("corpus_path")
+    export_parser = subparsers.add_parser("export", help="벡터 저장소 내용을 코퍼스로 내보내기")
+    export_parser.add_argument("corpus_path")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "convert":
+        from app.repositories.openai_repository import OpenAIRepository
+
+        async def run_convert():
+            openai_repo = OpenAIRepository()
+            try:
+                return await convert_pickle(args.pkl_path, args.corpus_path, openai_repo)
+            finally:
+                await openai_repo.close()
+
+        count = asyncio.run(run_convert())
+    else:
+        from app.config import VECTOR_BACKEND
+        from app.repositories.local_vector_repository import LocalVectorRepository
+        from app.repositories.milvus_repository import MilvusRepository
+        vector_repo = LocalVectorRepository() if VECTOR_BACKEND == "local" else MilvusRepository()
+        vector_repo.initialize()
+        count = export_store(vector_repo, args.corpus_path)
+        vector_repo.close()
+    print(f"✅ 코퍼스 저장 완료: {args.corpus_path} ({count}개, {time.perf_counter() - started:.1f}초)")
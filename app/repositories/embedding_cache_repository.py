@@ -0,0 +1,157 @@
+from typing import Dict, List, Optional
+import hashlib
+import numpy as np
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+from cachetools import LRUCache
+from app.config import (
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_REDIS_ENABLED,
+    EMBEDDING_CACHE_TTL_SECONDS,
+    REDIS_HOST,
+    REDIS_PORT,
+)
+
+class EmbeddingCacheRepository:
+    """
+    텍스트 해시를 키로 사용하는 2단계 임베딩 캐시.
+    1단계는 프로세스 내 LRU, 2단계는 여러 워커가 공유하는 Redis 입니다.
+    Redis에는 JSON 대신 float32 바이트를 그대로 저장합니다.
+    """
+    KEY_PREFIX = "embedding"
+
+    def __init__(
+        self,
+        model: str,
+        dimensions: int,
+        redis_host: str = REDIS_HOST,
+        redis_port: int = REDIS_PORT,
+        db: int = 0,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = EMBEDDING_CACHE_TTL_SECONDS,
+        use_redis: bool = EMBEDDING_CACHE_REDIS_ENABLED,
+    ):
+        self.model = model
+        self.dimensions = dimensions
+        self.ttl_seconds = ttl_seconds
+        self.local = LRUCache(maxsize=max_entries)
+        # 바이너리 값을 다루므로 decode_responses를 끈 클라이언트를 사용
+        self.client = aioredis.Redis(host=redis_host, port=redis_port, db=db) if use_redis else None
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    async def close(self):
+        """
+        Redis 커넥션을 닫습니다.
+        """
+        if self.client is not None:
+            await self.client.aclose()
+
+    def make_key(self, text: str) -> str:
+        """
+        모델명, 차원 수, 텍스트 해시로 캐시 키를 만듭니다.
+        :param text: 임베딩할 텍스트
+        :return: 캐시 키
+        """
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.KEY_PREFIX}:{self.model}:{self.dimensions}:{digest}"
+
+    async def get(self, text: str) -> Optional[List[float]]:
+        """
+        캐시된 임베딩을 조회합니다. LRU -> Redis 순서로 확인합니다.
+        :param text: 임베딩할 텍스트
+        :return: 임베딩 (없으면 None)
+        """
+        key = self.make_key(text)
+        embedding = self.local.get(key)
+        if embedding is not None:
+            self.local_hits += 1
+            return embedding
+
+        if self.client is not None:
+            try:
+                raw = await self.client.get(key)
+            except RedisError as e:
+                print(f"⚠️ 임베딩 캐시(Redis) 조회 실패: {e}")
+                raw = None
+            if raw is not None:
+                embedding = np.frombuffer(raw, dtype=np.float32).tolist()
+                self.local[key] = embedding
+                self.redis_hits += 1
+                return embedding
+
+        self.misses += 1
+        return None
+
+    async def set(self, text: str, embedding: List[float]):
+        """
+        임베딩을 두 캐시 계층에 모두 저장합니다.
+        :param text: 임베딩한 텍스트
+        :param embedding: 임베딩 벡터
+        """
+        key = self.make_key(text)
+        self.local[key] = embedding
+        if self.client is not None:
+            try:
+                await self.client.set(key, np.asarray(embedding, dtype=np.float32).tobytes(), ex=self.ttl_seconds)
+            except RedisError as e:
+                print(f"⚠️ 임베딩 캐시(Redis) 저장 실패: {e}")
+
+    async def get_many(self, texts: List[str]) -> Dict[str, List[float]]:
+        """
+        여러 텍스트의 임베딩을 한 번에 조회합니다. Redis는 MGET 한 번으로 조회합니다.
+        :param texts: 임베딩할 텍스트 목록
+        :return: 텍스트 -> 임베딩 (캐시에 있는 것만)
+        """
+        found = {}
+        remote = []
+        for text in dict.fromkeys(texts):
+            embedding = self.local.get(self.make_key(text))
+            if embedding is not None:
+                found[text] = embedding
+                self.local_hits += 1
+            else:
+                remote.append(text)
+
+        if remote and self.client is not None:
+            try:
+                values = await self.client.mget([self.make_key(text) for text in remote])
+            except RedisError as e:
+                print(f"⚠️ 임베딩 캐시(Redis) 조회 실패: {e}")
+                values = [None] * len(remote)
+            for text, raw in zip(remote, values):
+                if raw is not None:
+                    embedding = np.frombuffer(raw, dtype=np.float32).tolist()
+                    self.local[self.make_key(text)] = embedding
+                    found[text] = embedding
+                    self.redis_hits += 1
+
+        self.misses += len(set(texts)) - len(found)
+        return found
+
+    async def set_many(self, items: Dict[str, List[float]]):
+        """
+        여러 임베딩을 파이프라인 한 번으로 저장합니다.
+        :param items: 텍스트 -> 임베딩
+        """
+        for text, embedding in items.items():
+            self.local[self.make_key(text)] = embedding
+        if self.client is not None and items:
+            try:
+                async with self.client.pipeline(transaction=False) as pipe:
+                    for text, embedding in items.items():
+                        pipe.set(self.make_key(text), np.asarray(embedding, dtype=np.float32).tobytes(), ex=self.ttl_seconds)
+                    await pipe.execute()
+            except RedisError as e:
+                print(f"⚠️ 임베딩 캐시(Redis) 저장 실패: {e}")
+
+    def get_stats(self):
+        total = self.local_hits + self.redis_hits + self.misses
+        return {
+            "size": len(self.local),
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": (self.local_hits + self.redis_hits) / total if total else 0.0,
+        }
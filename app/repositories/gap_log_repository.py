@@ -0,0 +1,249 @@
+from typing import Dict, List, Optional
+import asyncio
+import json
+import time
+import numpy as np
+import redis.asyncio as aioredis
+from redis.exceptions import WatchError
+from app.config import (
+    REDIS_HOST,
+    REDIS_PORT,
+    GAP_CLUSTER_SIMILARITY_THRESHOLD,
+    GAP_CLUSTER_MAX,
+    GAP_CLUSTER_SAMPLE_SIZE,
+)
+
+class GapLogRepository:
+    """
+    유사 질문이 부족했던 질문(콘텐츠 보강 후보)을 비슷한 질문끼리 묶어 Redis에 기록합니다.
+    새 질문은 기존 군집 중심과의 코사인 유사도로 가장 가까운 군집에 합치고, 임계값 미만이면 새 군집을 만듭니다.
+    군집 중심은 float32 바이트로 따로 저장하고, 대시보드는 건수 순위(zset)와 요약(hash)만 읽습니다.
+    군집 수가 상한을 넘으면 건수가 가장 적고 오래된 군집부터 제거합니다.
+    """
+    CENTROIDS_KEY = "gap_clusters:centroids"  # 군집 ID -> 중심 벡터 (float32 바이트, 단위 벡터의 합)
+    COUNTS_KEY = "gap_clusters:counts"  # zset: 군집 ID -> 질문 수
+    SUMMARIES_KEY = "gap_clusters:summaries"  # 군집 ID -> 요약 JSON (대표 질문, 예시 질문, 처음/마지막 기록 시각)
+    NEXT_ID_KEY = "gap_clusters:next_id"
+    VERSION_KEY = "gap_clusters:version"  # 군집이 생기거나 제거될 때마다 증가 (다른 워커의 중심 캐시 갱신용)
+    LEGACY_KEY = "insufficient_context_questions"  # 이전 형식 (질문 -> JSON 임베딩)
+    WRITE_ATTEMPTS = 5  # 다른 워커와 동시에 쓸 때 재시도 횟수
+    REFRESH_INTERVAL_SECONDS = 60  # 버전이 같아도 이 주기마다 중심을 다시 읽음 (다른 워커가 더한 합을 배정에 반영)
+
+    def __init__(
+        self,
+        redis_host=REDIS_HOST,
+        redis_port=REDIS_PORT,
+        db=0,
+        similarity_threshold: float = GAP_CLUSTER_SIMILARITY_THRESHOLD,
+        max_clusters: int = GAP_CLUSTER_MAX,
+        sample_size: int = GAP_CLUSTER_SAMPLE_SIZE,
+    ):
+        # 바이너리 값을 다루므로 decode_responses를 끈 클라이언트를 사용
+        self.client = aioredis.Redis(host=redis_host, port=redis_port, db=db)
+        self.similarity_threshold = similarity_threshold
+        self.max_clusters = max_clusters
+        self.sample_size = sample_size
+        # 군집 중심 캐시 (버전이 바뀔 때만 Redis에서 다시 읽음)
+        self._ids: List[str] = []
+        self._sums: Optional[np.ndarray] = None
+        self._version: Optional[int] = None
+        self._refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+        # 지표
+        self.recorded = 0
+        self.created = 0
+        self.evicted = 0
+
+    async def close(self):
+        await self.client.aclose()
+
+    @staticmethod
+    def _format_id(number: int) -> str:
+        # 자릿수를 맞춰 같은 건수끼리는 사전순 = 생성순이 되도록 함
+        return f"{number:010d}"
+
+    async def _refresh_centroids(self):
+        version = int(await self.client.get(self.VERSION_KEY) or 0)
+        if version == self._version and time.monotonic() - self._refreshed_at < self.REFRESH_INTERVAL_SECONDS:
+            return
+        raw = await self.client.hgetall(self.CENTROIDS_KEY)
+        self._ids = sorted(key.decode() for key in raw)
+        self._sums = (
+            np.stack([np.frombuffer(raw[cluster_id.encode()], dtype=np.float32) for cluster_id in self._ids])
+            if self._ids else None
+        )
+        self._version = version
+        self._refreshed_at = time.monotonic()
+
+    def _assign(self, vector: np.ndarray) -> int:
+        """
+        가장 가까운 군집의 위치를 찾습니다.
+        :return: 군집 위치 (임계값 이상인 군집이 없으면 -1)
+        """
+        if self._sums is None or not len(self._sums):
+            return -1
+        norms = np.linalg.norm(self._sums, axis=1)
+        similarities = (self._sums @ vector) / np.maximum(norms, 1e-12)
+        best = int(np.argmax(similarities))
+        return best if similarities[best] >= self.similarity_threshold else -1
+
+    async def record_many(self, items: Dict[str, List[float]]):
+        """
+        보강 필요 질문들을 군집에 반영합니다.
+        군집 배정은 로컬 중심 캐시로 하고, 저장할 때는 WATCH 안에서 Redis의 현재 중심 합과 요약을 읽어
+        이번 배치의 합을 더한 뒤 MULTI 트랜잭션 한 번으로 씁니다. (다른 워커가 그사이 쓰면 다시 읽어 재시도)
+        :param items: 질문 -> 임베딩
+        """
+        if not items:
+            return
+        async with self._lock:
+            await self._refresh_centroids()
+            now = time.time()
+            touched: Dict[int, List[str]] = {}  # 군집 위치 -> 이번에 합쳐진 질문들
+            deltas: Dict[int, np.ndarray] = {}  # 군집 위치 -> 이번 배치의 단위 벡터 합
+            first_new = len(self._ids)
+            for question, embedding in items.items():
+                vector = np.asarray(embedding, dtype=np.float32)
+                vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+                position = self._assign(vector)
+                if position < 0:
+                    position = len(self._ids)
+                    self._ids.append("")  # 새 군집 ID는 아래에서 한 번에 발급
+                    self._sums = vector[None, :].copy() if self._sums is None else np.vstack([self._sums, vector])
+                else:
+                    self._sums[position] += vector  # 이번 배치 안의 배정에 반영
+                touched.setdefault(position, []).append(question)
+                deltas[position] = deltas[position] + vector if position in deltas else vector.copy()
+
+            created = len(self._ids) - first_new
+            if created:
+                last_id = await self.client.incrby(self.NEXT_ID_KEY, created)
+                for offset in range(created):
+                    self._ids[first_new + offset] = self._format_id(last_id - created + offset + 1)
+
+            existing = [position for position in touched if position < first_new]
+            existing_ids = [self._ids[p] for p in existing]
+            touched_ids = {self._ids[position] for position in touched}
+            for attempt in range(1, self.WRITE_ATTEMPTS + 1):
+                try:
+                    async with self.client.pipeline(transaction=True) as pipe:
+                        await pipe.watch(self.CENTROIDS_KEY, self.SUMMARIES_KEY, self.COUNTS_KEY)
+                        stored_sums = await pipe.hmget(self.CENTROIDS_KEY, existing_ids) if existing else []
+                        previous = await pipe.hmget(self.SUMMARIES_KEY, existing_ids) if existing else []
+                        sums = {position: deltas[position] for position in touched}
+                        summaries = {}
+                        for position, raw_sum, raw_summary in zip(existing, stored_sums, previous):
+                            if raw_sum is not None:  # 다른 워커가 제거한 군집이면 이번 배치로 다시 시작
+                                sums[position] = np.frombuffer(raw_sum, dtype=np.float32) + deltas[position]
+                            if raw_summary is not None:
+                                summaries[position] = json.loads(raw_summary)
+
+                        # 상한 초과분은 이번 배치에서 쓰이지 않은 군집 중 건수가 적고 오래된 것부터 제거
+                        victims: List[str] = []
+                        excess = await pipe.hlen(self.CENTROIDS_KEY) + created - self.max_clusters
+                        if excess > 0:
+                            candidates = await pipe.zrange(self.COUNTS_KEY, 0, excess + len(touched_ids) - 1)
+                            victims = [c.decode() for c in candidates if c.decode() not in touched_ids][:excess]
+
+                        pipe.multi()
+                        for position, questions in touched.items():
+                            cluster_id = self._ids[position]
+                            summary = summaries.get(position) or {"question": questions[0], "samples": [], "first_seen": now}
+                            for question in questions:
+                                if len(summary["samples"]) >= self.sample_size:
+                                    break
+                                if question not in summary["samples"]:
+                                    summary["samples"].append(question)
+                            summary["last_seen"] = now
+                            pipe.hset(self.CENTROIDS_KEY, cluster_id, sums[position].tobytes())
+                            pipe.zincrby(self.COUNTS_KEY, len(questions), cluster_id)
+                            pipe.hset(self.SUMMARIES_KEY, cluster_id, json.dumps(summary, ensure_ascii=False))
+                        if victims:
+                            pipe.hdel(self.CENTROIDS_KEY, *victims)
+                            pipe.zrem(self.COUNTS_KEY, *victims)
+                            pipe.hdel(self.SUMMARIES_KEY, *victims)
+                        if created or victims:
+                            pipe.incr(self.VERSION_KEY)
+                        results = await pipe.execute()
+                    break
+                except WatchError:
+                    if attempt == self.WRITE_ATTEMPTS:
+                        print(f"⚠️ 보강 필요 질문 {len(items)}개 기록 실패: 다른 워커와 계속 충돌했습니다.")
+                        self._version = None  # 로컬 캐시가 Redis와 어긋났으므로 다음 기록 때 다시 읽음
+                        return
+
+            # 로컬 캐시를 저장한 값(다른 워커의 합 포함)으로 맞춤
+            for position, vector in sums.items():
+                self._sums[position] = vector
+            if victims:
+                evicted = set(victims)
+                keep = [i for i, cluster_id in enumerate(self._ids) if cluster_id not in evicted]
+                self._ids = [self._ids[i] for i in keep]
+                self._sums = self._sums[keep] if keep else None
+            if created or victims:
+                # 다른 워커의 변경이 끼어들지 않았다면 캐시가 최신이므로 다시 읽지 않음
+                new_version = results[-1]
+                self._version = new_version if self._version is not None and new_version == self._version + 1 else None
+            self.recorded += len(items)
+            self.created += created
+            self.evicted += len(victims)
+
+    async def top_clusters(self, limit: int = 20) -> List[Dict]:
+        """
+        질문 수가 많은 순으로 군집 요약을 가져옵니다. (중심 벡터는 읽지 않음)
+        :param limit: 가져올 군집 수
+        :return: [{"id", "count", "question", "samples", "first_seen", "last_seen"}, ...]
+        """
+        ranked = await self.client.zrevrange(self.COUNTS_KEY, 0, limit - 1, withscores=True)
+        if not ranked:
+            return []
+        summaries = await self.client.hmget(self.SUMMARIES_KEY, [cluster_id for cluster_id, _ in ranked])
+        return [
+            {"id": cluster_id.decode(), "count": int(count), **json.loads(raw)}
+            for (cluster_id, count), raw in zip(ranked, summaries) if raw is not None
+        ]
+
+    async def count_clusters(self) -> int:
+        """
+        기록된 전체 군집 수를 반환합니다.
+        """
+        return await self.client.zcard(self.COUNTS_KEY)
+
+    async def migrate_legacy(self, batch_size: int = 200) -> int:
+        """
+        이전 형식(질문 -> JSON 임베딩 hash)의 기록을 군집으로 옮기고 이전 키를 삭제합니다.
+        :return: 옮긴 질문 수
+        """
+        migrated = 0
+        cursor = 0
+        while True:
+            cursor, chunk = await self.client.hscan(self.LEGACY_KEY, cursor, count=batch_size)
+            if chunk:
+                await self.record_many({question.decode(): json.loads(raw) for question, raw in chunk.items()})
+                migrated += len(chunk)
+                print(f"🔄 보강 필요 질문 이전: {migrated}개")
+            if cursor == 0:
+                break
+        await self.client.delete(self.LEGACY_KEY)
+        return migrated
+
+    def get_stats(self) -> Dict:
+        return {
+            "clusters": len(self._ids),
+            "recorded": self.recorded,
+            "created": self.created,
+            "evicted": self.evicted,
+        }
+
+
+if __name__ == "__main__":
+    # 이전 형식 기록 이전: python -m app.repositories.gap_log_repository
+    async def run_migration():
+        repo = GapLogRepository()
+        try:
+            count = await repo.migrate_legacy()
+            print(f"✅ 보강 필요 질문 {count}개를 군집 {repo.get_stats()['clusters']}개로 이전했습니다.")
+        finally:
+            await repo.close()
+
+    asyncio.run(run_migration())
@@ -0,0 +1,178 @@
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+import time
+import uuid
+import redis.asyncio as aioredis
+from app.config import (
+    REDIS_HOST,
+    REDIS_PORT,
+    KEYWORD_HOURLY_RETENTION_HOURS,
+    KEYWORD_DAILY_RETENTION_DAYS,
+    KEYWORD_BUCKET_MAX_MEMBERS,
+)
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+def to_epoch(value: Optional[datetime], default: float) -> float:
+    """
+    datetime을 epoch 초로 바꿉니다. 시간대가 없으면 UTC로 봅니다.
+    """
+    if value is None:
+        return default
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+class KeywordStatsRepository:
+    """
+    키워드 출현 빈도를 시간 구간별 sorted set으로 기록합니다.
+    같은 키워드를 1시간 구간(keywords:hour:<epoch 시>)과 1일 구간(keywords:day:<epoch 일>, UTC)에 함께 더하고,
+    구간마다 보관 기간이 지나면 만료되도록 EXPIREAT을 겁니다.
+    조회 시에는 기간을 덮는 최소 개수의 구간(가운데는 일 단위, 양 끝은 시간 단위)을 합쳐 상위 N개만 가져옵니다.
+    구간당 키워드 수 상한을 두면 Space-Saving 방식으로 빈도가 가장 낮은 키워드를 교체합니다. (빈도는 근사값)
+    """
+    HOUR_PREFIX = "keywords:hour"
+    DAY_PREFIX = "keywords:day"
+
+    def __init__(
+        self,
+        redis_host=REDIS_HOST,
+        redis_port=REDIS_PORT,
+        db=0,
+        hourly_retention_hours: int = KEYWORD_HOURLY_RETENTION_HOURS,
+        daily_retention_days: int = KEYWORD_DAILY_RETENTION_DAYS,
+        max_members: int = KEYWORD_BUCKET_MAX_MEMBERS,
+    ):
+        self.client = aioredis.Redis(host=redis_host, port=redis_port, db=db, decode_responses=True)
+        self.hourly_retention_hours = hourly_retention_hours
+        self.daily_retention_days = daily_retention_days
+        self.max_members = max_members
+
+    async def close(self):
+        await self.client.aclose()
+
+    def _buckets(self, timestamp: float) -> List[Tuple[str, int]]:
+        """
+        :return: [(구간 키, 만료 시각(epoch 초))] - 시간 구간, 일 구간 순
+        """
+        hour = int(timestamp // HOUR)
+        day = int(timestamp // DAY)
+        return [
+            (f"{self.HOUR_PREFIX}:{hour}", (hour + 1) * HOUR + self.hourly_retention_hours * HOUR),
+            (f"{self.DAY_PREFIX}:{day}", (day + 1) * DAY + self.daily_retention_days * DAY),
+        ]
+
+    async def record(self, keywords: Iterable[str], timestamp: Optional[float] = None):
+        """
+        키워드 출현 빈도를 현재 시간 구간과 일 구간에 더합니다. 모든 갱신을 MULTI 트랜잭션 한 번으로 전송합니다.
+        :param keywords: 키워드 리스트 (중복 가능)
+        :param timestamp: 기록 시각 (기본값은 현재)
+        """
+        counts = Counter(keyword for keyword in keywords if keyword)
+        if not counts:
+            return
+        buckets = self._buckets(time.time() if timestamp is None else timestamp)
+        increments = {key: dict(counts) for key, _ in buckets}
+        replaced: Dict[str, List[str]] = {}
+        if self.max_members > 0:
+            increments, replaced = await self._plan_space_saving([key for key, _ in buckets], counts)
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            for key, expire_at in buckets:
+                if replaced.get(key):
+                    pipe.zrem(key, *replaced[key])
+                for keyword, amount in increments[key].items():
+                    pipe.zincrby(key, amount, keyword)
+                pipe.expireat(key, expire_at)
+            await pipe.execute()
+
+    async def _plan_space_saving(self, keys: List[str], counts: Counter) -> Tuple[Dict[str, Dict[str, float]], Dict[str, List[str]]]:
+        """
+        구간이 가득 찼을 때 새 키워드가 빈도가 가장 낮은 키워드를 대신하도록 증가량을 계산합니다.
+        새 키워드는 밀려난 키워드의 빈도를 이어받으므로 빈도는 실제보다 최대 그 값만큼 크게 잡힙니다.
+        :return: (구간 키 -> 키워드 -> 증가량, 구간 키 -> 제거할 키워드)
+        """
+        keywords = list(counts)
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.zmscore(key, keywords)
+                pipe.zcard(key)
+                pipe.zrange(key, 0, len(keywords) - 1, withscores=True)
+            results = await pipe.execute()
+
+        increments, replaced = {}, {}
+        for index, key in enumerate(keys):
+            scores, size, lowest = results[index * 3:index * 3 + 3]
+            lowest = [(member, score) for member, score in lowest if member not in counts]
+            increments[key], replaced[key] = {}, []
+            for keyword, score in zip(keywords, scores):
+                amount = counts[keyword]
+                if score is None and size >= self.max_members and lowest:
+                    evicted, evicted_score = lowest.pop(0)
+                    replaced[key].append(evicted)
+                    amount += evicted_score
+                elif score is None:
+                    size += 1
+                increments[key][keyword] = amount
+        return increments, replaced
+
+    def oldest_timestamp(self, now: Optional[float] = None) -> float:
+        """
+        조회할 수 있는 가장 오래된 시각 (아직 만료되지 않은 가장 오래된 일 구간의 시작)
+        """
+        now = time.time() if now is None else now
+        return float((int(now // DAY) - self.daily_retention_days) * DAY)
+
+    def _plan_keys(self, start: float, end: float, now: Optional[float] = None) -> List[str]:
+        """
+        [start, end) 기간을 덮는 구간 키 목록을 만듭니다.
+        일 전체가 포함되면 일 구간 하나로, 나머지는 시간 구간으로 덮습니다.
+        시간 구간이 이미 만료된 부분은 그 시각이 속한 일 구간으로 대신합니다. (기간이 일 단위로 넓어짐)
+        기간은 보관 기간과 현재 시각 안으로 줄이므로 키 수는 보관 기간에 비례해 제한됩니다.
+        """
+        now = time.time() if now is None else now
+        start = max(start, self.oldest_timestamp(now))
+        end = min(end, now)
+        hour = int(start // HOUR)
+        end_hour = int(-(-end // HOUR))  # 올림
+        oldest_hour = int(now // HOUR) - self.hourly_retention_hours
+        keys: List[str] = []
+        while hour < end_hour:
+            day = hour // 24
+            if (hour % 24 == 0 and hour + 24 <= end_hour) or hour < oldest_hour:
+                day_key = f"{self.DAY_PREFIX}:{day}"
+                if not keys or keys[-1] != day_key:
+                    keys.append(day_key)
+                hour = (day + 1) * 24
+            else:
+                keys.append(f"{self.HOUR_PREFIX}:{hour}")
+                hour += 1
+        return keys
+
+    async def top(self, start: Optional[datetime] = None, end: Optional[datetime] = None, limit: int = 20) -> List[Dict]:
+        """
+        기간 안에서 빈도가 높은 키워드 상위 N개를 가져옵니다.
+        :param start: 시작 시각 (기본값은 24시간 전, 보관 기간보다 오래되면 보관 기간 시작으로 줄임)
+        :param end: 끝 시각 (기본값은 현재, 미래면 현재로 줄임)
+        :param limit: 가져올 키워드 수
+        :return: [{"keyword", "count"}, ...]
+        """
+        now = time.time()
+        end_ts = to_epoch(end, now)
+        start_ts = to_epoch(start, end_ts - DAY)
+        keys = self._plan_keys(start_ts, end_ts, now)
+        if not keys:
+            return []
+        if len(keys) == 1:
+            ranked = await self.client.zrevrange(keys[0], 0, limit - 1, withscores=True)
+        else:
+            # 서버에서 합친 뒤 상위 N개만 전송받고 임시 키는 바로 삭제
+            tmp_key = f"keywords:tmp:{uuid.uuid4().hex}"
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.zunionstore(tmp_key, keys)
+                pipe.zrevrange(tmp_key, 0, limit - 1, withscores=True)
+                pipe.delete(tmp_key)
+                _, ranked, _ = await pipe.execute()
+        return [{"keyword": keyword, "count": int(count)} for keyword, count in ranked]
@@ -0,0 +1,244 @@
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import heapq
+import math
+import re
+import threading
+from app.utils.text_cleaning import clean_text
+from app.config import LEXICAL_NGRAM_SIZES, LEXICAL_FAST_PATH_THRESHOLD, RRF_K
+
+def normalize_question(text: str) -> str:
+    """
+    어휘 비교용으로 질문을 정규화합니다. (클리닝, 소문자화, 문장부호 제거)
+    """
+    text = clean_text(text).lower()
+    text = re.sub(r"[^0-9a-z가-힣\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+def strip_title_decorations(text: str) -> str:
+    """
+    FAQ 제목 앞의 [분류], 뒤의 (부가 설명)을 제거합니다.
+    """
+    text = re.sub(r"^\s*\[[^\]]*\]\s*", "", clean_text(text))
+    return re.sub(r"\s*\([^)]*\)\s*$", "", text)
+
+def exact_keys(text: str) -> List[str]:
+    """
+    정확 일치 해시에 사용할 키 목록을 만듭니다.
+    장식을 뺀 제목도 함께 등록하여 본문만 붙여넣은 질문도 찾습니다.
+    """
+    keys = {normalize_question(text).replace(" ", ""), normalize_question(strip_title_decorations(text)).replace(" ", "")}
+    return [key for key in keys if key]
+
+def char_ngrams(normalized: str, sizes: Sequence[int] = LEXICAL_NGRAM_SIZES) -> List[str]:
+    """
+    띄어쓰기 차이에 영향을 덜 받도록 공백을 제거한 뒤 한국어 문자 n-gram을 만듭니다.
+    """
+    compact = normalized.replace(" ", "")
+    grams = []
+    for n in sizes:
+        if len(compact) < n:
+            continue
+        grams.extend(compact[i:i + n] for i in range(len(compact) - n + 1))
+    return grams
+
+def reciprocal_rank_fusion(result_lists: Iterable[List[Dict]], k: int = RRF_K, top_k: int = 10) -> List[Dict]:
+    """
+    여러 검색 결과를 Reciprocal Rank Fusion으로 합칩니다. (질문 기준으로 동일 항목 병합)
+    :param result_lists: 순위대로 정렬된 검색 결과 목록들
+    :param k: RRF 상수
+    :param top_k: 반환할 개수
+    :return: 융합 점수(rrf_score) 순으로 정렬된 결과
+    """
+    fused: Dict[str, Dict] = {}
+    for results in result_lists:
+        for rank, item in enumerate(results, start=1):
+            entry = fused.setdefault(item["question"], {**item, "rrf_score": 0.0})
+            entry["rrf_score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda item: item["rrf_score"], reverse=True)[:top_k]
+
+class _IndexState:
+    """
+    색인 데이터 묶음. build()는 새 묶음을 만들어 참조 하나로 교체하므로,
+    검색은 호출 시작 시 잡은 묶음 하나만 보고 서로 다른 세대의 필드를 섞어 읽지 않습니다.
+    """
+    __slots__ = ("docs", "doc_grams", "doc_lengths", "total_length", "postings", "exact", "question_ids", "removed")
+
+    def __init__(self):
+        self.docs: List[Optional[Dict]] = []  # 문서 ID -> {"question", "answer"} (삭제된 문서는 None)
+        self.doc_grams: List[frozenset] = []  # 문서 ID -> 장식을 뺀 제목의 n-gram 집합 (신뢰도 계산용)
+        self.doc_lengths: List[int] = []
+        self.total_length = 0
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)  # n-gram -> {문서 ID: 출현 횟수}
+        self.exact: Dict[str, int] = {}  # 정규화된 질문 -> 문서 ID
+        self.question_ids: Dict[str, int] = {}  # 원본 질문 -> 문서 ID
+        self.removed = 0  # 삭제 표시된 문서 수 (build 시 정리)
+
+    def __len__(self):
+        return len(self.docs) - self.removed
+
+class LexicalIndexRepository:
+    """
+    정제된 FAQ 질문에 대한 인메모리 어휘 색인.
+    문자 n-gram BM25 점수와 정규화된 정확 일치 해시를 제공하며, 삽입 시 점진적으로 갱신됩니다.
+    build()는 워커 스레드에서 실행될 수 있으므로 색인 데이터는 _IndexState 하나로 묶어 통째로 교체합니다.
+    build() 도중 들어온 add_many/remove_many는 현재 색인에 바로 반영하면서 변경 기록에도 남기고,
+    교체 직전에 새 색인에 다시 적용하므로 교체 후에도 사라지지 않습니다.
+    (add_many/remove_many와 검색은 이벤트 루프에서만 호출하므로, 검색 중에 색인이 바뀌지 않아 검색은 잠금 없이 읽음)
+    """
+
+    def __init__(self, ngram_sizes: Sequence[int] = LEXICAL_NGRAM_SIZES, k1: float = 1.2, b: float = 0.75,
+                 fast_path_threshold: float = LEXICAL_FAST_PATH_THRESHOLD):
+        self.ngram_sizes = tuple(ngram_sizes)
+        self.k1 = k1
+        self.b = b
+        self.fast_path_threshold = fast_path_threshold
+        self._lock = threading.Lock()
+        self._state = _IndexState()
+        self._build_logs: List[List[Tuple]] = []  # 진행 중인 build()마다의 변경 기록 ("add", 질문, 답변) / ("remove", 질문)
+
+    def __len__(self):
+        return len(self._state)
+
+    def build(self, faqs: Iterable[Tuple[str, str]]):
+        """
+        색인을 처음부터 다시 만듭니다.
+        :param faqs: (질문, 답변) 이터러블
+        """
+        with self._lock:
+            log: List[Tuple] = []
+            self._build_logs.append(log)
+        try:
+            # 검색 중인 요청이 반쯤 만들어진 색인을 보지 않도록 별도로 만든 뒤 참조 하나로 교체
+            staged = _IndexState()
+            for question, answer in faqs:
+                self._add(staged, question, answer)
+        except BaseException:
+            with self._lock:
+                self._build_logs.remove(log)
+            raise
+        with self._lock:
+            self._build_logs.remove(log)
+            # 만드는 동안 들어온 변경을 순서대로 다시 적용 (이미 반영된 변경을 다시 적용해도 결과는 같음)
+            for change in log:
+                if change[0] == "add":
+                    self._add(staged, change[1], change[2])
+                else:
+                    self._remove(staged, change[1])
+            self._state = staged
+        print(f"✅ 어휘 색인 생성 완료: {len(staged)}개" + (f" (생성 중 변경 {len(log)}건 반영)" if log else ""))
+
+    def add_many(self, questions: List[str], answers: List[str]):
+        """
+        새로 삽입된 FAQ를 색인에 추가합니다.
+        """
+        with self._lock:
+            state = self._state
+            for question, answer in zip(questions, answers):
+                self._add(state, question, answer)
+                for log in self._build_logs:
+                    log.append(("add", question, answer))
+
+    def remove_many(self, questions: Iterable[str]):
+        """
+        삭제된 FAQ를 색인에서 제거합니다.
+        """
+        with self._lock:
+            state = self._state
+            for question in questions:
+                self._remove(state, question)
+                for log in self._build_logs:
+                    log.append(("remove", question))
+
+    def _remove(self, state: _IndexState, question: str):
+        doc_id = state.question_ids.pop(question, None)
+        if doc_id is None:
+            return
+        # 문서 ID가 바뀌지 않도록 자리는 남겨 두고 색인에서만 뺌
+        for gram in set(char_ngrams(normalize_question(question), self.ngram_sizes)):
+            postings = state.postings.get(gram)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del state.postings[gram]
+        for key in exact_keys(question):
+            if state.exact.get(key) == doc_id:
+                del state.exact[key]
+        state.total_length -= state.doc_lengths[doc_id]
+        state.doc_lengths[doc_id] = 0
+        state.doc_grams[doc_id] = frozenset()
+        state.docs[doc_id] = None
+        state.removed += 1
+
+    def _add(self, state: _IndexState, question: str, answer: str):
+        doc_id = state.question_ids.get(question)
+        if doc_id is not None:
+            # 이미 있는 질문은 답변만 갱신 (읽는 쪽이 반쯤 바뀐 dict를 보지 않도록 새 dict로 교체)
+            state.docs[doc_id] = {"question": question, "answer": answer}
+            return
+
+        doc_id = len(state.docs)
+        grams = Counter(char_ngrams(normalize_question(question), self.ngram_sizes))
+        state.docs.append({"question": question, "answer": answer})
+        state.doc_grams.append(frozenset(char_ngrams(normalize_question(strip_title_decorations(question)), self.ngram_sizes)))
+        length = sum(grams.values())
+        state.doc_lengths.append(length)
+        state.total_length += length
+        for gram, tf in grams.items():
+            state.postings[gram][doc_id] = tf
+        for key in exact_keys(question):
+            state.exact.setdefault(key, doc_id)
+        state.question_ids[question] = doc_id
+
+    def search(self, query: str, top_k: int = 10) -> List[Dict]:
+        """
+        BM25 점수로 질문을 검색합니다.
+        :param query: 질의
+        :param top_k: 반환할 개수
+        :return: 점수 순 결과 ({"question", "answer", "lexical_score"})
+        """
+        state = self._state
+        return [
+            {**state.docs[doc_id], "lexical_score": score}
+            for doc_id, score in self._score(state, Counter(char_ngrams(normalize_question(query), self.ngram_sizes)), top_k)
+        ]
+
+    def _score(self, state: _IndexState, query_grams: Counter, top_k: int) -> List[Tuple[int, float]]:
+        n_docs = len(state)
+        if not n_docs or not query_grams:
+            return []
+        avg_length = state.total_length / n_docs
+        scores: Dict[int, float] = defaultdict(float)
+        for gram, query_tf in query_grams.items():
+            postings = state.postings.get(gram)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * state.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += query_tf * idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def match(self, query: str) -> Optional[Dict]:
+        """
+        질의가 FAQ 제목과 정확히 또는 거의 같으면 해당 FAQ를 반환합니다.
+        정확 일치 해시를 먼저 확인하고, 없으면 BM25 1위 문서와의 n-gram 자카드 유사도로 판단합니다.
+        :param query: 질의
+        :return: {"question", "answer", "confidence"} (확신할 수 없으면 None)
+        """
+        state = self._state
+        for key in exact_keys(query):
+            doc_id = state.exact.get(key)
+            if doc_id is not None:
+                return {**state.docs[doc_id], "confidence": 1.0}
+
+        query_grams = Counter(char_ngrams(normalize_question(query), self.ngram_sizes))
+        best = self._score(state, query_grams, 1)
+        if not best:
+            return None
+        doc_id = best[0][0]
+        query_set, doc_set = frozenset(query_grams), state.doc_grams[doc_id]
+        confidence = len(query_set & doc_set) / len(query_set | doc_set)
+        if confidence < self.fast_path_threshold:
+            return None
+        return {**state.docs[doc_id], "confidence": confidence}
@@ -0,0 +1,304 @@
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import heapq
+import itertools
+import math
+import time
+import openai
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+from app.metrics import track_openai_call
+from app.config import (
+    LLM_MAX_CONCURRENCY,
+    LLM_CONCURRENCY_LIMITS,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_MAX_QUEUE_DEPTH,
+    LLM_QUEUE_TIMEOUT_SECONDS,
+    LLM_RETRY_ATTEMPTS,
+    LLM_RETRY_MAX_WAIT_SECONDS,
+    LLM_ADMISSION_RETRY_AFTER_SECONDS,
+)
+
+# 재시도할 오류: 속도 제한(429), 서버 오류(5xx), 연결/시간 초과
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+
+# 우선순위 (작을수록 먼저): 사용자 응답 경로 -> 질의 임베딩 -> 대량 적재/분석
+PRIORITY_USER = 0
+PRIORITY_EMBEDDING = 1
+PRIORITY_BACKGROUND = 2
+DEFAULT_PRIORITIES = {"answer": PRIORITY_USER, "refine": PRIORITY_USER, "embedding": PRIORITY_EMBEDDING, "keywords": PRIORITY_BACKGROUND}
+
+class LLMOverloadedError(Exception):
+    """
+    호출 슬롯을 정해진 시간 안에 얻지 못함
+    """
+
+def parse_limits(raw: str) -> Dict[str, int]:
+    """
+    "answer=32,refine=32" 형식의 호출 종류별 제한을 읽습니다.
+    """
+    limits = {}
+    for item in raw.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            limits[name.strip()] = int(value)
+    return limits
+
+def estimate_tokens(text: str, max_output_tokens: int = 0) -> int:
+    """
+    요청 토큰 수를 대략 계산합니다. (UTF-8 3바이트(한글 1자)당 1토큰 + 최대 출력 토큰)
+    """
+    return len(text.encode("utf-8")) // 3 + max_output_tokens
+
+class _Waiter:
+    __slots__ = ("call_type", "tokens", "future")
+
+    def __init__(self, call_type: str, tokens: int, future: asyncio.Future):
+        self.call_type = call_type
+        self.tokens = tokens
+        self.future = future
+
+class LLMLease:
+    """
+    얻은 호출 슬롯. 실제 사용량을 기록하면 반납할 때 토큰 예산에서 추정치와의 차이를 정산합니다.
+    """
+
+    def __init__(self, call_type: str, estimated_tokens: int):
+        self.call_type = call_type
+        self.estimated_tokens = estimated_tokens
+        self.used_tokens: Optional[int] = None
+
+    def record_usage(self, usage):
+        if usage is not None and getattr(usage, "total_tokens", None) is not None:
+            self.used_tokens = (self.used_tokens or 0) + usage.total_tokens
+
+class LLMScheduler:
+    """
+    모든 OpenAI 호출(정제, 임베딩, 답변 스트리밍, 키워드)이 거쳐 가는 워커 단위 스케줄러.
+    - 호출 종류별 동시 호출 수와 전체 동시 호출 수를 제한합니다.
+    - 분당 토큰 예산(토큰 버킷)을 넘지 않도록 추정 토큰만큼 미리 차감하고, 호출이 끝나면 실제 사용량으로 정산합니다.
+    - 대기 중인 호출은 우선순위 순으로 들어가며, 앞선 호출이 전체 슬롯/토큰 예산을 기다리는 동안 뒤의 호출이 끼어들지 않습니다.
+      (종류별 제한에 걸린 호출만 건너뜀)
+    - 429/5xx/연결 오류는 tenacity로 지터가 있는 지수 백오프 재시도를 합니다.
+    - 사용자 요청 대기열이 깊거나 토큰 예산이 바닥나면 admission_retry_after()로 새 요청을 스트리밍 시작 전에 거절할 수 있습니다.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        limits: Optional[Dict[str, int]] = None,
+        tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+        max_queue_depth: int = LLM_MAX_QUEUE_DEPTH,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT_SECONDS,
+        retry_attempts: int = LLM_RETRY_ATTEMPTS,
+        retry_max_wait: float = LLM_RETRY_MAX_WAIT_SECONDS,
+    ):
+        self.max_concurrency = max_concurrency
+        self.limits = parse_limits(LLM_CONCURRENCY_LIMITS) if limits is None else limits
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue_depth = max_queue_depth
+        self.queue_timeout = queue_timeout
+        self.retry_attempts = retry_attempts
+        self.retry_max_wait = retry_max_wait
+        self._active: Dict[str, int] = {}
+        self._active_total = 0
+        self._waiters: List = []  # (우선순위, 순번, _Waiter) 힙
+        self._sequence = itertools.count()
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        # 지표
+        self.admitted = 0
+        self.queued = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.rejected = 0
+        self.total_queue_wait = 0.0
+
+    def _refill(self):
+        if not self.tokens_per_minute:
+            return
+        now = time.monotonic()
+        self._tokens = min(self.tokens_per_minute, self._tokens + (now - self._refilled_at) * self.tokens_per_minute / 60)
+        self._refilled_at = now
+
+    def _type_full(self, call_type: str) -> bool:
+        return self._active.get(call_type, 0) >= self.limits.get(call_type, self.max_concurrency)
+
+    def _budget_short(self, tokens: int) -> float:
+        """
+        :return: 예산이 모자란 토큰 수 (충분하면 0)
+        """
+        if not self.tokens_per_minute:
+            return 0.0
+        # 추정치가 예산 전체보다 크면 버킷이 가득 찼을 때 들어갈 수 있도록 함
+        return max(0.0, min(tokens, self.tokens_per_minute) - self._tokens)
+
+    def _admit(self, call_type: str, tokens: int):
+        self._active[call_type] = self._active.get(call_type, 0) + 1
+        self._active_total += 1
+        if self.tokens_per_minute:
+            self._tokens -= tokens
+        self.admitted += 1
+
+    def _release(self, call_type: str, estimated_tokens: int, used_tokens: Optional[int]):
+        """
+        슬롯을 반납하고, 실제 사용량을 알면 추정치와의 차이를 토큰 예산에 정산한 뒤 대기 중인 호출을 들여보냅니다.
+        """
+        self._active[call_type] -= 1
+        self._active_total -= 1
+        if self.tokens_per_minute and used_tokens is not None:
+            self._tokens += estimated_tokens - used_tokens
+        self._dispatch()
+
+    def _dispatch(self):
+        """
+        대기 중인 호출을 우선순위 순으로 들여보냅니다.
+        """
+        self._refill()
+        skipped = []
+        short = 0.0
+        while self._waiters:
+            entry = self._waiters[0]
+            waiter = entry[2]
+            if waiter.future.done():  # 시간 초과/취소된 대기
+                heapq.heappop(self._waiters)
+                continue
+            if self._type_full(waiter.call_type):
+                skipped.append(heapq.heappop(self._waiters))
+                continue
+            if self._active_total >= self.max_concurrency:
+                break
+            short = self._budget_short(waiter.tokens)
+            if short:
+                break
+            heapq.heappop(self._waiters)
+            self._admit(waiter.call_type, waiter.tokens)
+            waiter.future.set_result(None)
+        for entry in skipped:
+            heapq.heappush(self._waiters, entry)
+
+        if short and self._wakeup is None:
+            # 토큰이 찰 때까지 기다렸다가 다시 배분
+            delay = short / (self.tokens_per_minute / 60)
+            self._wakeup = asyncio.get_running_loop().call_later(delay, self._on_wakeup)
+
+    def _on_wakeup(self):
+        self._wakeup = None
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, call_type: str, estimated_tokens: int = 0, priority: Optional[int] = None):
+        """
+        호출 슬롯을 얻습니다. 블록이 끝나면 슬롯을 반납하고 토큰 사용량을 정산합니다.
+        :param call_type: 호출 종류 (answer, refine, embedding, keywords)
+        :param estimated_tokens: 추정 토큰 수 (토큰 예산 차감용)
+        :param priority: 우선순위 (기본값은 호출 종류별 기본값)
+        """
+        if priority is None:
+            priority = DEFAULT_PRIORITIES.get(call_type, PRIORITY_BACKGROUND)
+        self._refill()
+        if not self._waiters and not self._type_full(call_type) and self._active_total < self.max_concurrency \
+                and not self._budget_short(estimated_tokens):
+            self._admit(call_type, estimated_tokens)
+        else:
+            waiter = _Waiter(call_type, estimated_tokens, asyncio.get_running_loop().create_future())
+            heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+            self.queued += 1
+            started = time.perf_counter()
+            self._dispatch()
+            try:
+                # wait_for는 파이썬 버전에 따라 슬롯을 받은 직후의 취소를 삼키거나 그대로 올리므로,
+                # 대기 결과와 취소를 직접 구분할 수 있는 asyncio.wait를 사용
+                await asyncio.wait((waiter.future,), timeout=self.queue_timeout)
+            except BaseException:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    # 슬롯을 넘겨받은 뒤 재개되기 전에 취소됨: 슬롯과 토큰을 돌려주고 다음 대기에 넘김
+                    self._release(call_type, estimated_tokens, used_tokens=0)
+                else:
+                    waiter.future.cancel()
+                raise
+            finally:
+                self.total_queue_wait += time.perf_counter() - started
+            if not waiter.future.done():
+                waiter.future.cancel()  # _dispatch가 건너뛰도록 표시
+                self.timeouts += 1
+                raise LLMOverloadedError(f"OpenAI 호출 슬롯을 {self.queue_timeout:g}초 안에 얻지 못했습니다. ({call_type})")
+
+        lease = LLMLease(call_type, estimated_tokens)
+        try:
+            yield lease
+        finally:
+            self._release(call_type, estimated_tokens, lease.used_tokens)
+
+    async def with_retry(self, call_type: str, request: Callable[[], Awaitable]):
+        """
+        재시도 가능한 오류가 나면 지터가 있는 지수 백오프로 다시 요청합니다. (슬롯은 재시도 동안 유지)
+        :param call_type: 호출 종류 (지표용)
+        :param request: 요청 코루틴을 만드는 함수
+        """
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(self.retry_attempts),
+            wait=wait_random_exponential(multiplier=0.5, max=self.retry_max_wait),
+            retry=retry_if_exception_type(RETRYABLE_ERRORS),
+            before_sleep=self._on_retry,
+            reraise=True,
+        ):
+            with attempt:
+                with track_openai_call(call_type):
+                    return await request()
+
+    def _on_retry(self, retry_state):
+        self.retries += 1
+        print(f"⚠️ OpenAI 호출 재시도 {retry_state.attempt_number}회: {retry_state.outcome.exception()}")
+
+    async def call(self, call_type: str, request: Callable[[], Awaitable], estimated_tokens: int = 0,
+                   priority: Optional[int] = None):
+        """
+        슬롯을 얻어 재시도와 함께 요청하고 사용량을 정산합니다. (스트리밍이 아닌 호출용)
+        :return: 응답
+        """
+        async with self.slot(call_type, estimated_tokens, priority) as lease:
+            response = await self.with_retry(call_type, request)
+            lease.record_usage(getattr(response, "usage", None))
+            return response
+
+    def waiting(self, priority: Optional[int] = None) -> int:
+        return sum(
+            1 for entry_priority, _, waiter in self._waiters
+            if not waiter.future.done() and (priority is None or entry_priority == priority)
+        )
+
+    def admission_retry_after(self) -> Optional[int]:
+        """
+        새 사용자 요청을 받을 수 있는지 확인합니다.
+        :return: 받을 수 없으면 Retry-After 초, 받을 수 있으면 None
+        """
+        retry_after = None
+        if self.waiting(PRIORITY_USER) >= self.max_queue_depth:
+            retry_after = LLM_ADMISSION_RETRY_AFTER_SECONDS
+        elif self.tokens_per_minute:
+            self._refill()
+            if self._tokens < 0:
+                # 실제 사용량이 추정치를 넘어 예산이 빚진 상태: 다시 찰 때까지의 시간
+                retry_after = max(LLM_ADMISSION_RETRY_AFTER_SECONDS, math.ceil(-self._tokens / (self.tokens_per_minute / 60)))
+        if retry_after is not None:
+            self.rejected += 1
+        return retry_after
+
+    def get_stats(self) -> Dict:
+        return {
+            "active": dict(self._active),
+            "active_total": self._active_total,
+            "waiting": self.waiting(),
+            "waiting_user": self.waiting(PRIORITY_USER),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "avg_queue_wait_ms": self.total_queue_wait / self.queued * 1000 if self.queued else 0.0,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "tokens_available": self._tokens if self.tokens_per_minute else None,
+            "limits": {"total": self.max_concurrency, **self.limits},
+            "tokens_per_minute": self.tokens_per_minute,
+        }
@@ -0,0 +1,390 @@
+from typing import Dict, List, Optional, Set
+import json
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+from app.config import (
+    EMBEDDING_DIMENSIONS,
+    EMBEDDING_MODEL,
+    LOCAL_INDEX_DIR,
+    LOCAL_INDEX_RELOAD_INTERVAL_SECONDS,
+    LOCAL_INDEX_KEEP_GENERATIONS,
+    SEARCH_SCORE_THRESHOLD,
+)
+from app.repositories.search_batcher import SearchBatcher
+
+class LocalVectorRepository:
+    """
+    FAQ 임베딩을 프로세스 메모리의 float32 행렬로 두고 내적으로 전수 검색하는 로컬 검색 백엔드.
+    MilvusRepository와 같은 인터페이스를 제공하므로 VECTOR_BACKEND 설정으로 바꿔 쓸 수 있습니다.
+    임베딩은 .npy 스냅샷을 메모리 매핑하여 읽으므로 여러 uvicorn 워커가 같은 페이지를 공유합니다.
+    """
+    META_FILE = "meta.json"
+    RELOAD_ATTEMPTS = 3  # 읽는 사이 스냅샷이 교체되어 파일이 없으면 meta를 다시 읽어 재시도
+
+    def __init__(self, index_dir: str = LOCAL_INDEX_DIR, dimensions: int = EMBEDDING_DIMENSIONS,
+                 reload_interval: float = LOCAL_INDEX_RELOAD_INTERVAL_SECONDS):
+        self.index_dir = index_dir
+        self.dimensions = dimensions
+        self.reload_interval = reload_interval
+        self.data_version = 0  # FAQ 데이터가 변경될 때마다 증가 (캐시 무효화용)
+        self.search_batcher = SearchBatcher(self.find_similar_faqs_batch)  # 동시 검색 요청 배치 처리
+        self._lock = threading.Lock()
+        # 스냅샷 (메모리 매핑된 행렬과 질문/답변 목록)
+        self._matrix = np.empty((0, dimensions), dtype=np.float32)
+        self._faqs: List[Dict] = []
+        self._snapshot_mtime = None
+        self._last_reload_check = 0.0
+        self._initialized = False
+        # 아직 스냅샷에 반영되지 않은 삽입분
+        self._pending_embeddings: List[np.ndarray] = []
+        self._pending_faqs: List[Dict] = []
+        self._pending_matrix: Optional[np.ndarray] = None
+        self._pending_answers: Dict[str, str] = {}  # 아직 스냅샷에 반영되지 않은 답변 변경 (다시 불러온 스냅샷에 다시 적용)
+        self._questions: Set[str] = set()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def initialize(self):
+        """
+        디스크의 스냅샷을 메모리 매핑으로 불러옵니다.
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        self.reload(force=True)
+        self._initialized = True
+
+    def is_ready(self) -> bool:
+        """
+        스냅샷을 불러와 검색할 수 있는 상태인지 확인합니다.
+        """
+        return self._initialized
+
+    def close(self):
+        """
+        메모리 매핑된 스냅샷을 해제합니다.
+        """
+        with self._lock:
+            self._matrix = np.empty((0, self.dimensions), dtype=np.float32)
+            self._faqs = []
+            self._snapshot_mtime = None
+        self._initialized = False
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        스냅샷이 바뀌었으면 다시 불러옵니다. (다른 워커나 동기화 작업이 새 스냅샷을 쓴 경우)
+        :param force: 변경 여부와 관계없이 다시 불러올지 여부
+        :return: 다시 불러왔는지 여부
+        """
+        meta_path = self._path(self.META_FILE)
+        for attempt in range(1, self.RELOAD_ATTEMPTS + 1):
+            if not os.path.exists(meta_path):
+                return False
+            mtime = os.path.getmtime(meta_path)
+            if not force and mtime == self._snapshot_mtime:
+                return False
+            try:
+                with open(meta_path, encoding="utf-8") as f:
+                    meta = json.load(f)
+                if meta["dimensions"] != self.dimensions:
+                    raise ValueError(f"로컬 인덱스 차원({meta['dimensions']})이 설정({self.dimensions})과 다릅니다.")
+                matrix = np.load(self._path(meta["embeddings_file"]), mmap_mode="r")
+                with open(self._path(meta["faqs_file"]), encoding="utf-8") as f:
+                    faqs = json.load(f)
+                break
+            except FileNotFoundError:
+                # 다른 워커가 그사이 새 스냅샷을 쓰고 오래된 세대를 지움: 새 meta로 다시 시도
+                if attempt == self.RELOAD_ATTEMPTS:
+                    raise
+
+        with self._lock:
+            if self._pending_answers:
+                # 다른 워커가 더 새 스냅샷을 먼저 써도 이 워커의 flush 전 답변 변경이 사라지지 않도록 다시 적용
+                faqs = [
+                    {"question": faq["question"], "answer": self._pending_answers[faq["question"]]}
+                    if faq["question"] in self._pending_answers else faq
+                    for faq in faqs
+                ]
+            self._matrix, self._faqs = matrix, faqs
+            self._questions = {faq["question"] for faq in faqs} | {faq["question"] for faq in self._pending_faqs}
+            self._snapshot_mtime = mtime
+            self.data_version += 1
+        print(f"✅ 로컬 벡터 인덱스 로드 완료: {len(faqs)}개")
+        return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_reload_check >= self.reload_interval:
+            self._last_reload_check = now
+            try:
+                self.reload()
+            except FileNotFoundError as e:
+                # 검색 요청은 실패시키지 않고 지금 매핑된 스냅샷으로 계속 처리, 다음 확인 주기에 다시 시도
+                print(f"⚠️ 로컬 벡터 인덱스 다시 불러오기 실패, 기존 스냅샷 사용: {e}")
+
+    def is_empty(self) -> bool:
+        return not self._faqs and not self._pending_faqs
+
+    def count(self) -> int:
+        return len(self._faqs) + len(self._pending_faqs)
+
+    def iter_faqs(self):
+        """
+        저장된 (질문, 답변)을 순회합니다.
+        """
+        with self._lock:
+            faqs = self._faqs + self._pending_faqs
+        for faq in faqs:
+            yield faq["question"], faq["answer"]
+
+    def iter_records(self, batch_size: int = 1000):
+        """
+        저장된 데이터를 임베딩과 함께 배치 단위로 순회합니다. (코퍼스 내보내기용)
+        :return: (질문 목록, 답변 목록, (N, dim) float32 임베딩 행렬) 이터레이터
+        """
+        with self._lock:
+            matrix, faqs = self._snapshot_view()
+        for start in range(0, len(faqs), batch_size):
+            batch = faqs[start:start + batch_size]
+            yield [faq["question"] for faq in batch], [faq["answer"] for faq in batch], np.asarray(matrix[start:start + batch_size])
+
+    def is_question_exists(self, question: str) -> bool:
+        return question in self._questions
+
+    def existing_questions(self, questions: List[str]) -> Set[str]:
+        return {question for question in questions if question in self._questions}
+
+    def insert_faqs(self, questions: List[str], answers: List[str], embeddings: List[List[float]]):
+        """
+        데이터를 삽입합니다. 삽입분은 바로 검색되며, flush 시 스냅샷으로 저장됩니다.
+        """
+        if not questions:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(questions), self.dimensions)
+        with self._lock:
+            self._pending_embeddings.append(vectors)
+            self._pending_faqs.extend({"question": q, "answer": a} for q, a in zip(questions, answers))
+            self._pending_matrix = None
+            self._questions.update(questions)
+            self.data_version += 1
+
+    def insert_faq(self, cleaned_question, cleaned_answer, embedding):
+        if self.is_question_exists(cleaned_question):
+            print(f"⚠️ 이미 존재하는 질문: {cleaned_question}")
+            return
+        self.insert_faqs([cleaned_question], [cleaned_answer], [embedding])
+
+    def update_answers(self, questions: List[str], answers: List[str]) -> int:
+        """
+        임베딩은 그대로 두고 답변만 바꿉니다. (flush 시 스냅샷에 반영)
+        flush 전에 다른 스냅샷을 다시 불러와도 변경은 다시 적용됩니다.
+        :return: 갱신한 행 수
+        """
+        updates = dict(zip(questions, answers))
+        updated = 0
+        with self._lock:
+            self._pending_answers.update((q, a) for q, a in updates.items() if q in self._questions)
+            for faqs in (self._faqs, self._pending_faqs):
+                for i, faq in enumerate(faqs):
+                    answer = updates.get(faq["question"])
+                    if answer is not None:
+                        # 검색 중인 요청이 보고 있는 dict는 건드리지 않고 교체
+                        faqs[i] = {"question": faq["question"], "answer": answer}
+                        updated += 1
+            if updated:
+                self.data_version += 1
+        return updated
+
+    def delete_faqs(self, questions: List[str]):
+        """
+        질문을 삭제하고 남은 데이터로 새 스냅샷을 저장합니다.
+        """
+        removed = set(questions) & self._questions
+        if not removed:
+            return
+        with self._lock:
+            matrix, faqs = self._snapshot_view()
+            keep = [i for i, faq in enumerate(faqs) if faq["question"] not in removed]
+            matrix = np.asarray(matrix)[keep]
+            faqs = [faqs[i] for i in keep]
+            self._pending_embeddings, self._pending_faqs, self._pending_matrix = [], [], None
+            self._pending_answers = {}
+            self._questions -= removed
+        self.write_snapshot(faqs, matrix)
+        self.reload(force=True)
+
+    def delete_all(self):
+        with self._lock:
+            self._matrix = np.empty((0, self.dimensions), dtype=np.float32)
+            self._faqs = []
+            self._pending_embeddings, self._pending_faqs, self._pending_matrix = [], [], None
+            self._pending_answers = {}
+            self._questions = set()
+            self.data_version += 1
+        self.flush()
+
+    def flush(self):
+        """
+        현재 데이터 전체를 새 스냅샷으로 저장하고 메모리 매핑으로 다시 불러옵니다.
+        """
+        with self._lock:
+            matrix, faqs = self._snapshot_view()
+            answers = dict(self._pending_answers)
+        self.write_snapshot(faqs, matrix)
+        with self._lock:
+            # 스냅샷에 반영된 만큼만 대기 목록에서 제거 (쓰는 사이 다시 바뀐 답변은 남김)
+            for question, answer in answers.items():
+                if self._pending_answers.get(question) == answer:
+                    del self._pending_answers[question]
+            written = len(faqs) - len(self._faqs)
+            del self._pending_faqs[:written]
+            remaining = np.vstack(self._pending_embeddings)[written:] if self._pending_embeddings else None
+            self._pending_embeddings = [remaining] if remaining is not None and len(remaining) else []
+            self._pending_matrix = None
+        self.reload(force=True)
+
+    def _snapshot_view(self):
+        pending = self._get_pending_matrix()
+        if pending is None:
+            return self._matrix, list(self._faqs)
+        return np.vstack([self._matrix, pending]), self._faqs + self._pending_faqs
+
+    def _get_pending_matrix(self) -> Optional[np.ndarray]:
+        if not self._pending_embeddings:
+            return None
+        if self._pending_matrix is None:
+            self._pending_matrix = np.vstack(self._pending_embeddings)
+        return self._pending_matrix
+
+    def write_snapshot(self, faqs: List[Dict], embeddings):
+        """
+        스냅샷 파일을 임시 디렉터리에 쓴 뒤 원자적으로 교체합니다.
+        :param faqs: {"question", "answer"} 목록
+        :param embeddings: (N, dimensions) 임베딩 행렬
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        version = time.time_ns()
+        embeddings_file = f"embeddings-{version}.npy"
+        faqs_file = f"faqs-{version}.json"
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32).reshape(-1, self.dimensions)
+
+        np.save(self._path(embeddings_file), matrix)
+        with open(self._path(faqs_file), "w", encoding="utf-8") as f:
+            json.dump(faqs, f, ensure_ascii=False)
+        meta = {
+            "embeddings_file": embeddings_file,
+            "faqs_file": faqs_file,
+            "count": len(faqs),
+            "dimensions": self.dimensions,
+            "model": EMBEDDING_MODEL,
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.index_dir, suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._path(self.META_FILE))
+        self._remove_stale_files()
+
+    def _remove_stale_files(self, keep_generations: int = LOCAL_INDEX_KEEP_GENERATIONS):
+        """
+        최근 keep_generations 세대를 제외한 스냅샷 파일을 지웁니다.
+        다른 워커가 이전 meta를 읽고 아직 파일을 열지 않았을 수 있으므로 바로 이전 세대는 남겨 둡니다.
+        (이미 매핑된 파일은 지워도 매핑이 유지되므로 unlink만 수행, POSIX)
+        """
+        files: Dict[int, List[str]] = {}
+        for name in os.listdir(self.index_dir):
+            prefix, _, rest = name.partition("-")
+            if prefix in ("embeddings", "faqs") and rest.split(".")[0].isdigit():
+                files.setdefault(int(rest.split(".")[0]), []).append(name)
+        for version in sorted(files, reverse=True)[keep_generations:]:
+            for name in files[version]:
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    pass
+
+    def snapshot_from_milvus(self, milvus_repo, batch_size: int = 1000) -> int:
+        """
+        Milvus 컬렉션 전체를 스트리밍으로 읽어 로컬 스냅샷을 만듭니다.
+        :param milvus_repo: 초기화된 MilvusRepository
+        :param batch_size: 한 번에 읽을 행 수
+        :return: 저장한 행 수
+        """
+        iterator = milvus_repo.collection.query_iterator(
+            batch_size=batch_size, expr="", output_fields=["question", "answer", "embedding"]
+        )
+        faqs, chunks = [], []
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+                faqs.extend({"question": row["question"], "answer": row["answer"]} for row in rows)
+                chunks.append(np.asarray([row["embedding"] for row in rows], dtype=np.float32))
+        finally:
+            iterator.close()
+
+        matrix = np.vstack(chunks) if chunks else np.empty((0, self.dimensions), dtype=np.float32)
+        self.write_snapshot(faqs, matrix)
+        with self._lock:
+            self._pending_embeddings, self._pending_faqs, self._pending_matrix = [], [], None
+        self.reload(force=True)
+        print(f"✅ Milvus -> 로컬 인덱스 동기화 완료: {len(faqs)}개")
+        return len(faqs)
+
+    def find_similar_faqs(self, embedding, top_k: int = 10, score_threshold: float = SEARCH_SCORE_THRESHOLD):
+        """
+        로컬 인덱스에서 유사 질문 검색
+        """
+        return self.find_similar_faqs_batch([embedding], top_k, score_threshold)[0]
+
+    def find_similar_faqs_batch(self, embeddings, top_k: int = 10, score_threshold: float = SEARCH_SCORE_THRESHOLD):
+        """
+        여러 임베딩을 행렬 곱 한 번으로 검색하고 argpartition으로 top-k를 고릅니다.
+        """
+        self._maybe_reload()
+        with self._lock:
+            matrix, faqs = self._matrix, self._faqs
+            pending, pending_faqs = self._get_pending_matrix(), list(self._pending_faqs)
+
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dimensions)
+        scores = np.asarray(matrix @ queries.T)  # (N, B)
+        if pending is not None:
+            scores = np.vstack([scores, pending @ queries.T])
+            faqs = faqs + pending_faqs
+
+        total = scores.shape[0]
+        if total == 0:
+            return [[] for _ in range(len(queries))]
+        k = min(top_k, total)
+        if k < total:
+            candidates = np.argpartition(-scores, k - 1, axis=0)[:k]  # (k, B)
+        else:
+            candidates = np.broadcast_to(np.arange(total)[:, None], (total, len(queries)))
+
+        results = []
+        for column in range(len(queries)):
+            indices = candidates[:, column]
+            column_scores = scores[indices, column]
+            order = np.argsort(-column_scores)
+            results.append([
+                {**faqs[indices[i]], "score": float(column_scores[i])}
+                for i in order if column_scores[i] > score_threshold
+            ])
+        return results
+
+    async def search_async(self, embedding, top_k: int = 10):
+        """
+        이벤트 루프를 막지 않는 유사 질문 검색
+        """
+        return await self.search_batcher.submit(embedding, top_k)
+
+
+if __name__ == "__main__":
+    # Milvus 컬렉션을 로컬 스냅샷으로 내보냅니다: python -m app.repositories.local_vector_repository
+    from app.repositories.milvus_repository import MilvusRepository
+    milvus_repo = MilvusRepository()
+    milvus_repo.initialize()
+    LocalVectorRepository().snapshot_from_milvus(milvus_repo)
+    milvus_repo.close()
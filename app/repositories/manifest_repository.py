@@ -0,0 +1,76 @@
+from typing import Dict, Iterable, Optional
+import hashlib
+import uuid
+import redis.asyncio as aioredis
+from redis.exceptions import WatchError
+from app.config import REDIS_HOST, REDIS_PORT
+
+UNKNOWN_HASH = "unknown"  # 저장된 답변을 알 수 없는 항목 (다음 동기화에서 변경으로 처리)
+
+def answer_hash(answer: str) -> str:
+    """
+    답변 내용의 해시를 만듭니다. (답변 변경 감지용)
+    """
+    return hashlib.sha256(answer.encode("utf-8")).hexdigest()[:16]
+
+class ManifestRepository:
+    """
+    벡터 저장소에 적재된 FAQ의 목록(질문 -> 답변 해시)을 Redis hash로 관리합니다.
+    증분 동기화 시 컬렉션 전체를 읽지 않고 이 목록만으로 추가/변경/삭제를 판단합니다.
+    동기화가 끝날 때마다 버전을 올려, 다른 워커가 어휘 색인과 응답 캐시를 갱신할 수 있게 합니다.
+    """
+    MANIFEST_KEY = "faq_manifest"
+    VERSION_KEY = "faq_manifest:version"
+    LOCK_KEY = "faq_manifest:lock"
+
+    def __init__(self, redis_host=REDIS_HOST, redis_port=REDIS_PORT, db=0):
+        self.client = aioredis.Redis(host=redis_host, port=redis_port, db=db, decode_responses=True)
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def get_all(self) -> Dict[str, str]:
+        """
+        :return: 질문 -> 답변 해시
+        """
+        return await self.client.hgetall(self.MANIFEST_KEY)
+
+    async def set_many(self, hashes: Dict[str, str]):
+        """
+        질문별 답변 해시를 HSET 한 번으로 저장합니다.
+        """
+        if hashes:
+            await self.client.hset(self.MANIFEST_KEY, mapping=hashes)
+
+    async def remove_many(self, questions: Iterable[str]):
+        questions = list(questions)
+        if questions:
+            await self.client.hdel(self.MANIFEST_KEY, *questions)
+
+    async def get_version(self) -> int:
+        return int(await self.client.get(self.VERSION_KEY) or 0)
+
+    async def bump_version(self) -> int:
+        return await self.client.incr(self.VERSION_KEY)
+
+    async def acquire_lock(self, ttl_seconds: int) -> Optional[str]:
+        """
+        여러 워커가 동시에 동기화하지 않도록 잠금을 겁니다.
+        :param ttl_seconds: 잠금 유지 시간 (작업이 비정상 종료되어도 풀리도록)
+        :return: 잠금 토큰 (이미 잠겨 있으면 None)
+        """
+        token = uuid.uuid4().hex
+        acquired = await self.client.set(self.LOCK_KEY, token, nx=True, ex=ttl_seconds)
+        return token if acquired else None
+
+    async def release_lock(self, token: str):
+        # 다른 워커가 잡은 잠금은 풀지 않도록 토큰이 같을 때만 삭제
+        async with self.client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(self.LOCK_KEY)
+                if await pipe.get(self.LOCK_KEY) == token:
+                    pipe.multi()
+                    pipe.delete(self.LOCK_KEY)
+                    await pipe.execute()
+            except WatchError:
+                pass  # 그 사이 잠금이 만료되어 다른 워커가 가져감
@@ -1,21 +1,131 @@
 from pymilvus import CollectionSchema, DataType, FieldSchema, connections, Collection, utility
+from typing import Dict, List, Optional, Set
 import json
+import numpy as np
+from app.config import (
+    MILVUS_HOST,
+    MILVUS_PORT,
+    MILVUS_COLLECTION,
+    MILVUS_INDEX_TYPE,
+    MILVUS_INDEX_PARAMS,
+    MILVUS_SEARCH_PARAMS,
+    EMBEDDING_DIMENSIONS,
+    SEARCH_NPROBE,
+    SEARCH_HNSW_EF,
+    SEARCH_SCORE_THRESHOLD,
+)
+from app.repositories.search_batcher import SearchBatcher
+
+SUPPORTED_INDEX_TYPES = ("FLAT", "IVF_FLAT", "IVF_SQ8", "IVF_PQ", "HNSW")
+
+def _parse_params(raw: str) -> Dict:
+    return json.loads(raw) if raw else {}
+
+def build_index_params(index_type: str, dimensions: int, overrides: Optional[Dict] = None) -> Dict:
+    """
+    인덱스 종류별 기본 생성 파라미터에 설정값을 덮어써서 create_index 인자를 만듭니다.
+    :param index_type: FLAT, IVF_FLAT, IVF_SQ8, IVF_PQ, HNSW
+    :param dimensions: 벡터 차원 수 (IVF_PQ의 부분 벡터 수 m은 차원 수의 약수여야 함)
+    :param overrides: 덮어쓸 파라미터
+    """
+    if index_type not in SUPPORTED_INDEX_TYPES:
+        raise ValueError(f"지원하지 않는 인덱스 종류입니다: {index_type} (지원: {', '.join(SUPPORTED_INDEX_TYPES)})")
+    defaults = {
+        "FLAT": {},
+        "IVF_FLAT": {"nlist": 128},
+        "IVF_SQ8": {"nlist": 128},
+        "IVF_PQ": {"nlist": 128, "m": max(1, dimensions // 16), "nbits": 8},  # 부분 벡터당 16차원 -> 8비트 코드
+        "HNSW": {"M": 16, "efConstruction": 200},
+    }[index_type]
+    return {"index_type": index_type, "metric_type": "IP", "params": {**defaults, **(overrides or {})}}
+
+def build_search_params(index_type: str, overrides: Optional[Dict] = None) -> Dict:
+    """
+    인덱스 종류에 맞는 검색 파라미터를 만듭니다. (IVF 계열은 nprobe, HNSW는 ef)
+    """
+    if index_type.startswith("IVF"):
+        defaults = {"nprobe": SEARCH_NPROBE}
+    elif index_type == "HNSW":
+        defaults = {"ef": SEARCH_HNSW_EF}
+    else:
+        defaults = {}
+    return {"metric_type": "IP", "params": {**defaults, **(overrides or {})}}
 
 class MilvusRepository:
-    def __init__(self):
-        self.collection_name = "faq_collection"
+    def __init__(
+        self,
+        collection_name: str = MILVUS_COLLECTION,
+        index_type: str = MILVUS_INDEX_TYPE,
+        dimensions: int = EMBEDDING_DIMENSIONS,
+        index_params: Optional[Dict] = None,
+        search_params: Optional[Dict] = None,
+    ):
+        self.collection_name = collection_name
+        self.index_type = index_type
+        self.dimensions = dimensions
+        if index_params is None:
+            index_params = _parse_params(MILVUS_INDEX_PARAMS)
+        self.index_params = build_index_params(index_type, dimensions, index_params)
+        self._search_overrides = _parse_params(MILVUS_SEARCH_PARAMS) if search_params is None else search_params
+        self.search_params = build_search_params(index_type, self._search_overrides)
         self.collection = None
-        self.initialize()
+        self.data_version = 0  # FAQ 데이터가 변경될 때마다 증가 (캐시 무효화용)
+        self.search_batcher = SearchBatcher(self.find_similar_faqs_batch)  # 동시 검색 요청 배치 처리
+        # 연결과 컬렉션 로드는 initialize()에서 한 번만 수행 (앱 시작 시 호출)
 
     def initialize(self):
         """
-        Milvus 초기화
+        Milvus 초기화 (이미 컬렉션을 불러왔으면 다시 연결하지 않음)
         """
-        connections.connect("default", host="localhost", port="19530")
+        if self.collection is not None:
+            return
+        connections.connect("default", host=MILVUS_HOST, port=MILVUS_PORT)
         if not utility.has_collection(self.collection_name):
             self.init_milvus()
-        self.collection = Collection(self.collection_name)
-        self.collection.load()
+        collection = Collection(self.collection_name)
+        self._check_collection(collection)
+        collection.load()
+        self.collection = collection
+
+    def _check_collection(self, collection: Collection):
+        """
+        기존 컬렉션의 벡터 차원과 인덱스가 설정과 맞는지 확인합니다.
+        차원이 다르면 검색할 수 없으므로 오류를 내고, 인덱스 종류만 다르면 실제 인덱스에 맞는 검색 파라미터를 사용합니다.
+        """
+        field = next(field for field in collection.schema.fields if field.name == "embedding")
+        dim = int(field.params.get("dim", 0))
+        if dim != self.dimensions:
+            raise ValueError(
+                f"컬렉션 '{self.collection_name}'의 벡터 차원({dim})이 EMBEDDING_DIMENSIONS({self.dimensions})와 다릅니다. "
+                "다른 컬렉션 이름(MILVUS_COLLECTION)을 쓰거나 컬렉션을 다시 만들어 적재하세요."
+            )
+        if collection.has_index():
+            index_type = collection.index().params.get("index_type", self.index_type)
+            if index_type != self.index_type:
+                print(f"⚠️ 컬렉션 인덱스({index_type})가 MILVUS_INDEX_TYPE({self.index_type})와 다릅니다. 기존 인덱스로 검색합니다.")
+                self.index_type = index_type
+                self.search_params = build_search_params(index_type, self._search_overrides)
+
+    def is_ready(self) -> bool:
+        """
+        컬렉션을 불러와 검색할 수 있는 상태인지 확인
+        """
+        return self.collection is not None
+
+    def close(self):
+        """
+        Milvus 연결을 닫습니다.
+        """
+        if self.collection is None:
+            return
+        self.collection = None
+        connections.disconnect("default")
+
+    def is_empty(self) -> bool:
+        """
+        컬렉션이 비어 있는지 확인
+        """
+        return self.collection.is_empty
 
     def is_question_exists(self, question: str) -> bool:
         """
@@ -30,30 +140,95 @@ class MilvusRepository:
             limit=1
         )
         return len(search_results) > 0
+
+    def existing_questions(self, questions: List[str]) -> Set[str]:
+        """
+        여러 질문 중 Milvus에 이미 존재하는 질문을 한 번의 쿼리로 확인
+        """
+        if not questions:
+            return set()
+        search_results = self.collection.query(
+            expr=f"question in {json.dumps(list(questions), ensure_ascii=False)}",
+            output_fields=["question"],
+            limit=len(questions)
+        )
+        return {result["question"] for result in search_results}
     
 
-    def find_similar_faqs(self, embedding, top_k: int = 10):
+    def find_similar_faqs(self, embedding, top_k: int = 10, score_threshold: float = SEARCH_SCORE_THRESHOLD):
         """
         Milvus에서 유사 질문 검색
         """
-        search_params = {"metric_type": "IP", "params": {"nprobe": 10}}
+        return self.find_similar_faqs_batch([embedding], top_k, score_threshold)[0]
+
+    def find_similar_faqs_batch(self, embeddings, top_k: int = 10, score_threshold: float = SEARCH_SCORE_THRESHOLD):
+        """
+        여러 임베딩의 유사 질문을 한 번의 다중 벡터 검색으로 조회
+        """
         results = self.collection.search(
-            data=[embedding],
+            data=list(embeddings),
             anns_field="embedding",
-            param=search_params,
+            param=self.search_params,
             limit=top_k,
             output_fields=["question", "answer"]
         )
         return [
-            {"question": hit.entity.get("question"), "answer": hit.entity.get("answer")}
+            [
+                {"question": hit.entity.get("question"), "answer": hit.entity.get("answer"), "score": hit.score}
+                for hit in hits if hit.score > score_threshold
+            ]
             for hits in results
-            for hit in hits if hit.score > 0.3
         ]
+
+    async def search_async(self, embedding, top_k: int = 10):
+        """
+        이벤트 루프를 막지 않는 유사 질문 검색
+        동시에 들어온 요청은 배치로 묶여 한 번에 검색됩니다.
+        """
+        return await self.search_batcher.submit(embedding, top_k)
+
+    def iter_faqs(self, batch_size: int = 1000):
+        """
+        컬렉션의 (질문, 답변)을 이터레이터 커서로 순회
+        """
+        iterator = self.collection.query_iterator(batch_size=batch_size, expr="", output_fields=["question", "answer"])
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+                for row in rows:
+                    yield row["question"], row["answer"]
+        finally:
+            iterator.close()
+
+    def iter_records(self, batch_size: int = 1000):
+        """
+        컬렉션을 임베딩과 함께 배치 단위로 순회 (코퍼스 내보내기용)
+        :return: (질문 목록, 답변 목록, (N, dim) float32 임베딩 행렬) 이터레이터
+        """
+        iterator = self.collection.query_iterator(
+            batch_size=batch_size, expr="", output_fields=["question", "answer", "embedding"]
+        )
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+                yield (
+                    [row["question"] for row in rows],
+                    [row["answer"] for row in rows],
+                    np.asarray([row["embedding"] for row in rows], dtype=np.float32),
+                )
+        finally:
+            iterator.close()
+
     def delete_all(self):
         """
         Milvus에서 모든 데이터 삭제
         """
         self.collection.delete(expr="question != ''")
+        self.data_version += 1
 
     def insert_faq(self, cleaned_question, cleaned_answer, embedding):
         """
@@ -64,26 +239,76 @@ class MilvusRepository:
             return
 
         self.collection.insert([[cleaned_question], [cleaned_answer], [embedding]])
+        self.data_version += 1
         print(f"✅ 질문과 응답 저장 완료: {cleaned_question} -> {cleaned_answer}")
+
+    def insert_faqs(self, questions: List[str], answers: List[str], embeddings: List[List[float]]):
+        """
+        Milvus에 여러 데이터를 컬럼 단위로 한 번에 삽입 (flush는 호출하는 쪽에서 한 번만 수행)
+        """
+        if not questions:
+            return
+        self.collection.insert([questions, answers, embeddings])
+        self.data_version += 1
+
+    def get_embeddings(self, questions: List[str]) -> Dict[str, List[float]]:
+        """
+        저장된 질문의 임베딩을 한 번의 쿼리로 조회
+        """
+        if not questions:
+            return {}
+        rows = self.collection.query(
+            expr=f"question in {json.dumps(list(questions), ensure_ascii=False)}",
+            output_fields=["question", "embedding"],
+            limit=len(questions)
+        )
+        return {row["question"]: row["embedding"] for row in rows}
+
+    def update_answers(self, questions: List[str], answers: List[str]) -> int:
+        """
+        기존 임베딩을 그대로 두고 답변만 갱신 (질문이 기본 키이므로 upsert)
+        :return: 갱신한 행 수
+        """
+        embeddings = self.get_embeddings(questions)
+        rows = [(q, a, embeddings[q]) for q, a in zip(questions, answers) if q in embeddings]
+        if not rows:
+            return 0
+        self.collection.upsert([list(column) for column in zip(*rows)])
+        self.data_version += 1
+        return len(rows)
+
+    def delete_faqs(self, questions: List[str]):
+        """
+        여러 질문을 한 번에 삭제
+        """
+        if not questions:
+            return
+        self.collection.delete(expr=f"question in {json.dumps(list(questions), ensure_ascii=False)}")
+        self.data_version += 1
+
+    def flush(self):
+        """
+        삽입된 데이터를 디스크에 반영
+        """
+        self.collection.flush()
+
     def init_milvus(self):
-        connections.connect("default", host="localhost", port="19530")
-        collection_name = "faq_collection"
-        
-        # 새 컬렉션 생성
+        """
+        설정된 차원과 인덱스로 새 컬렉션을 만듭니다. (연결은 initialize()에서 이미 열림)
+        """
         fields = [
             FieldSchema(name="question", dtype=DataType.VARCHAR, max_length=500, is_primary=True),
             FieldSchema(name="answer", dtype=DataType.VARCHAR, max_length=65535),  # 응답 필드 추가
-            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=1536)
+            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=self.dimensions)
         ]
         schema = CollectionSchema(fields=fields, description="FAQ Collection")
-        
-        collection = Collection(collection_name, schema=schema, using="default")
-        
+
+        collection = Collection(self.collection_name, schema=schema, using="default")
+
         # 인덱스 생성
         if not collection.has_index():
-            index_params = {"index_type": "IVF_FLAT", "metric_type": "IP", "params": {"nlist": 128}}
-            collection.create_index(field_name="embedding", index_params=index_params)
-            print("✅ 인덱스 생성 완료")
-        
+            collection.create_index(field_name="embedding", index_params=self.index_params)
+            print(f"✅ 인덱스 생성 완료: {self.index_params}")
+
         collection.load()
-        return collection
\ No newline at end of file
+        return collection
@@ -1,20 +1,85 @@
 import openai
-from app.config import OPENAI_API_KEY
+from app.config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    EMBEDDING_MODEL,
+    EMBEDDING_DIMENSIONS,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MAX_CONCURRENCY,
+)
+from app.repositories.embedding_cache_repository import EmbeddingCacheRepository
+from app.repositories.llm_scheduler import LLMScheduler, PRIORITY_BACKGROUND, estimate_tokens
+from app.metrics import OPENAI_ERRORS, record_openai_usage
 import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 class OpenAIRepository:
     def __init__(self):
-        self.client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
+        # 재시도는 스케줄러가 지터가 있는 백오프로 처리 (SDK 자체 재시도는 끔)
+        self.client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, max_retries=0)
+        self.scheduler = LLMScheduler()
+        self.embedding_cache = EmbeddingCacheRepository(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS)
+
+    async def close(self):
+        """
+        OpenAI HTTP 클라이언트와 임베딩 캐시 커넥션을 닫습니다.
+        """
+        await self.client.close()
+        await self.embedding_cache.close()
 
     async def generate_embedding(self, text: str):
         """
         OpenAI를 사용하여 텍스트를 임베딩으로 변환
+        동일한 텍스트는 임베딩 캐시에서 바로 반환합니다.
+        """
+        cached = await self.embedding_cache.get(text)
+        if cached is not None:
+            return cached
+
+        response = await self.scheduler.call("embedding", lambda: self.client.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=text,
+            dimensions=EMBEDDING_DIMENSIONS
+        ), estimate_tokens(text))
+        record_openai_usage("embedding", response.usage)
+        embedding = response.data[0].embedding
+        await self.embedding_cache.set(text, embedding)
+        return embedding
+
+    async def generate_embeddings(self, texts: list[str], batch_size: int = EMBEDDING_BATCH_SIZE,
+                                  max_concurrency: int = EMBEDDING_MAX_CONCURRENCY) -> list[list[float]]:
+        """
+        여러 텍스트를 배치 단위로 묶어 임베딩합니다.
+        캐시에 없는 텍스트만 batch_size개씩 한 요청으로 보내며, 동시에 max_concurrency개 요청까지 보냅니다.
+        대량 적재용이므로 스케줄러에서 사용자 요청보다 낮은 우선순위로 처리합니다.
+        :param texts: 임베딩할 텍스트 목록
+        :param batch_size: 요청 1회당 텍스트 수
+        :param max_concurrency: 동시 요청 수
+        :return: 입력 순서와 같은 임베딩 목록
         """
-        response = await self.client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
-        )
-        return response.data[0].embedding
+        embeddings = await self.embedding_cache.get_many(texts)
+        missing = [text for text in dict.fromkeys(texts) if text not in embeddings]
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def embed_batch(batch: list[str]):
+            async with semaphore:
+                response = await self.scheduler.call("embedding", lambda: self.client.embeddings.create(
+                    model=EMBEDDING_MODEL,
+                    input=batch,
+                    dimensions=EMBEDDING_DIMENSIONS
+                ), sum(estimate_tokens(text) for text in batch), priority=PRIORITY_BACKGROUND)
+            record_openai_usage("embedding", response.usage)
+            result = {batch[item.index]: item.embedding for item in response.data}
+            await self.embedding_cache.set_many(result)
+            embeddings.update(result)
+
+        await asyncio.gather(*[
+            embed_batch(missing[i:i + batch_size]) for i in range(0, len(missing), batch_size)
+        ])
+        return [embeddings[text] for text in texts]
 
     async def refine_question(self, session_context: str, question: str) -> str:
         """
@@ -23,8 +88,7 @@ class OpenAIRepository:
         :param question: 사용자가 입력한 질문
         :return: 정제된 질문
         """
-        print(f"정제할 질문: {question}")  # 디버깅용 출력
-        print(f"세션 맥락: {session_context}")
+        logger.debug("정제할 질문: %s / 세션 맥락: %s", question, session_context)
         if not session_context:
             return question
         prompt = f"""
@@ -37,7 +101,7 @@ class OpenAIRepository:
 
         정제된 질문:
         """
-        response = await self.client.chat.completions.create(
+        response = await self.scheduler.call("refine", lambda: self.client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are a helpful assistant."},
@@ -45,12 +109,13 @@ class OpenAIRepository:
             ],
             max_tokens=100,
             temperature=0.5
-        )
+        ), estimate_tokens(prompt, 100))
+        record_openai_usage("refine", response.usage)
         return response.choices[0].message.content.strip()
 
     async def stream_answer_question(self, refined_question: str, context: str):
         """
-        OpenAI GPT 모델을 사용하여 SSE 방식으로 응답을 스트리밍합니다.
+        OpenAI GPT 모델의 응답을 토큰 조각(delta) 단위로 스트리밍합니다. (SSE 이벤트 구성은 호출하는 쪽에서 함)
         :param refined_question: 정제된 질문
         :param context: 참고할 FAQ 컨텍스트
         """
@@ -77,22 +142,34 @@ class OpenAIRepository:
             **답변:**
 
         """
-        response = await self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            stream=True,  # 스트리밍 활성화
-            max_tokens=500,
-            temperature=0.7
-        )
-
-        # 스트리밍 응답 처리
-        async for chunk in response:
-            choice = chunk.choices[0].delta.content
-            if choice:
-                yield f"data: {choice}"
+        # 슬롯은 스트림이 끝날 때까지 유지하고, 재시도는 스트림을 여는 요청에만 적용 (이미 보낸 메시지는 되돌릴 수 없음)
+        async with self.scheduler.slot("answer", estimate_tokens(prompt, 500)) as lease:
+            response = await self.scheduler.with_retry("answer", lambda: self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": "You are a helpful assistant."},
+                    {"role": "user", "content": prompt}
+                ],
+                stream=True,  # 스트리밍 활성화
+                stream_options={"include_usage": True},  # 마지막 청크에 토큰 사용량 포함
+                max_tokens=500,
+                temperature=0.7
+            ))
+
+            # 스트리밍 응답 처리
+            try:
+                async for chunk in response:
+                    if chunk.usage is not None:
+                        record_openai_usage("answer", chunk.usage)
+                        lease.record_usage(chunk.usage)
+                    if not chunk.choices:  # 사용량만 담긴 마지막 청크
+                        continue
+                    choice = chunk.choices[0].delta.content
+                    if choice:
+                        yield choice
+            except Exception as e:
+                OPENAI_ERRORS.inc("answer", type(e).__name__)
+                raise
     async def extract_keyword(self, question: str) -> list[str] :
         """
         질문에서 핵심 키워드 리스트를 추출합니다.
@@ -121,7 +198,7 @@ class OpenAIRepository:
             
 
         """
-        response = await self.client.chat.completions.create(
+        response = await self.scheduler.call("keywords", lambda: self.client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are a helpful assistant."},
@@ -129,6 +206,55 @@ class OpenAIRepository:
             ],
             max_tokens=100,
             temperature=0.5
-        )
+        ), estimate_tokens(prompt, 100))
+        record_openai_usage("keywords", response.usage)
         keywords = response.choices[0].message.content.strip().split(",")
         return [keyword.strip() for keyword in keywords]
+
+    async def extract_keywords_batch(self, questions: list[str]) -> list[list[str]]:
+        """
+        여러 질문의 핵심 키워드를 한 번의 요청으로 추출합니다.
+        :param questions: 질문 목록
+        :return: 질문 순서와 같은 키워드 리스트 목록
+        """
+        numbered = "\n".join(f"{i}. {question}" for i, question in enumerate(questions, start=1))
+        prompt = f"""
+            너는 질문에서 중요한 핵심 키워드 구문을 추출하는 역할을 맡고 있어. 
+            질문에서 명사, 주요 동사, 중요한 개념을 조합하여 핵심 키워드 구문을 정확히 추출해줘.
+
+            아래는 몇 가지 규칙이야:
+            1. 각 질문에서 의미를 나타내는 핵심 키워드 구문 (2~3개 단어)을 추출해.
+            2. 동의어나 유사어는 하나의 키워드 구문으로 통합해.
+            3. 너무 일반적인 단어 (예: "어떻게", "할 수 있나요")는 제외해.
+            4. 가능한 한 구체적이고 의미가 분명한 키워드 구문을 선택해.
+            5. 결과는 질문 번호를 키로, 키워드 구문 리스트를 값으로 하는 JSON 객체로만 제공해.
+
+            예제:
+            1. 스마트스토어에서 상품을 등록하는 방법이 뭐에요?
+            2. 환불 정책은 어떻게 적용되나요?
+            {{"1": ["스마트스토어 상품 등록", "등록 방법"], "2": ["환불 정책", "정책 적용"]}}
+
+            {numbered}
+        """
+        response = await self.scheduler.call("keywords", lambda: self.client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"},
+            max_tokens=50 * len(questions),
+            temperature=0.5
+        ), estimate_tokens(prompt, 50 * len(questions)))
+        record_openai_usage("keywords", response.usage)
+        try:
+            parsed = json.loads(response.choices[0].message.content)
+        except (TypeError, json.JSONDecodeError):
+            parsed = {}
+        results = []
+        for i in range(1, len(questions) + 1):
+            keywords = parsed.get(str(i), [])
+            if isinstance(keywords, str):
+                keywords = keywords.split(",")
+            results.append([str(keyword).strip() for keyword in keywords if str(keyword).strip()])
+        return results
@@ -0,0 +1,131 @@
+from typing import Callable, Dict, List, Optional
+import asyncio
+import time
+from app.config import SEARCH_BATCH_WINDOW_MS, SEARCH_MAX_BATCH_SIZE
+
+class SearchBatcher:
+    """
+    짧은 시간 동안 들어온 벡터 검색 요청을 모아 다중 벡터 검색 한 번으로 처리하는 마이크로 배처.
+    블로킹 검색 함수는 스레드에서 실행하므로 이벤트 루프를 막지 않습니다.
+    """
+
+    def __init__(
+        self,
+        search_many: Callable[[List, int], List[List[Dict]]],
+        window_ms: float = SEARCH_BATCH_WINDOW_MS,
+        max_batch_size: int = SEARCH_MAX_BATCH_SIZE,
+    ):
+        """
+        :param search_many: (임베딩 목록, top_k) -> 임베딩별 검색 결과 목록 을 반환하는 블로킹 함수
+        :param window_ms: 첫 요청 이후 다른 요청을 기다리는 시간(ms)
+        :param max_batch_size: 한 번에 검색할 최대 벡터 수
+        """
+        self.search_many = search_many
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop = None
+        self._pending = set()  # 실행 중인 검색 태스크 (GC 방지)
+        # 지표
+        self.requests = 0
+        self.batches = 0
+        self.batch_size_counts: Dict[int, int] = {}
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+        self.total_search_time = 0.0
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, embedding, top_k: int) -> List[Dict]:
+        """
+        검색 요청을 배치 큐에 넣고 결과를 기다립니다.
+        :param embedding: 질의 임베딩
+        :param top_k: 검색할 개수
+        :return: 검색 결과 목록
+        """
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((embedding, top_k, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    # 시간이 지나도 이미 큐에 쌓인 요청은 함께 처리
+                    if self._queue.empty():
+                        break
+                    batch.append(self._queue.get_nowait())
+                    continue
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # 검색이 진행되는 동안에도 다음 배치를 모을 수 있도록 별도 태스크로 실행
+            task = self._loop.create_task(self._execute(batch))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _execute(self, batch):
+        dispatched = time.perf_counter()
+        for _, _, _, enqueued in batch:
+            wait = dispatched - enqueued
+            self.total_queue_wait += wait
+            self.max_queue_wait = max(self.max_queue_wait, wait)
+        self.requests += len(batch)
+        self.batches += 1
+        self.batch_size_counts[len(batch)] = self.batch_size_counts.get(len(batch), 0) + 1
+
+        embeddings = [item[0] for item in batch]
+        top_k = max(item[1] for item in batch)
+        try:
+            results = await asyncio.to_thread(self.search_many, embeddings, top_k)
+        except Exception as e:
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.total_search_time += time.perf_counter() - dispatched
+
+        # 요청별로 결과를 돌려줌 (요청마다 top_k가 다를 수 있음)
+        for (_, item_top_k, future, _), hits in zip(batch, results):
+            if not future.done():
+                future.set_result(hits[:item_top_k])
+
+    async def close(self):
+        """
+        배치 워커와 실행 중인 검색 태스크를 정리합니다.
+        """
+        tasks = [task for task in (self._worker, *self._pending) if task is not None and not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker = None
+        self._queue = None
+        self._loop = None
+
+    def get_stats(self) -> Dict:
+        """
+        배치 크기와 큐 대기 시간 지표를 반환합니다.
+        """
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+            "avg_queue_wait_ms": self.total_queue_wait / self.requests * 1000 if self.requests else 0.0,
+            "max_queue_wait_ms": self.max_queue_wait * 1000,
+            "avg_search_ms": self.total_search_time / self.batches * 1000 if self.batches else 0.0,
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+        }
@@ -0,0 +1,128 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import time
+import numpy as np
+from app.config import (
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS,
+)
+
+class SemanticCacheRepository:
+    """
+    정제된 질문의 임베딩을 기준으로 최근 답변을 재사용하는 인메모리 시맨틱 캐시.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = ANSWER_CACHE_SIMILARITY_THRESHOLD,
+        ttl_seconds: int = ANSWER_CACHE_TTL_SECONDS,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Dict]" = OrderedDict()  # 정제된 질문 -> 캐시 항목 (LRU 순서)
+        self.data_version = None  # 캐시를 채울 당시의 FAQ 컬렉션 버전
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # 유사도 계산용 임베딩 행렬 (항목이 바뀌면 다시 만듭니다)
+        self._keys: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _sync_version(self, data_version):
+        """
+        FAQ 컬렉션이 변경되었으면 캐시 전체를 무효화합니다.
+        """
+        if self.data_version != data_version:
+            if self.entries:
+                self.invalidations += 1
+            self.clear()
+            self.data_version = data_version
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        expired = [key for key, entry in self.entries.items() if now - entry["created_at"] > self.ttl_seconds]
+        for key in expired:
+            del self.entries[key]
+        if expired:
+            self._matrix = None
+
+    def lookup(self, embedding, data_version) -> Optional[Dict]:
+        """
+        유사도가 임계값 이상인 캐시 항목을 찾습니다.
+        :param embedding: 정제된 질문의 임베딩
+        :param data_version: 현재 FAQ 컬렉션 버전
+        :return: 캐시 항목 (없으면 None)
+        """
+        self._sync_version(data_version)
+        self._purge_expired()
+        if not self.entries:
+            self.misses += 1
+            return None
+
+        if self._matrix is None:
+            self._keys = list(self.entries.keys())
+            self._matrix = np.vstack([self.entries[key]["embedding"] for key in self._keys])
+
+        scores = self._matrix @ self._normalize(embedding)
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            self.misses += 1
+            return None
+
+        key = self._keys[best]
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return self.entries[key]
+
+    def store(self, question: str, embedding, related_questions: List[Dict], answer_events: List[str], answer: str, data_version):
+        """
+        스트리밍이 끝난 답변을 캐시에 저장합니다.
+        :param question: 정제된 질문
+        :param embedding: 정제된 질문의 임베딩
+        :param related_questions: 검색된 유사 질문 목록
+        :param answer_events: 클라이언트에 전송한 SSE 이벤트 목록
+        :param answer: 전체 답변 텍스트
+        :param data_version: 답변 생성 시점의 FAQ 컬렉션 버전
+        """
+        self._sync_version(data_version)
+        self.entries[question] = {
+            "embedding": self._normalize(embedding),
+            "related_questions": related_questions,
+            "answer_events": answer_events,
+            "answer": answer,
+            "created_at": time.monotonic(),
+        }
+        self.entries.move_to_end(question)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        self._matrix = None
+
+    def clear(self):
+        self.entries.clear()
+        self._matrix = None
+
+    def get_stats(self) -> Dict:
+        """
+        임계값 튜닝을 위한 캐시 적중 통계를 반환합니다.
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "similarity_threshold": self.similarity_threshold,
+        }
@@ -0,0 +1,156 @@
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+import asyncio
+import hashlib
+import json
+from app.config import STREAM_COALESCING_ENABLED
+
+_END = object()  # 스트림 종료 표시
+
+class _SharedStream:
+    """
+    하나의 상위 스트림과 그 구독자들.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.events: List[str] = []  # 지금까지 받은 메시지 (늦게 합류한 구독자에게 다시 보냄)
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.finished = False
+        self.end = _END  # 정상 종료면 _END, 실패면 예외
+        self.task: Optional[asyncio.Task] = None
+
+class StreamSubscription:
+    """
+    공유 스트림의 구독. 구독자마다 별도의 큐(버퍼)를 가지므로 느린 구독자가 다른 구독자나 상위 스트림을 막지 않습니다.
+    사용 후 close()를 호출해야 합니다. (모든 구독자가 떠나면 상위 스트림을 취소)
+    """
+
+    def __init__(self, coalescer: "StreamCoalescer", shared: _SharedStream, queue: asyncio.Queue, leader: bool):
+        self._coalescer = coalescer
+        self._shared = shared
+        self._queue = queue
+        self._closed = False
+        self.leader = leader  # 상위 스트림을 시작한 요청인지 여부 (응답 캐시 저장 등 한 번만 할 작업용)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        if self._closed:
+            raise StopAsyncIteration
+        item = await self._queue.get()
+        if item is _END:
+            self.close()
+            raise StopAsyncIteration
+        if isinstance(item, BaseException):
+            self.close()
+            raise item
+        return item
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._coalescer._unsubscribe(self._shared, self._queue)
+
+class StreamCoalescer:
+    """
+    같은 정제 질문과 FAQ 맥락으로 동시에 들어온 답변 요청을 하나의 상위 LLM 스트림으로 합칩니다. (single-flight)
+    첫 요청이 상위 스트림을 시작하고, 진행 중에 들어온 같은 요청은 이미 받은 메시지부터 이어지는 메시지까지 모두 받습니다.
+    상위 스트림은 요청과 분리된 태스크에서 읽으므로 첫 요청의 연결이 끊겨도 다른 구독자에게 계속 전달됩니다.
+    워커 프로세스 단위로 합치며, 스트림이 끝나면 목록에서 빠집니다. (끝난 답변의 재사용은 응답 캐시가 담당)
+    """
+
+    def __init__(self, open_stream: Callable[[str, str], AsyncIterator[str]], enabled: bool = STREAM_COALESCING_ENABLED):
+        """
+        :param open_stream: (정제 질문, FAQ 맥락) -> 답변 토큰 조각 비동기 이터레이터
+        :param enabled: False면 요청마다 상위 스트림을 따로 엶
+        """
+        self.open_stream = open_stream
+        self.enabled = enabled
+        self._inflight: Dict[str, _SharedStream] = {}
+        # 지표
+        self.streams = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self.max_subscribers = 0
+
+    @staticmethod
+    def make_key(question: str, context: str) -> str:
+        return hashlib.sha256(json.dumps([question, context], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def subscribe(self, question: str, context: str) -> StreamSubscription:
+        """
+        같은 요청의 진행 중인 스트림에 합류하거나, 없으면 새 상위 스트림을 시작합니다.
+        :param question: 정제된 질문
+        :param context: FAQ 맥락
+        """
+        key = self.make_key(question, context)
+        shared = self._inflight.get(key) if self.enabled else None
+        leader = shared is None
+        if leader:
+            shared = _SharedStream(key)
+            if self.enabled:
+                self._inflight[key] = shared
+            shared.task = asyncio.create_task(self._produce(shared, question, context))
+            self.streams += 1
+        else:
+            self.coalesced += 1
+
+        # 지금까지 받은 메시지를 먼저 채운 뒤 등록 (사이에 await가 없으므로 빠지거나 겹치는 메시지 없음)
+        queue: asyncio.Queue = asyncio.Queue()
+        for message in shared.events:
+            queue.put_nowait(message)
+        if shared.finished:
+            queue.put_nowait(shared.end)
+        shared.subscribers.add(queue)
+        self.max_subscribers = max(self.max_subscribers, len(shared.subscribers))
+        return StreamSubscription(self, shared, queue, leader)
+
+    async def _produce(self, shared: _SharedStream, question: str, context: str):
+        try:
+            async for message in self.open_stream(question, context):
+                shared.events.append(message)
+                for queue in shared.subscribers:
+                    queue.put_nowait(message)
+        except asyncio.CancelledError:
+            shared.end = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            shared.end = e
+        finally:
+            shared.finished = True
+            if self._inflight.get(shared.key) is shared:
+                del self._inflight[shared.key]
+            for queue in shared.subscribers:
+                queue.put_nowait(shared.end)
+
+    def _unsubscribe(self, shared: _SharedStream, queue: asyncio.Queue):
+        shared.subscribers.discard(queue)
+        if not shared.subscribers and not shared.finished:
+            # 듣는 구독자가 없으면 상위 스트림을 중단하여 토큰 비용을 아낌
+            if self._inflight.get(shared.key) is shared:
+                del self._inflight[shared.key]
+            shared.task.cancel()
+            self.cancelled += 1
+
+    async def close(self):
+        """
+        진행 중인 상위 스트림을 모두 취소합니다.
+        """
+        tasks = [shared.task for shared in self._inflight.values() if shared.task is not None and not shared.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._inflight.clear()
+
+    def get_stats(self) -> Dict:
+        requests = self.streams + self.coalesced
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._inflight),
+            "streams": self.streams,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+            "max_subscribers": self.max_subscribers,
+            "coalesce_rate": self.coalesced / requests if requests else 0.0,
+        }
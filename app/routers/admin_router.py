@@ -0,0 +1,28 @@
+import secrets
+from fastapi import APIRouter, Depends, Header, HTTPException
+from app.config import ADMIN_TOKEN, FAQ_DATA_FILE
+from app.dependencies import get_ready_faq_service
+from app.services.faq_services import FAQService
+
+# 라우터 생성
+admin_router = APIRouter()
+
+def verify_admin_token(x_admin_token: str = Header(default="")):
+    """
+    X-Admin-Token 헤더를 확인합니다. ADMIN_TOKEN이 설정되지 않았으면 관리자 API를 막습니다.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="관리자 API가 비활성화되어 있습니다.")
+    if not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="관리자 토큰이 올바르지 않습니다.")
+
+@admin_router.post("/sync", dependencies=[Depends(verify_admin_token)])
+async def sync_faqs(dry_run: bool = False, faq_service: FAQService = Depends(get_ready_faq_service)):
+    """
+    FAQ 파일과 적재 목록을 비교해 추가/변경/삭제분만 반영합니다.
+    dry_run=true 이면 변경 내역만 반환합니다.
+    """
+    result = await faq_service.sync_from_pkl(FAQ_DATA_FILE, dry_run=dry_run)
+    if result.get("skipped"):
+        raise HTTPException(status_code=409, detail="다른 워커에서 동기화가 진행 중입니다.")
+    return result
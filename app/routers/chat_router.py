@@ -1,19 +1,75 @@
-from fastapi import APIRouter, HTTPException
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from app.dependencies import get_admitted_faq_service, get_faq_service
+from app.repositories.keyword_stats_repository import to_epoch
 from app.services.faq_services import FAQService
+from app.utils.sse import with_keepalive
 
 # 라우터 생성
 chat_router = APIRouter()
 
-# FAQService 인스턴스 생성
-faq_service = FAQService()
+class ChatRequest(BaseModel):
+    question: str
+    session_id: str = ""
+
+def _stream_answer(faq_service: FAQService, question: str, session_id: str) -> StreamingResponse:
+    if not question.strip():
+        raise HTTPException(status_code=400, detail="질문을 입력해주세요.")
+    return StreamingResponse(
+        with_keepalive(faq_service.answer_question(question, session_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # 프록시 버퍼링 없이 바로 전달
+    )
+
+@chat_router.post("/", response_class=StreamingResponse)
+async def chat_post(body: ChatRequest, faq_service: FAQService = Depends(get_admitted_faq_service)):
+    """
+    Chat 엔드포인트: JSON 본문({"question": ..., "session_id": ...})의 질문에 대한 실시간 응답을 반환합니다.
+    질문이 URL(접근 로그, 프록시 캐시)에 남지 않고 길이 제한도 없으므로 이 엔드포인트를 권장합니다.
+    """
+    return _stream_answer(faq_service, body.question, body.session_id)
 
 @chat_router.get("/", response_class=StreamingResponse)
-async def chat(question: str, session_id: str = ""):
+async def chat(question: str, session_id: str = "", faq_service: FAQService = Depends(get_admitted_faq_service)):
     """
-    Chat 엔드포인트: 질문에 대한 실시간 응답을 반환합니다.
+    Chat 엔드포인트: 질문에 대한 실시간 응답을 반환합니다. (쿼리 문자열 방식, 기존 클라이언트 호환용)
     """
-    if not question:
-        raise HTTPException(status_code=400, detail="질문을 입력해주세요.")
+    return _stream_answer(faq_service, question, session_id)
+
+@chat_router.get("/stats")
+async def chat_stats(faq_service: FAQService = Depends(get_faq_service)):
+    """
+    시맨틱 캐시 적중/실패 등 내부 통계를 반환합니다.
+    """
+    return faq_service.get_stats()
 
-    return StreamingResponse(faq_service.answer_question(question, session_id), media_type="text/event-stream")
\ No newline at end of file
+@chat_router.get("/stats/keywords")
+async def keyword_stats(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=500),
+    faq_service: FAQService = Depends(get_faq_service),
+):
+    """
+    기간 안의 키워드 빈도 상위 N개를 반환합니다. (기본 기간은 최근 24시간, 시간대가 없으면 UTC)
+    """
+    if start and end and to_epoch(start, 0) >= to_epoch(end, 0):
+        raise HTTPException(status_code=400, detail="시작 시각이 끝 시각보다 앞서야 합니다.")
+    keyword_stats_repo = faq_service.keyword_stats_repo
+    if start and to_epoch(start, 0) < keyword_stats_repo.oldest_timestamp():
+        raise HTTPException(
+            status_code=422,
+            detail=f"시작 시각은 최근 {keyword_stats_repo.daily_retention_days}일(보관 기간) 이내여야 합니다.",
+        )
+    return await keyword_stats_repo.top(start, end, limit)
+
+@chat_router.get("/stats/gaps")
+async def gap_stats(limit: int = Query(20, ge=1, le=500), faq_service: FAQService = Depends(get_faq_service)):
+    """
+    보강이 필요한 질문 군집을 질문 수가 많은 순으로 N개 반환합니다. (전체 군집 수 포함)
+    """
+    gap_log_repo = faq_service.gap_log_repo
+    return {"total": await gap_log_repo.count_clusters(), "clusters": await gap_log_repo.top_clusters(limit)}
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from app.dependencies import get_faq_service
+from app.services.faq_services import FAQService
+
+# 라우터 생성
+health_router = APIRouter()
+
+@health_router.get("/healthz")
+async def healthz():
+    """
+    프로세스 생존 여부 (liveness). 외부 저장소 상태와 관계없이 응답합니다.
+    """
+    return {"status": "ok"}
+
+@health_router.get("/readyz")
+async def readyz(faq_service: FAQService = Depends(get_faq_service)):
+    """
+    트래픽을 받을 준비 여부 (readiness). 컬렉션 로드와 어휘 색인 생성이 끝나야 200을 반환합니다.
+    """
+    body = {
+        "ready": faq_service.ready,
+        "startup_seconds": faq_service.startup_seconds,
+        "error": faq_service.startup_error,
+    }
+    return JSONResponse(body, status_code=200 if faq_service.ready else 503)
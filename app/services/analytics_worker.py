@@ -0,0 +1,180 @@
+from typing import Dict, List, Optional
+import asyncio
+import time
+from app.repositories.openai_repository import OpenAIRepository
+from app.repositories.gap_log_repository import GapLogRepository
+from app.repositories.keyword_stats_repository import KeywordStatsRepository
+from app.metrics import measure_stage
+from app.config import (
+    ANALYTICS_WORKER_ENABLED,
+    ANALYTICS_QUEUE_SIZE,
+    ANALYTICS_BATCH_SIZE,
+    ANALYTICS_FLUSH_INTERVAL_SECONDS,
+    ANALYTICS_LAG_WARN_SECONDS,
+    ANALYTICS_SHUTDOWN_TIMEOUT_SECONDS,
+)
+
+class AnalyticsWorker:
+    """
+    응답 스트리밍 이후의 분석 작업(키워드 추출, 보강 필요 질문 기록)을 요청 경로 밖에서 처리하는 백그라운드 워커.
+    여러 질문을 모아 키워드 추출 프롬프트 한 번으로 처리하고, Redis 갱신은 파이프라인으로 묶어서 반영합니다.
+    비활성화하면 기존과 같이 요청 안에서 바로 처리합니다.
+    """
+    KEYWORDS = "keywords"
+    INSUFFICIENT_CONTEXT = "insufficient_context"
+
+    def __init__(
+        self,
+        openai_repo: OpenAIRepository,
+        gap_log_repo: GapLogRepository,
+        keyword_stats_repo: KeywordStatsRepository,
+        enabled: bool = ANALYTICS_WORKER_ENABLED,
+        max_queue_size: int = ANALYTICS_QUEUE_SIZE,
+        batch_size: int = ANALYTICS_BATCH_SIZE,
+        flush_interval: float = ANALYTICS_FLUSH_INTERVAL_SECONDS,
+        lag_warn_seconds: float = ANALYTICS_LAG_WARN_SECONDS,
+    ):
+        self.openai_repo = openai_repo
+        self.gap_log_repo = gap_log_repo
+        self.keyword_stats_repo = keyword_stats_repo
+        self.enabled = enabled
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lag_warn_seconds = lag_warn_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # 지표
+        self.enqueued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.lagging = 0
+        self.batches = 0
+        self.errors = 0
+        self.max_lag = 0.0
+
+    def start(self):
+        """
+        워커 태스크를 시작합니다. (이미 실행 중이면 무시)
+        """
+        if not self.enabled or (self._worker is not None and not self._worker.done()):
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = ANALYTICS_SHUTDOWN_TIMEOUT_SECONDS):
+        """
+        대기 중인 작업을 모두 처리한 뒤 워커를 종료합니다.
+        :param timeout: 대기열 처리를 기다리는 최대 시간(초)
+        """
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ 분석 작업 {self._queue.qsize()}개를 처리하지 못하고 종료합니다.")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    def _submit(self, kind: str, payload) -> bool:
+        self.start()
+        try:
+            self._queue.put_nowait((kind, payload, time.monotonic()))
+        except asyncio.QueueFull:
+            # 백프레셔: 요청 경로를 막지 않고 버림
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                print(f"⚠️ 분석 대기열이 가득 차 작업을 버렸습니다. (누적 {self.dropped}개)")
+            return False
+        self.enqueued += 1
+        return True
+
+    async def record_keywords(self, question: str):
+        """
+        질문의 키워드 추출 및 저장을 예약합니다.
+        :param question: 정제된 질문
+        """
+        if not self.enabled:
+            with measure_stage("keyword_extraction"):
+                extracted_keyword = await self.openai_repo.extract_keyword(question)
+                await self.keyword_stats_repo.record(extracted_keyword)
+            return
+        self._submit(self.KEYWORDS, question)
+
+    async def record_insufficient_context(self, question: str, embedding: List[float]):
+        """
+        유사 질문이 부족한 질문의 기록을 예약합니다.
+        :param question: 정제된 질문
+        :param embedding: 질문의 임베딩
+        """
+        if not self.enabled:
+            await self.gap_log_repo.record_many({question: embedding})
+            return
+        self._submit(self.INSUFFICIENT_CONTEXT, (question, embedding))
+
+    async def _next_batch(self) -> List:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._process(batch)
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ 분석 작업 처리 실패 ({len(batch)}개): {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _process(self, batch: List):
+        now = time.monotonic()
+        for _, _, enqueued_at in batch:
+            lag = now - enqueued_at
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.lag_warn_seconds:
+                self.lagging += 1
+
+        questions = [payload for kind, payload, _ in batch if kind == self.KEYWORDS]
+        insufficient: Dict[str, List[float]] = {
+            payload[0]: payload[1] for kind, payload, _ in batch if kind == self.INSUFFICIENT_CONTEXT
+        }
+
+        if questions:
+            # 여러 질문의 키워드를 프롬프트 한 번으로 추출하고 파이프라인 한 번으로 반영
+            with measure_stage("keyword_extraction"):
+                keyword_lists = await self.openai_repo.extract_keywords_batch(questions)
+                await self.keyword_stats_repo.record([keyword for keywords in keyword_lists for keyword in keywords])
+        if insufficient:
+            await self.gap_log_repo.record_many(insufficient)
+
+        self.processed += len(batch)
+        self.batches += 1
+
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "lagging": self.lagging,
+            "max_lag_seconds": self.max_lag,
+            "batches": self.batches,
+            "errors": self.errors,
+            "gap_log": self.gap_log_repo.get_stats(),
+        }
@@ -0,0 +1,201 @@
+from functools import lru_cache
+from typing import Dict, List, Tuple
+import re
+from app.repositories.lexical_index_repository import char_ngrams, normalize_question
+from app.config import (
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_MAX_ANSWER_TOKENS,
+    CONTEXT_DEDUP_THRESHOLD,
+    CONTEXT_TOKENIZER_ENCODING,
+)
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken이 없으면 바이트 길이 기반 근사치를 사용
+    tiktoken = None
+
+_encoding = None
+_encoding_loaded = False
+
+def _get_encoding():
+    """
+    tiktoken 인코딩을 처음 쓸 때 불러옵니다. (import 시점에 인코딩 파일을 받느라 시작이 늦어지지 않도록)
+    불러올 수 없으면 한 번만 알리고 이후에는 근사치를 사용합니다.
+    """
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if tiktoken is None:
+            print("⚠️ tiktoken이 설치되지 않아 토큰 수를 바이트 길이로 근사합니다.")
+        else:
+            try:
+                _encoding = tiktoken.get_encoding(CONTEXT_TOKENIZER_ENCODING)
+            except Exception as e:  # 인코딩 파일을 받을 수 없는 환경
+                print(f"⚠️ tiktoken 인코딩({CONTEXT_TOKENIZER_ENCODING})을 불러오지 못해 토큰 수를 바이트 길이로 근사합니다: {e}")
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """
+    텍스트의 토큰 수를 셉니다. tiktoken이 없으면 UTF-8 3바이트(한글 1자)당 1토큰으로 근사합니다.
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text.encode("utf-8")) + 2) // 3
+
+@lru_cache(maxsize=4096)
+def count_faq_tokens(text: str) -> int:
+    """
+    FAQ 질문/답변 원문의 토큰 수를 셉니다. 같은 FAQ가 여러 요청에서 반복되므로 원문 단위로만 캐시합니다.
+    (요청마다 달라지는 맥락 문자열은 캐시하지 않음)
+    """
+    return count_tokens(text)
+
+def format_faq(question: str, answer: str) -> str:
+    return f"- 질문: {question}\n  답변: {answer}"
+
+class ContextBuilder:
+    """
+    검색된 FAQ 후보로 토큰 예산 안에서 프롬프트 맥락을 구성합니다.
+    점수 순으로 정렬하고, 거의 같은 답변은 제외하며, 긴 답변은 질문과 관련된 문장만 발췌합니다.
+    build()는 공유 상태를 바꾸지 않으므로 워커 스레드에서 실행할 수 있고, 누적 지표는 record()로 따로 반영합니다.
+    """
+    SEPARATOR = "\n\n"  # FAQ 항목 구분자
+    SENTENCE_PATTERN = re.compile(r"(?<=[.!?。])\s+|(?<=다\.)|(?<=요\.)|\s+(?=\d+\)\s)|\s+(?=\d+\.\s)")
+
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET, max_answer_tokens: int = CONTEXT_MAX_ANSWER_TOKENS,
+                 dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD):
+        self.token_budget = token_budget
+        self.max_answer_tokens = max_answer_tokens
+        self.dedup_threshold = dedup_threshold
+        # 지표
+        self.requests = 0
+        self.original_tokens = 0
+        self.context_tokens = 0
+        self.duplicates_removed = 0
+        self.answers_trimmed = 0
+
+    @staticmethod
+    def _rank_key(candidate: Dict) -> float:
+        for key in ("rrf_score", "score", "lexical_score"):
+            if candidate.get(key) is not None:
+                return candidate[key]
+        return 0.0
+
+    @staticmethod
+    def _shingles(text: str) -> frozenset:
+        # 아주 긴 답변도 비교 비용이 일정하도록 앞부분만 사용
+        return frozenset(char_ngrams(normalize_question(text[:3000]), (4,)))
+
+    def _split_sentences(self, text: str) -> List[str]:
+        return [sentence.strip() for sentence in self.SENTENCE_PATTERN.split(text) if sentence and sentence.strip()]
+
+    def _trim_answer(self, question: str, answer: str, budget: int) -> str:
+        """
+        답변에서 질문과 관련도가 높은 문장만 골라 예산 안으로 줄입니다. (원래 순서 유지)
+        """
+        sentences = self._split_sentences(answer)
+        if len(sentences) <= 1:
+            return self._truncate(answer, budget)
+
+        question_grams = set(char_ngrams(normalize_question(question), (2,)))
+        scored = []
+        for index, sentence in enumerate(sentences):
+            grams = set(char_ngrams(normalize_question(sentence), (2,)))
+            overlap = len(question_grams & grams) / (len(question_grams) or 1)
+            # 첫 문장은 보통 답변의 요지이므로 가산점
+            scored.append((overlap + (0.2 if index == 0 else 0.0), index))
+
+        selected, used = [], 0
+        for _, index in sorted(scored, reverse=True):
+            tokens = count_tokens(sentences[index])
+            if used + tokens > budget:
+                continue
+            selected.append(index)
+            used += tokens
+        if not selected:
+            # 가장 관련도가 높은 문장도 예산을 넘으면 그 문장을 잘라서 사용
+            return self._truncate(sentences[max(scored)[1]], budget)
+        return " … ".join(sentences[index] for index in sorted(selected))
+
+    @staticmethod
+    def _truncate(text: str, budget: int) -> str:
+        if count_tokens(text) <= budget:
+            return text
+        # 토큰 수와 문자 수의 비율로 잘라낸 뒤 예산 안으로 들어올 때까지 줄임
+        end = max(1, int(len(text) * budget / count_tokens(text)))
+        while end > 1 and count_tokens(text[:end]) > budget:
+            end = int(end * 0.9)
+        return text[:end] + " …"
+
+    def build(self, question: str, candidates: List[Dict]) -> Tuple[str, Dict]:
+        """
+        프롬프트에 넣을 FAQ 맥락을 만듭니다. 토큰 수는 항목별 토큰 수와 구분자의 합으로 셉니다.
+        :param question: 정제된 질문
+        :param candidates: 검색된 FAQ 후보 ({"question", "answer", 점수...})
+        :return: (맥락 문자열, 요청별 통계 {"original_tokens", "context_tokens", "saved_tokens", "duplicates_removed", "answers_trimmed"})
+        """
+        ordered = sorted(candidates, key=self._rank_key, reverse=True)
+        separator_tokens = count_faq_tokens(self.SEPARATOR)
+        # 항목의 토큰 수 = 질문 머리 + 답변 (맥락 전체를 다시 인코딩하지 않고 캐시된 조각의 합으로 셈)
+        original_tokens = sum(count_faq_tokens(format_faq(c["question"], "")) + count_faq_tokens(c["answer"]) for c in ordered)
+        original_tokens += separator_tokens * max(0, len(ordered) - 1)
+
+        parts, seen, used = [], [], 0
+        duplicates_removed = answers_trimmed = 0
+        for candidate in ordered:
+            remaining = self.token_budget - used - (separator_tokens if parts else 0)
+            header_tokens = count_faq_tokens(format_faq(candidate["question"], ""))
+            if remaining - header_tokens <= 0:
+                break
+
+            shingles = self._shingles(candidate["answer"])
+            if any(len(shingles & other) / (len(shingles | other) or 1) >= self.dedup_threshold for other in seen):
+                duplicates_removed += 1
+                continue
+            seen.append(shingles)
+
+            answer = candidate["answer"]
+            answer_tokens = count_faq_tokens(answer)
+            answer_budget = min(self.max_answer_tokens, remaining - header_tokens)
+            if answer_tokens > answer_budget:
+                answer = self._trim_answer(question, answer, answer_budget)
+                answer_tokens = count_tokens(answer)  # 발췌 결과는 질문마다 달라 캐시하지 않음
+                answers_trimmed += 1
+            if parts:
+                used += separator_tokens
+            parts.append(format_faq(candidate["question"], answer))
+            used += header_tokens + answer_tokens
+
+        context = self.SEPARATOR.join(parts)
+        return context, {
+            "original_tokens": original_tokens,
+            "context_tokens": used,
+            "saved_tokens": max(0, original_tokens - used),
+            "duplicates_removed": duplicates_removed,
+            "answers_trimmed": answers_trimmed,
+        }
+
+    def record(self, stats: Dict):
+        """
+        build()가 반환한 요청별 통계를 누적 지표에 더합니다. (이벤트 루프에서 호출)
+        """
+        self.requests += 1
+        self.original_tokens += stats["original_tokens"]
+        self.context_tokens += stats["context_tokens"]
+        self.duplicates_removed += stats["duplicates_removed"]
+        self.answers_trimmed += stats["answers_trimmed"]
+
+    def get_stats(self) -> Dict:
+        saved = self.original_tokens - self.context_tokens
+        return {
+            "requests": self.requests,
+            "tokenizer": "tiktoken" if _get_encoding() is not None else "approximate",
+            "original_tokens": self.original_tokens,
+            "context_tokens": self.context_tokens,
+            "saved_tokens": saved,
+            "avg_saved_tokens": saved / self.requests if self.requests else 0.0,
+            "duplicates_removed": self.duplicates_removed,
+            "answers_trimmed": self.answers_trimmed,
+            "token_budget": self.token_budget,
+        }
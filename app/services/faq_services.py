@@ -1,99 +1,506 @@
+from typing import Dict, Optional
+import asyncio
+import json
+import logging
+import time
 from app.repositories.milvus_repository import MilvusRepository
+from app.repositories.local_vector_repository import LocalVectorRepository
 from app.repositories.openai_repository import OpenAIRepository
 from app.repositories.context_repository import ContextRepository
+from app.repositories.semantic_cache_repository import SemanticCacheRepository
+from app.repositories.manifest_repository import ManifestRepository
+from app.repositories.gap_log_repository import GapLogRepository
+from app.repositories.keyword_stats_repository import KeywordStatsRepository
+from app.repositories.corpus_repository import CorpusRepository
+from app.repositories.stream_coalescer import StreamCoalescer
+from app.services.ingestion_services import IngestionService
+from app.services.analytics_worker import AnalyticsWorker
+from app.services.context_builder import ContextBuilder
+from app.repositories.lexical_index_repository import LexicalIndexRepository, normalize_question, reciprocal_rank_fusion
+from app.utils.latency_stats import LatencyStats
+from app.utils.sse import coalesce_deltas, format_event
+from app.metrics import REGISTRY, observe_prompt_context
+from app.config import (
+    ANSWER_CACHE_ENABLED,
+    VECTOR_BACKEND,
+    LEXICAL_ENABLED,
+    SEARCH_TOP_K,
+    SPECULATIVE_RETRIEVAL_ENABLED,
+    SPECULATION_OVERLAP_THRESHOLD,
+    LOG_STREAM_SAMPLE_RATE,
+    SSE_STAGE_TIMINGS_ENABLED,
+    FAQ_DATA_FILE,
+    FAQ_CORPUS_FILE,
+    FAQ_SYNC_INTERVAL_SECONDS,
+    FAQ_SYNC_LOCK_TTL_SECONDS,
+    FAQ_INITIAL_LOAD_POLL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
 
 class FAQService:
-    def __init__(self):
+    def __init__(self, vector_repo=None, openai_repo: Optional[OpenAIRepository] = None,
+                 context_repo: Optional[ContextRepository] = None):
+        """
+        FAQService 구성 요소를 만듭니다. 외부 연결은 만들지 않으며, startup()에서 한 번만 연결합니다.
+        :param vector_repo: 벡터 저장소 (기본값은 VECTOR_BACKEND 설정에 따름)
+        :param openai_repo: OpenAI 저장소
+        :param context_repo: 세션 컨텍스트 저장소
+        """
+        # VECTOR_BACKEND=local 이면 Milvus 없이 프로세스 내 NumPy 인덱스로 검색
+        self.vector_repo = vector_repo or (LocalVectorRepository() if VECTOR_BACKEND == "local" else MilvusRepository())
+        self.openai_repo = openai_repo or OpenAIRepository()
+        self.context_repo = context_repo or ContextRepository()  # 사용자 세션 컨텍스트 관리
+        self.answer_cache = SemanticCacheRepository()  # 유사 질문 응답 캐시
+        self.lexical_index = LexicalIndexRepository()  # FAQ 제목 어휘 색인
+        self.context_builder = ContextBuilder()  # 토큰 예산 기반 FAQ 맥락 구성
+        self.stream_coalescer = StreamCoalescer(self.openai_repo.stream_answer_question)  # 동일 답변 요청의 LLM 스트림 공유
+        self.latency_stats = LatencyStats()  # 단계별 처리 시간
+        self.speculation_stats = {"attempts": 0, "hits": 0, "cancelled": 0}  # 추측 검색 적중 통계
+        self.manifest_repo = ManifestRepository()  # 적재된 FAQ 목록 (증분 동기화용)
+        self.ingestion_service = IngestionService(
+            self.vector_repo, self.openai_repo, self.lexical_index, self.manifest_repo
+        )  # 대량 데이터 적재 및 증분 동기화
+        self._sync_task: Optional[asyncio.Task] = None
+        self._synced_file_mtime: Optional[float] = None  # 마지막으로 동기화한 FAQ 파일 수정 시각
+        self._manifest_version: Optional[int] = None  # 이 워커의 어휘 색인이 반영한 적재 목록 버전
+        self.last_sync: Optional[Dict] = None
+        self.gap_log_repo = GapLogRepository()  # 보강 필요 질문 군집 기록
+        self.keyword_stats_repo = KeywordStatsRepository()  # 시간 구간별 키워드 빈도
+        self.analytics_worker = AnalyticsWorker(
+            self.openai_repo, self.gap_log_repo, self.keyword_stats_repo
+        )  # 키워드/보강 질문 백그라운드 처리
+        self.ready = False  # 컬렉션 로드와 색인 생성이 끝나 요청을 받을 수 있는지 여부
+        self.startup_error: Optional[str] = None
+        self.startup_seconds: Optional[float] = None
+        REGISTRY.register_collector(self.collect_metrics)  # 캐시/대기열 지표를 /metrics 에 노출
+
+    async def startup(self):
+        """
+        벡터 저장소 초기화와 Redis 연결을 동시에 진행하고, 데이터 적재 또는 어휘 색인 생성을 마친 뒤 준비 상태로 전환합니다.
+        """
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(
+                asyncio.to_thread(self.vector_repo.initialize),  # 블로킹 Milvus 연결/컬렉션 로드
+                self.context_repo.ping(),
+            )
+            if await asyncio.to_thread(self.is_initialized):  # 컬렉션이 비어 있는지 확인
+                print("✅ 벡터 저장소가 이미 초기화되어 있습니다. 데이터를 로드하지 않습니다.")
+                await self.build_lexical_index()  # 기존 데이터로 어휘 색인 생성
+            else:
+                await self._initial_load()  # 한 워커만 적재하고 나머지는 적재가 끝나면 어휘 색인만 생성
+            self.analytics_worker.start()  # 분석 작업 백그라운드 워커 시작
+            if FAQ_SYNC_INTERVAL_SECONDS > 0:
+                self._sync_task = asyncio.create_task(self._sync_loop())  # FAQ 파일 변경 주기 확인
+        except Exception as e:
+            self.startup_error = repr(e)
+            print(f"❌ 서비스 초기화 실패: {e}")
+            return
+        self.startup_seconds = time.perf_counter() - started
+        self.ready = True
+        print(f"✅ 서비스 준비 완료 ({self.startup_seconds:.1f}초)")
+
+    async def _reload_vector_repo(self):
+        # 로컬 인덱스는 워커마다 메모리에 올리므로 다른 워커가 저장한 스냅샷을 다시 불러옴 (Milvus는 필요 없음)
+        if isinstance(self.vector_repo, LocalVectorRepository):
+            await asyncio.to_thread(self.vector_repo.reload)
+
+    async def _initial_load(self):
+        """
+        비어 있는 벡터 저장소에 FAQ를 처음 적재합니다.
+        여러 워커가 동시에 시작해도 동기화 잠금을 얻은 워커 하나만 적재하고(중복 삽입/임베딩 호출 방지),
+        나머지 워커는 적재 목록 버전이 올라갈 때까지 기다렸다가 어휘 색인만 만듭니다.
+        적재하던 워커가 잠금을 풀지 못하고 종료되면 잠금이 만료된 뒤 기다리던 워커가 이어서 적재합니다.
+        """
+        version = await self.manifest_repo.get_version()
+        waiting = False
+        while True:
+            token = await self.manifest_repo.acquire_lock(FAQ_SYNC_LOCK_TTL_SECONDS)
+            if token is not None:
+                break
+            if not waiting:
+                waiting = True
+                print("⏳ 다른 워커가 FAQ를 적재하고 있습니다. 적재가 끝나면 어휘 색인만 만듭니다.")
+            await asyncio.sleep(FAQ_INITIAL_LOAD_POLL_SECONDS)
+            current = await self.manifest_repo.get_version()
+            if current != version:
+                await self._reload_vector_repo()
+                self._manifest_version = current
+                await self.build_lexical_index()
+                print(f"✅ 다른 워커의 FAQ 적재 반영 (버전 {current})")
+                return
+
+        try:
+            await self._reload_vector_repo()
+            if await asyncio.to_thread(self.is_initialized):
+                # 잠금을 얻기 전에 다른 워커가 적재를 마침
+                await self.build_lexical_index()
+                return
+            await self.load_and_store_pkl()  # 적재하면서 어휘 색인도 함께 갱신
+            self._manifest_version = await self.manifest_repo.bump_version()  # 기다리는 워커에 적재 완료 알림
+        finally:
+            await self.manifest_repo.release_lock(token)
+
+    async def shutdown(self):
+        """
+        백그라운드 작업을 마무리하고 Redis, 벡터 저장소, OpenAI 클라이언트 연결을 닫습니다.
+        """
+        self.ready = False
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+        await self.analytics_worker.stop()  # 남은 분석 작업 처리 후 종료
+        await self.vector_repo.search_batcher.close()
+        await self.stream_coalescer.close()
+        await self.context_repo.close()
+        await self.manifest_repo.close()
+        await self.gap_log_repo.close()
+        await self.keyword_stats_repo.close()
+        await self.openai_repo.close()
+        await asyncio.to_thread(self.vector_repo.close)
+        REGISTRY.unregister_collector(self.collect_metrics)
+
+    async def _retrieve(self, question: str, data_version, timings: Optional[Dict[str, float]] = None,
+                        speculative: bool = False) -> Dict:
         """
-        FAQService 초기화 시 Milvus 컬렉션을 초기화합니다.
+        질문의 유사 FAQ를 검색합니다. (어휘 빠른 경로 -> 임베딩 -> 응답 캐시 -> 벡터 검색 + RRF 융합)
+        :param question: 검색할 질문
+        :param data_version: 검색 시점의 FAQ 데이터 버전
+        :param timings: 요청별 단계 처리 시간(ms)을 모을 딕셔너리
+        :param speculative: 추측 검색 여부. 응답 캐시는 정제 질문으로 따로 조회하므로 건너뛰고,
+            처리 시간은 timings에만 적어 두었다가 결과를 쓸 때 _adopt_speculation에서 집계에 반영합니다.
+        :return: embedding, cached, vector_results, related_questions 를 담은 딕셔너리
         """
-        self.milvus_repo = MilvusRepository()
-        self.openai_repo = OpenAIRepository()
-        self.context_repo = ContextRepository()  # 사용자 세션 컨텍스트 관리
-        self.milvus_repo.initialize()  # Milvus 초기화
+        retrieval = {"embedding": None, "cached": None, "vector_results": None, "related_questions": []}
+        lexical_match = self.lexical_index.match(question) if LEXICAL_ENABLED else None
+        if lexical_match is not None:
+            # FAQ 제목과 (거의) 같은 질문: 임베딩 생성과 벡터 검색을 생략
+            retrieval["related_questions"] = reciprocal_rank_fusion(
+                [[lexical_match], self.lexical_index.search(question, SEARCH_TOP_K)], top_k=SEARCH_TOP_K
+            )
+            return retrieval
+
+        with self.latency_stats.measure("embed", timings, record=not speculative):
+            embedding = await self.openai_repo.generate_embedding(question)  # 질문을 임베딩으로 변환
+        if embedding is None:
+            raise ValueError("임베딩 생성에 실패했습니다.")
+        retrieval["embedding"] = embedding
+        retrieval["cached"] = self.answer_cache.lookup(embedding, data_version) if ANSWER_CACHE_ENABLED and not speculative else None
+        if retrieval["cached"] is not None:
+            return retrieval
+
+        with self.latency_stats.measure("vector_search", timings, record=not speculative):
+            vector_results = await self.vector_repo.search_async(embedding, SEARCH_TOP_K)
+        # 어휘 검색 결과와 벡터 검색 결과를 RRF로 융합
+        lexical_results = self.lexical_index.search(question, SEARCH_TOP_K) if LEXICAL_ENABLED else []
+        retrieval["vector_results"] = vector_results
+        retrieval["related_questions"] = reciprocal_rank_fusion([vector_results, lexical_results], top_k=SEARCH_TOP_K)
+        return retrieval
+
+    async def _adopt_speculation(self, retrieval: Dict, question: str, refined_question: str, data_version,
+                                 timings: Dict[str, float], speculative_timings: Dict[str, float]):
+        """
+        원 질문으로 미리 검색한 결과를 정제 질문에 맞춥니다.
+        추측 검색의 단계 처리 시간은 이때 처음 집계에 반영합니다. (버린 추측은 단계 지연 통계에 섞이지 않음)
+        검색 결과는 그대로 쓰되, 응답 캐시 조회/저장과 보강 필요 질문 기록에 쓰는 임베딩은 정제 질문의 것으로 바꿉니다.
+        (캐시 키 문장과 벡터가 어긋나지 않도록 함)
+        """
+        self.latency_stats.merge(speculative_timings, timings)
+        if retrieval["embedding"] is None:  # 어휘 빠른 경로: 임베딩 없이 처리
+            return
+        if normalize_question(question) != normalize_question(refined_question):
+            with self.latency_stats.measure("embed", timings):
+                retrieval["embedding"] = await self.openai_repo.generate_embedding(refined_question)
+        if ANSWER_CACHE_ENABLED:
+            retrieval["cached"] = self.answer_cache.lookup(retrieval["embedding"], data_version)
+
+    def _speculation_usable(self, question: str, refined_question: str) -> bool:
+        """
+        원 질문으로 미리 검색한 결과를 정제된 질문에 그대로 써도 되는지 판단합니다.
+        정제 결과가 원 질문과 같거나, 두 질문의 어휘 검색 top-k가 충분히 겹치면 사용합니다.
+        (벡터 검색을 다시 하지 않고 판단하기 위해 로컬 어휘 색인의 top-k를 비교합니다)
+        """
+        if normalize_question(question) == normalize_question(refined_question):
+            return True
+        if not LEXICAL_ENABLED:
+            return False
+        original = {q["question"] for q in self.lexical_index.search(question, SEARCH_TOP_K)}
+        refined = {q["question"] for q in self.lexical_index.search(refined_question, SEARCH_TOP_K)}
+        if not original or not refined:
+            return False
+        return len(original & refined) / len(original | refined) >= SPECULATION_OVERLAP_THRESHOLD
 
     async def answer_question(self, question: str, session_id: str = ""):
         """
         SSE 방식으로 질문에 대한 응답을 스트리밍합니다.
+        세션 ID가 없으면 새 세션을 만들고 session 이벤트로 알려줍니다. (클라이언트는 다음 요청부터 이 ID를 보냄)
+        LLM 토큰은 coalesce_deltas로 모아서 보냅니다. (keep-alive와 end 이벤트는 라우터의 with_keepalive가 붙임)
         :param session_id: 사용자 세션 ID
         :param question: 사용자가 입력한 질문
         """
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}  # 요청별 단계 처리 시간(ms)과 프롬프트 맥락 토큰 수(prompt_tokens, saved_tokens)
+        # 1. 질문 정제
+        session_context = ""
         if not session_id:
-            session_id = self.context_repo.create_session()  # 새로운 세션 생성
+            session_id = await self.context_repo.create_session()  # 새로운 세션 생성 (이전 맥락이 없으므로 조회 생략)
+            yield format_event(session_id, event="session")
+        else:
+            with self.latency_stats.measure("context_fetch", timings):
+                session_context = await self.context_repo.get_context(session_id)  # 이전 대화 맥락 가져오기
+        data_version = self.vector_repo.data_version
 
-        # 1. 질문 정제
-        session_context = self.context_repo.get_context(session_id)  # 이전 대화 맥락 가져오기
-        refined_question = await self.openai_repo.refine_question(session_context, question)
-        yield f"data: 정제된 질문: {refined_question}\n\n"
+        # 추측 실행: 정제 요청과 동시에 원 질문으로 임베딩/검색을 시작
+        # (맥락이 없으면 정제 단계가 원 질문을 그대로 반환하므로 추측할 필요가 없음)
+        speculative = None
+        speculative_timings: Dict[str, float] = {}  # 추측 결과를 쓸 때만 요청 처리 시간과 단계 지연 통계에 합침
+        if SPECULATIVE_RETRIEVAL_ENABLED and session_context:
+            speculative = asyncio.create_task(self._retrieve(question, data_version, speculative_timings, speculative=True))
+            speculative.add_done_callback(lambda task: task.cancelled() or task.exception())  # 취소된 추측의 예외 무시
 
-        # 2. Milvus에서 유사 질문 검색
-        embedding = await self.openai_repo.generate_embedding(refined_question)  # 질문을 임베딩으로 변환
-        if embedding is None:
-            raise ValueError("임베딩 생성에 실패했습니다.")
-        related_questions = self.milvus_repo.find_similar_faqs(embedding)
-        faq_context = "\n\n".join([f"- 질문: {q['question']}\n  답변: {q['answer']}" for q in related_questions])        
-        if len(related_questions) <= 5:
+        try:
+            with self.latency_stats.measure("refine", timings):
+                refined_question = await self.openai_repo.refine_question(session_context, question)
+            yield format_event(f"정제된 질문: {refined_question}")
+
+            # 2. 유사 질문 검색
+            retrieval = None
+            if speculative is not None:
+                self.speculation_stats["attempts"] += 1
+                if self._speculation_usable(question, refined_question):
+                    retrieval = await speculative
+                    await self._adopt_speculation(retrieval, question, refined_question, data_version, timings, speculative_timings)
+                    self.speculation_stats["hits"] += 1
+                else:
+                    speculative.cancel()
+                    self.speculation_stats["cancelled"] += 1
+            if retrieval is None:
+                retrieval = await self._retrieve(refined_question, data_version, timings)
+        finally:
+            if speculative is not None and not speculative.done():
+                speculative.cancel()
+
+        embedding = retrieval["embedding"]
+        cached = retrieval["cached"]
+        related_questions = retrieval["related_questions"]
+        if retrieval["vector_results"] is not None and len(retrieval["vector_results"]) <= 5:
             # 유사 질문이 부족함, 보강 필요한 질문 저장
-            self.context_repo.log_insuffiecient_context_question(refined_question, embedding)
-        for q in related_questions:
-            yield f"data: - 유사 질문: {q['question']}\n\n"
-        yield f"data: ---\n\n"
-
-        # 3. 중요도 기반 맥락 생성
-        
-        # 4. OpenAI GPT로 응답 생성
-        full_answer = ""  # 스트리밍 데이터를 저장할 변수
-        async for message in self.openai_repo.stream_answer_question(refined_question, faq_context):
-            yield message
-            # 스트리밍 데이터를 합쳐서 저장
-            if message.startswith("data: "):
-                print(f"수신된 메시지: {message[6:]}")  # 디버깅용 출력
-                full_answer += message[6:]
+            await self.analytics_worker.record_insufficient_context(refined_question, embedding)
+
+        if cached is not None:
+            # 캐시 적중: 저장된 답변을 그대로 재전송하고 LLM 호출을 생략
+            for q in cached["related_questions"]:
+                yield format_event(f"- 유사 질문: {q['question']}")
+            yield format_event("---")
+            for message in cached["answer_events"]:
+                yield message
+            full_answer = cached["answer"]
+        else:
+            for q in related_questions:
+                yield format_event(f"- 유사 질문: {q['question']}")
+            yield format_event("---")
+
+            # 3. 중요도 기반 맥락 생성 (점수 순 정렬, 중복 답변 제거, 토큰 예산 내 발췌)
+            # 토큰 계산과 중복 비교는 CPU 작업이므로 이벤트 루프를 막지 않도록 워커 스레드에서 실행
+            with self.latency_stats.measure("context_build", timings):
+                faq_context, context_stats = await asyncio.to_thread(
+                    self.context_builder.build, refined_question, related_questions
+                )
+            self.context_builder.record(context_stats)
+            observe_prompt_context(context_stats)
+            timings["prompt_tokens"] = context_stats["context_tokens"]
+            timings["saved_tokens"] = context_stats["saved_tokens"]
+
+            # 4. OpenAI GPT로 응답 생성
+            answer_parts = []  # 스트리밍 데이터를 저장할 변수
+            answer_events = []  # 캐시에 저장할 SSE 이벤트
+            log_stream = logger.isEnabledFor(logging.DEBUG)  # 토큰마다 로그 레벨을 확인하지 않도록 한 번만 확인
+            llm_started = time.perf_counter()
+            # 같은 질문/맥락으로 진행 중인 스트림이 있으면 합류하여 이미 나온 토큰부터 함께 받음
+            subscription = self.stream_coalescer.subscribe(refined_question, faq_context)
+
+            async def collect_deltas():
+                async for delta in subscription:
+                    if not answer_parts:
+                        self.latency_stats.record("llm_first_token", time.perf_counter() - llm_started, timings)
+                    answer_parts.append(delta)  # 스트리밍 데이터를 합쳐서 저장
+                    if log_stream and len(answer_parts) % LOG_STREAM_SAMPLE_RATE == 1:
+                        logger.debug("수신된 토큰 #%d: %s", len(answer_parts), delta)
+                    yield delta
+
+            try:
+                async for message in coalesce_deltas(collect_deltas()):
+                    if not answer_events:
+                        self.latency_stats.record("time_to_first_token", time.perf_counter() - started, timings)
+                    yield message
+                    answer_events.append(message)
+            finally:
+                subscription.close()
+            self.latency_stats.record("llm_total", time.perf_counter() - llm_started, timings)
+            full_answer = "".join(answer_parts)
+            logger.debug("답변 스트리밍 완료: 메시지 %d개, %d자 (합류: %s)", len(answer_events), len(full_answer), not subscription.leader)
+
+            # 합류한 요청은 같은 답변을 다시 저장하지 않음
+            if ANSWER_CACHE_ENABLED and subscription.leader and embedding is not None and full_answer.strip():
+                self.answer_cache.store(refined_question, embedding, related_questions, answer_events, full_answer, data_version)
 
         # 5. 세션 데이터 업데이트
-        self.context_repo.save_user_message(session_id, refined_question, full_answer.strip())
-        # 6. 키워드 추출 및 저장
-        extracted_keyword = await self.openai_repo.extract_keyword(refined_question)
-        self.context_repo.save_keywords(extracted_keyword)
+        with self.latency_stats.measure("session_save", timings):
+            await self.context_repo.save_user_message(session_id, refined_question, full_answer.strip())
+        # 6. 키워드 추출 및 저장 (백그라운드 워커가 모아서 처리, 처리 시간은 keyword_extraction 단계로 기록)
+        await self.analytics_worker.record_keywords(refined_question)
+        self.latency_stats.record("total", time.perf_counter() - started, timings)
+
+        if SSE_STAGE_TIMINGS_ENABLED:
+            # 클라이언트가 요청별 지연을 서버 지표와 대조할 수 있도록 단계별 처리 시간(ms)을 마지막 이벤트로 전송
+            yield format_event(json.dumps(timings), event="timings")
 
-    async def load_and_store_pkl(self, file_path: str = "final_result.pkl"):
+    @staticmethod
+    def _read_pkl(file_path: str) -> Dict[str, str]:
         import os, pickle
-        from app.utils.text_cleaning import clean_text
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"{file_path} 파일이 존재하지 않습니다.")
+        if file_path.endswith(".parquet"):
+            # 코퍼스는 질문/답변 컬럼만 읽음 (임베딩 컬럼은 읽지 않음)
+            return dict(CorpusRepository(file_path).iter_faqs())
+        with open(file_path, 'rb') as f:
+            return pickle.load(f)
+
+    async def load_and_store_pkl(self, file_path: str = FAQ_DATA_FILE, corpus_path: str = FAQ_CORPUS_FILE):
         """
-        .pkl 파일에서 데이터를 로드하고 Milvus에 저장합니다.
+        .pkl 파일에서 데이터를 로드하고 벡터 저장소에 저장합니다.
+        임베딩이 포함된 Parquet 코퍼스가 있으면 .pkl 대신 코퍼스를 배치 단위로 읽어 임베딩 API 호출 없이 적재합니다.
         :param file_path: .pkl 파일 경로
+        :param corpus_path: Parquet 코퍼스 경로
         """
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"{file_path} 파일이 존재하지 않습니다.")
+        corpus = CorpusRepository(corpus_path) if corpus_path else None
+        if corpus is not None and corpus.exists():
+            return await self.ingestion_service.ingest_corpus(corpus)
 
         # .pkl 파일 로드
-        with open(file_path, 'rb') as f:
-            data = pickle.load(f)
+        data = await asyncio.to_thread(self._read_pkl, file_path)
 
-        # Milvus 초기화
-        self.milvus_repo.initialize()
-        # self.milvus_repo.delete_all()
+        # self.vector_repo.delete_all()
 
-        # 데이터 삽입
-        for question, answer in data.items():
-            # 텍스트 클리닝
-            cleaned_question = clean_text(question)
-            cleaned_answer = clean_text(answer)
+        # 배치 단위로 존재 확인, 임베딩, 삽입 (flush는 마지막에 한 번)
+        return await self.ingestion_service.ingest(data.items(), total=len(data))
 
-            # 중복 확인
-            if self.milvus_repo.is_question_exists(cleaned_question):
-                print(f"⚠️ 이미 존재하는 질문: {cleaned_question}")
-                continue
+    async def sync_from_pkl(self, file_path: str = FAQ_DATA_FILE, dry_run: bool = False) -> Dict:
+        """
+        .pkl 파일과 적재 목록을 비교해 추가/변경/삭제분만 벡터 저장소에 반영합니다. (서비스 중단 없음)
+        :param file_path: .pkl 파일 경로
+        :param dry_run: True면 변경 내역만 반환
+        :return: 동기화 결과 요약
+        """
+        data = await asyncio.to_thread(self._read_pkl, file_path)
+        result = await self.ingestion_service.sync(data.items(), dry_run=dry_run)
+        if not dry_run and result.get("version") is not None:
+            self._manifest_version = result["version"]  # 이 워커의 색인은 동기화하면서 이미 갱신됨
+            self.answer_cache.clear()
+        if not dry_run:
+            self.last_sync = result
+        return result
+
+    async def _sync_loop(self):
+        """
+        FAQ 파일이 바뀌면 동기화하고, 다른 워커가 동기화했으면 이 워커의 어휘 색인과 응답 캐시를 갱신합니다.
+        """
+        import os
+        self._manifest_version = await self.manifest_repo.get_version()
+        while True:
+            try:
+                mtime = os.path.getmtime(FAQ_DATA_FILE) if os.path.exists(FAQ_DATA_FILE) else None
+                if mtime is not None and mtime != self._synced_file_mtime:
+                    result = await self.sync_from_pkl()
+                    if not result.get("skipped"):
+                        self._synced_file_mtime = mtime
+                version = await self.manifest_repo.get_version()
+                if version != self._manifest_version:
+                    self._manifest_version = version
+                    await self.build_lexical_index()
+                    self.answer_cache.clear()
+                    print(f"🔄 다른 워커의 FAQ 동기화 반영 (버전 {version})")
+            except Exception as e:
+                print(f"⚠️ FAQ 동기화 실패: {e}")
+            await asyncio.sleep(FAQ_SYNC_INTERVAL_SECONDS)
+
+    async def build_lexical_index(self):
+        """
+        벡터 저장소의 FAQ로 어휘 색인을 만듭니다.
+        """
+        if not LEXICAL_ENABLED:
+            return
+        await asyncio.to_thread(self.lexical_index.build, self.vector_repo.iter_faqs())
 
-            # 질문을 임베딩으로 변환
-            embedding = await self.openai_repo.generate_embedding(cleaned_question)
+    def get_stats(self):
+        """
+        서비스 내부 캐시 및 처리 통계를 반환합니다.
+        :return: 통계 딕셔너리
+        """
+        attempts = self.speculation_stats["attempts"]
+        return {
+            "answer_cache": self.answer_cache.get_stats(),
+            "embedding_cache": self.openai_repo.embedding_cache.get_stats(),
+            "vector_search": self.vector_repo.search_batcher.get_stats(),
+            "analytics_worker": self.analytics_worker.get_stats(),
+            "session_store": self.context_repo.get_stats(),
+            "stage_latency": self.latency_stats.get_stats(),
+            "prompt_context": self.context_builder.get_stats(),
+            "faq_sync": {
+                "interval_seconds": FAQ_SYNC_INTERVAL_SECONDS,
+                "manifest_version": self._manifest_version,
+                "last_sync": self.last_sync,
+            },
+            "speculation": {
+                **self.speculation_stats,
+                "enabled": SPECULATIVE_RETRIEVAL_ENABLED,
+                "hit_rate": self.speculation_stats["hits"] / attempts if attempts else 0.0,
+            },
+            "stream_coalescing": self.stream_coalescer.get_stats(),
+            "llm_scheduler": self.openai_repo.scheduler.get_stats(),
+        }
+
+    def collect_metrics(self):
+        """
+        /metrics 스크랩 시점의 캐시/대기열 지표를 (이름, 타입, 설명, 값) 형태로 반환합니다.
+        """
+        answer_cache = self.answer_cache.get_stats()
+        embedding_cache = self.openai_repo.embedding_cache.get_stats()
+        vector_search = self.vector_repo.search_batcher.get_stats()
+        analytics = self.analytics_worker.get_stats()
+        scheduler = self.openai_repo.scheduler
+        return [
+            ("answer_cache_hits_total", "counter", "Semantic answer cache hits", answer_cache["hits"]),
+            ("answer_cache_misses_total", "counter", "Semantic answer cache misses", answer_cache["misses"]),
+            ("answer_cache_entries", "gauge", "Semantic answer cache size", answer_cache["size"]),
+            ("embedding_cache_local_hits_total", "counter", "In-process embedding cache hits", embedding_cache["local_hits"]),
+            ("embedding_cache_redis_hits_total", "counter", "Redis embedding cache hits", embedding_cache["redis_hits"]),
+            ("embedding_cache_misses_total", "counter", "Embedding cache misses", embedding_cache["misses"]),
+            ("vector_search_requests_total", "counter", "Vector search requests", vector_search["requests"]),
+            ("vector_search_batches_total", "counter", "Batched vector search calls", vector_search["batches"]),
+            ("session_cache_hits_total", "counter", "Session context reads served from the worker cache", self.context_repo.local_hits),
+            ("session_redis_reads_total", "counter", "Session context reads from Redis", self.context_repo.redis_reads),
+            ("analytics_queue_depth", "gauge", "Pending analytics jobs", analytics["queue_depth"]),
+            ("analytics_dropped_total", "counter", "Analytics jobs dropped on a full queue", analytics["dropped"]),
+            ("analytics_errors_total", "counter", "Failed analytics batches", analytics["errors"]),
+            ("gap_clusters", "gauge", "Insufficient-context question clusters", analytics["gap_log"]["clusters"]),
+            ("gap_clusters_evicted_total", "counter", "Clusters evicted at the cap", analytics["gap_log"]["evicted"]),
+            ("speculation_attempts_total", "counter", "Speculative retrievals started", self.speculation_stats["attempts"]),
+            ("speculation_hits_total", "counter", "Speculative retrievals reused", self.speculation_stats["hits"]),
+            ("llm_streams_total", "counter", "Upstream answer streams started", self.stream_coalescer.streams),
+            ("llm_streams_coalesced_total", "counter", "Answer requests attached to an in-flight stream", self.stream_coalescer.coalesced),
+            ("llm_streams_in_flight", "gauge", "Upstream answer streams in flight", self.stream_coalescer.get_stats()["in_flight"]),
+            ("llm_calls_active", "gauge", "OpenAI calls holding a scheduler slot", scheduler.get_stats()["active_total"]),
+            ("llm_queue_depth", "gauge", "OpenAI calls waiting for a scheduler slot", scheduler.waiting()),
+            ("llm_queue_timeouts_total", "counter", "OpenAI calls that timed out waiting for a slot", scheduler.timeouts),
+            ("llm_retries_total", "counter", "OpenAI call retries after 429/5xx/connection errors", scheduler.retries),
+            ("llm_admission_rejected_total", "counter", "Chat requests rejected by admission control", scheduler.rejected),
+        ]
 
-            # Milvus에 데이터 삽입
-            self.milvus_repo.insert_faq(cleaned_question, cleaned_answer, embedding)
-            print(f"✅ 질문과 응답 저장 완료: {cleaned_question} -> {cleaned_answer}")
     def is_initialized(self):
         """
-        Milvus 컬렉션이 초기화되었는지 확인합니다.
+        벡터 저장소에 데이터가 적재되어 있는지 확인합니다.
         :return: 초기화 여부 (True/False)
         """
-        return not self.milvus_repo.collection.is_empty
\ No newline at end of file
+        return not self.vector_repo.is_empty()
\ No newline at end of file
@@ -0,0 +1,225 @@
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import asyncio
+import time
+from app.repositories.milvus_repository import MilvusRepository
+from app.repositories.local_vector_repository import LocalVectorRepository
+from app.repositories.openai_repository import OpenAIRepository
+from app.repositories.lexical_index_repository import LexicalIndexRepository
+from app.repositories.manifest_repository import ManifestRepository, UNKNOWN_HASH, answer_hash
+from app.repositories.corpus_repository import CorpusRepository
+from app.utils.text_cleaning import clean_text
+from app.config import INGEST_BATCH_SIZE, EMBEDDING_DIMENSIONS, EMBEDDING_MAX_CONCURRENCY, FAQ_SYNC_LOCK_TTL_SECONDS
+
+class IngestionService:
+    """
+    FAQ 데이터를 배치 단위로 벡터 저장소(Milvus 또는 로컬 인덱스)에 적재하는 스트리밍 파이프라인.
+    배치마다 존재 여부 확인 -> 누락분 임베딩 -> 컬럼 단위 삽입을 수행하고, 마지막에 한 번만 flush 합니다.
+    이미 저장된 질문은 건너뛰고 임베딩은 캐시를 거치므로, 중간에 중단되어도 다시 실행하면 이어서 적재됩니다.
+    sync()는 적재 목록(manifest)과 비교해 추가/변경/삭제분만 반영하는 증분 동기화입니다.
+    """
+
+    def __init__(self, vector_repo: Union[MilvusRepository, LocalVectorRepository], openai_repo: OpenAIRepository,
+                 lexical_index: Optional[LexicalIndexRepository] = None, manifest_repo: Optional[ManifestRepository] = None):
+        self.vector_repo = vector_repo
+        self.openai_repo = openai_repo
+        self.lexical_index = lexical_index  # 삽입 시 함께 갱신할 어휘 색인
+        self.manifest_repo = manifest_repo  # 적재된 질문 -> 답변 해시 목록
+
+    @staticmethod
+    def _batched(rows: Iterable[Tuple[str, str]], batch_size: int):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def _ingest_batch(self, batch: List[Tuple[str, str]]) -> Tuple[int, int]:
+        """
+        배치 하나를 적재합니다.
+        :param batch: (질문, 답변) 목록
+        :return: (삽입한 행 수, 건너뛴 행 수)
+        """
+        # 텍스트 클리닝 및 배치 내 중복 제거
+        cleaned = {}
+        for question, answer in batch:
+            cleaned.setdefault(clean_text(question), clean_text(answer))
+
+        # 중복 확인 (배치 단위 1회 쿼리)
+        existing = await asyncio.to_thread(self.vector_repo.existing_questions, list(cleaned))
+        if existing and self.manifest_repo is not None:
+            # 저장된 답변을 모르므로 다음 동기화에서 답변을 다시 맞추도록 표시
+            await self.manifest_repo.set_many({q: UNKNOWN_HASH for q in existing})
+        questions = [q for q in cleaned if q not in existing]
+        if not questions:
+            return 0, len(batch)
+
+        # 질문을 임베딩으로 변환 (캐시에 없는 것만 묶어서 요청)
+        embeddings = await self.openai_repo.generate_embeddings(questions)
+
+        # 벡터 저장소에 컬럼 단위로 삽입
+        answers = [cleaned[q] for q in questions]
+        await asyncio.to_thread(self.vector_repo.insert_faqs, questions, answers, embeddings)
+        if self.lexical_index is not None:
+            self.lexical_index.add_many(questions, answers)
+        if self.manifest_repo is not None:
+            await self.manifest_repo.set_many({q: answer_hash(a) for q, a in zip(questions, answers)})
+        return len(questions), len(batch) - len(questions)
+
+    async def ingest(self, rows: Iterable[Tuple[str, str]], total: Optional[int] = None,
+                     batch_size: int = INGEST_BATCH_SIZE, max_concurrency: int = EMBEDDING_MAX_CONCURRENCY):
+        """
+        (질문, 답변) 스트림을 벡터 저장소에 적재합니다.
+        :param rows: (질문, 답변) 이터러블
+        :param total: 전체 행 수 (진행률 표시용, 모르면 None)
+        :param batch_size: 배치 크기
+        :param max_concurrency: 동시에 처리할 배치 수
+        :return: 적재 결과 요약
+        """
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        processed = inserted = skipped = 0
+
+        async def run(batch):
+            nonlocal processed, inserted, skipped
+            try:
+                batch_inserted, batch_skipped = await self._ingest_batch(batch)
+            finally:
+                semaphore.release()
+            processed += len(batch)
+            inserted += batch_inserted
+            skipped += batch_skipped
+            elapsed = time.perf_counter() - started
+            progress = f"{processed}/{total}" if total else f"{processed}"
+            print(f"📦 적재 진행: {progress} (삽입 {inserted}, 건너뜀 {skipped}, {processed / elapsed:.1f} rows/s)")
+
+        tasks = []
+        for batch in self._batched(rows, batch_size):
+            # 동시에 처리 중인 배치 수를 제한하여 입력을 모두 메모리에 올리지 않음
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(run(batch)))
+        await asyncio.gather(*tasks)
+
+        await asyncio.to_thread(self.vector_repo.flush)
+        elapsed = time.perf_counter() - started
+        print(f"✅ 적재 완료: 삽입 {inserted}개, 건너뜀 {skipped}개, {elapsed:.1f}초 ({processed / elapsed if elapsed else 0:.1f} rows/s)")
+        return {"processed": processed, "inserted": inserted, "skipped": skipped, "elapsed_seconds": elapsed}
+
+    async def ingest_corpus(self, corpus: CorpusRepository, batch_size: int = INGEST_BATCH_SIZE):
+        """
+        임베딩이 포함된 Parquet 코퍼스를 레코드 배치 단위로 읽어 그대로 적재합니다. (임베딩 API 호출 없음)
+        코퍼스의 임베딩 모델이 다르거나 차원을 맞출 수 없으면 질문/답변만 읽어 다시 임베딩합니다.
+        :param corpus: 코퍼스 저장소
+        :param batch_size: 배치 크기
+        :return: 적재 결과 요약
+        """
+        meta = await asyncio.to_thread(corpus.metadata)
+        if not await asyncio.to_thread(corpus.is_compatible):
+            print(f"⚠️ 코퍼스 임베딩({meta['model']}, {meta['dimensions']}차원)이 현재 설정과 달라 다시 임베딩합니다.")
+            return await self.ingest(corpus.iter_faqs(batch_size), total=meta["count"], batch_size=batch_size)
+
+        started = time.perf_counter()
+        batches = corpus.iter_batches(batch_size, dimensions=EMBEDDING_DIMENSIONS)  # 설정 차원이 더 작으면 줄여서 적재
+        processed = inserted = 0
+        while True:
+            # Parquet 읽기(압축 해제)는 블로킹이므로 배치마다 스레드에서 실행
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                break
+            questions, answers, hashes, embeddings = batch
+            existing = await asyncio.to_thread(self.vector_repo.existing_questions, questions)
+            keep = [i for i, q in enumerate(questions) if q not in existing]
+            if keep:
+                new_questions = [questions[i] for i in keep]
+                new_answers = [answers[i] for i in keep]
+                await asyncio.to_thread(self.vector_repo.insert_faqs, new_questions, new_answers, embeddings[keep])
+                if self.lexical_index is not None:
+                    self.lexical_index.add_many(new_questions, new_answers)
+                if self.manifest_repo is not None:
+                    await self.manifest_repo.set_many({questions[i]: hashes[i] for i in keep})
+            if existing and self.manifest_repo is not None:
+                await self.manifest_repo.set_many({q: UNKNOWN_HASH for q in existing})
+            processed += len(questions)
+            inserted += len(keep)
+            print(f"📦 코퍼스 적재 진행: {processed}/{meta['count']} (삽입 {inserted})")
+
+        await asyncio.to_thread(self.vector_repo.flush)
+        elapsed = time.perf_counter() - started
+        print(f"✅ 코퍼스 적재 완료: 삽입 {inserted}개, 건너뜀 {processed - inserted}개, {elapsed:.1f}초")
+        return {"processed": processed, "inserted": inserted, "skipped": processed - inserted, "elapsed_seconds": elapsed}
+
+    async def _load_manifest(self) -> Dict[str, str]:
+        """
+        적재 목록을 가져옵니다. 목록이 없는데 저장소에 데이터가 있으면(이전 버전에서 적재) 저장소에서 한 번 만듭니다.
+        """
+        manifest = await self.manifest_repo.get_all()
+        if manifest or await asyncio.to_thread(self.vector_repo.is_empty):
+            return manifest
+        faqs = await asyncio.to_thread(lambda: list(self.vector_repo.iter_faqs()))
+        manifest = {question: answer_hash(answer) for question, answer in faqs}
+        await self.manifest_repo.set_many(manifest)
+        print(f"📋 적재 목록 생성: {len(manifest)}개")
+        return manifest
+
+    async def sync(self, rows: Iterable[Tuple[str, str]], dry_run: bool = False, batch_size: int = INGEST_BATCH_SIZE):
+        """
+        새 FAQ 데이터와 적재 목록을 비교해 바뀐 부분만 반영합니다.
+        - 새 질문: 임베딩 후 삽입
+        - 답변이 바뀐 질문: 임베딩은 그대로 두고 답변만 갱신
+        - 없어진 질문: 삭제
+        :param rows: (질문, 답변) 이터러블 (전체 데이터)
+        :param dry_run: True면 변경 내역만 계산하고 반영하지 않음
+        :param batch_size: 갱신/삭제 배치 크기
+        :return: 동기화 결과 요약
+        """
+        if self.manifest_repo is None:
+            raise ValueError("증분 동기화에는 적재 목록 저장소가 필요합니다.")
+        started = time.perf_counter()
+        desired: Dict[str, str] = {}
+        for question, answer in rows:
+            desired.setdefault(clean_text(question), clean_text(answer))
+
+        token = None if dry_run else await self.manifest_repo.acquire_lock(FAQ_SYNC_LOCK_TTL_SECONDS)
+        if not dry_run and token is None:
+            print("⚠️ 다른 워커에서 동기화가 진행 중입니다.")
+            return {"skipped": True, "reason": "locked"}
+        try:
+            manifest = await self._load_manifest()
+            added = [q for q in desired if q not in manifest]
+            changed = [q for q in desired if q in manifest and manifest[q] != answer_hash(desired[q])]
+            removed = [q for q in manifest if q not in desired]
+            summary = {"added": len(added), "changed": len(changed), "removed": len(removed), "dry_run": dry_run}
+            if dry_run:
+                return {**summary, "samples": {"added": added[:10], "changed": changed[:10], "removed": removed[:10]}}
+
+            for i in range(0, len(removed), batch_size):
+                batch = removed[i:i + batch_size]
+                await asyncio.to_thread(self.vector_repo.delete_faqs, batch)
+                if self.lexical_index is not None:
+                    self.lexical_index.remove_many(batch)
+                await self.manifest_repo.remove_many(batch)
+
+            for i in range(0, len(changed), batch_size):
+                batch = changed[i:i + batch_size]
+                answers = [desired[q] for q in batch]
+                await asyncio.to_thread(self.vector_repo.update_answers, batch, answers)
+                if self.lexical_index is not None:
+                    self.lexical_index.add_many(batch, answers)  # 이미 있는 질문은 답변만 갱신
+                await self.manifest_repo.set_many({q: answer_hash(a) for q, a in zip(batch, answers)})
+
+            if added:
+                await self.ingest(((q, desired[q]) for q in added), total=len(added))  # 마지막에 flush 포함
+            elif changed or removed:
+                await asyncio.to_thread(self.vector_repo.flush)
+            if added or changed or removed:
+                summary["version"] = await self.manifest_repo.bump_version()
+        finally:
+            if token is not None:
+                await self.manifest_repo.release_lock(token)
+
+        summary["elapsed_seconds"] = time.perf_counter() - started
+        print(f"🔄 동기화 완료: 추가 {summary['added']}개, 변경 {summary['changed']}개, 삭제 {summary['removed']}개 "
+              f"({summary['elapsed_seconds']:.1f}초)")
+        return summary
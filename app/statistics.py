@@ -1,45 +1,73 @@
 import streamlit as st
-import redis
-import json
+import requests
+from datetime import datetime, timedelta, timezone
 import plotly.express as px
 import pandas as pd
 
-# Redis 클라이언트 설정 (localhost 기준)
-redis_client = redis.Redis(host="localhost", port=6379, db=0, decode_responses=True)
+API_BASE_URL = "http://localhost:8000"
 
 st.title("FAQ 키워드 및 질문 보강 현황")
 st.subheader("Redis 기반 실시간 Bubble Chart")
 
-# Redis에서 키워드 데이터 로드
-keywords_data = redis_client.hgetall("keywords")
-insufficient_data = redis_client.hgetall("insufficient_context_questions")
+# 기간 선택 후 API에서 상위 키워드만 가져옴 (시간 구간별 sorted set을 서버에서 합산)
+range_options = {"최근 1시간": timedelta(hours=1), "최근 24시간": timedelta(days=1), "최근 7일": timedelta(days=7), "최근 30일": timedelta(days=30)}
+range_label = st.radio("기간", [*range_options, "직접 선택"], index=1, horizontal=True)
+now = datetime.now(timezone.utc).replace(second=0, microsecond=0)  # 분 단위로 맞춰 캐시가 재사용되도록 함
+if range_label == "직접 선택":
+    selected = st.date_input("날짜 범위", value=(now.date() - timedelta(days=7), now.date()))
+    if len(selected) != 2:
+        st.stop()
+    start = datetime.combine(selected[0], datetime.min.time()).astimezone(timezone.utc)
+    end = datetime.combine(selected[1] + timedelta(days=1), datetime.min.time()).astimezone(timezone.utc)
+else:
+    start, end = now - range_options[range_label], now
+keyword_limit = st.slider("표시할 키워드 수", min_value=5, max_value=100, value=30, step=5)
 
-# 키워드 데이터 처리
-keyword_list = list(keywords_data.keys())
-keyword_count = list(map(int, keywords_data.values()))
+@st.cache_data(ttl=30)
+def load_top_keywords(start: datetime, end: datetime, limit: int):
+    response = requests.get(
+        f"{API_BASE_URL}/chat/stats/keywords",
+        params={"start": start.isoformat(), "end": end.isoformat(), "limit": limit},
+        timeout=10,
+    )
+    response.raise_for_status()
+    return response.json()
 
 # 키워드 데이터프레임 생성
-df_keywords = pd.DataFrame({
-    "Keyword": keyword_list,
-    "Count": keyword_count
-})
-
-# Bubble Chart 생성
-fig = px.scatter(
-    df_keywords, 
-    x="Keyword", 
-    y="Count", 
-    size="Count", 
-    color="Keyword", 
-    size_max=100,
-    title="FAQ 키워드 빈도 (Bubble Chart)"
-)
-st.plotly_chart(fig)
-
-# 보강 필요한 질문들 출력
+df_keywords = pd.DataFrame(load_top_keywords(start, end, keyword_limit), columns=["keyword", "count"])
+df_keywords.columns = ["Keyword", "Count"]
+
+if df_keywords.empty:
+    st.write("선택한 기간에 기록된 키워드가 없습니다.")
+else:
+    # Bubble Chart 생성
+    fig = px.scatter(
+        df_keywords,
+        x="Keyword",
+        y="Count",
+        size="Count",
+        color="Keyword",
+        size_max=100,
+        title="FAQ 키워드 빈도 (Bubble Chart)"
+    )
+    st.plotly_chart(fig)
+
+# 보강 필요한 질문 군집 출력 (API에서 건수 상위 N개의 요약만 가져옴)
 st.subheader("보강 필요한 질문들")
-if insufficient_data:
-    for question, vector in insufficient_data.items():
-        st.write(f"- {question}")
+top_n = st.slider("표시할 군집 수", min_value=5, max_value=100, value=20, step=5)
+
+@st.cache_data(ttl=30)
+def load_gap_clusters(limit: int):
+    response = requests.get(f"{API_BASE_URL}/chat/stats/gaps", params={"limit": limit}, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+gaps = load_gap_clusters(top_n)
+if gaps["clusters"]:
+    st.caption(f"전체 군집 {gaps['total']}개 중 상위 {len(gaps['clusters'])}개")
+    for cluster in gaps["clusters"]:
+        with st.expander(f"{cluster['question']} ({cluster['count']}건)"):
+            for sample in cluster["samples"]:
+                st.write(f"- {sample}")
 else:
     st.write("보강이 필요한 질문이 없습니다.")
@@ -1,58 +1,277 @@
-import re
+"""
+Milvus 컬렉션의 레코드를 스트리밍으로 변환/갱신하는 유지보수 작업.
+
+이터레이터 커서로 컬렉션을 순회하며 배치마다 변환 함수를 적용하고, 바뀐 레코드만 기본 키(question) 기준으로 upsert 합니다.
+컬렉션을 비우고 다시 넣지 않으므로 작업 중에도 검색이 계속 동작하며, 메모리에는 처리 중인 배치만 올라갑니다.
+체크포인트 파일에 연속으로 끝난 마지막 기본 키를 기록하므로 중단된 작업은 --resume 으로 이어서 실행할 수 있습니다.
+이는 query_iterator가 기본 키 순서대로 배치를 반환한다는 가정에 기대므로, 배치의 첫 키가 이전 배치의 마지막 키보다
+크지 않으면 체크포인트를 더 전진시키지 않고 작업을 중단합니다.
+바뀐 답변의 해시는 배치마다 적재 목록(manifest)에 반영하고, 작업이 끝나면 적재 목록 버전을 올려
+서비스 워커들이 어휘 색인을 다시 만들고 응답 캐시를 비우게 합니다.
+
+실행 (저장소 루트에서):
+    python -m app.update_record --dry-run
+    python -m app.update_record --batch-size 200 --workers 4 --checkpoint update_record.checkpoint.json
+    python -m app.update_record --transform mypackage.transforms:fix_answer --resume
+"""
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import tempfile
+import time
 from pymilvus import connections, Collection
+from app.config import MILVUS_HOST, MILVUS_PORT, MILVUS_COLLECTION
+from app.repositories.manifest_repository import ManifestRepository, answer_hash
+from app.utils.text_cleaning import clean_text
+
+# 변환 함수: 레코드({"question", "answer", "embedding"})를 받아 바뀐 레코드를 반환 (바꿀 것이 없으면 그대로 또는 None)
+Transform = Callable[[Dict], Optional[Dict]]
 
 # Milvus 서버 연결
-def init_milvus():
-    connections.connect("default", host="localhost", port="19530")
-    collection = Collection("faq_collection")
+def init_milvus(collection_name: str = MILVUS_COLLECTION) -> Collection:
+    connections.connect("default", host=MILVUS_HOST, port=MILVUS_PORT)
+    collection = Collection(collection_name)
     collection.load()
     return collection
 
-# 텍스트 클리닝 함수 (Answer 필드 전용)
-def clean_text(text):
+def clean_answer(record: Dict) -> Dict:
+    """
+    기본 변환: Answer 필드를 클리닝합니다. (적재 시와 같은 app.utils.text_cleaning.clean_text 사용)
+    """
+    return {**record, "answer": clean_text(record["answer"])}
+
+def load_transform(path: str) -> Transform:
     """
-    Answer 필드의 텍스트를 클리닝하는 함수.
+    "모듈:함수" 형식의 경로에서 변환 함수를 불러옵니다.
     """
-    text = re.sub(r'[\x00-\x1F\x7F-\x9F\xa0]', ' ', text)  # 제어 문자 및 \xa0 제거
-    text = re.sub(r'&nbsp;|&quot;|&amp;|&lt;|&gt;', ' ', text)  # HTML 엔티티 제거
-    text = re.sub(r'위 도움말이 도움이 되었나요.*(별점[0-9]점)+.*?소중한 의견을 남겨주시면 보완하도록 노력하겠습니다.*', '', text, flags=re.DOTALL)
-    text = re.sub(r'\s+', ' ', text).strip()  # 중복된 공백 정리
-    return text
-
-# Milvus에서 Answer 필드 클리닝
-def clean_answers_in_milvus(batch_size=100):
-    collection = init_milvus()
-    
-    # 전체 데이터 개수 확인
-    total_count = collection.num_entities
-    print(f"📊 총 데이터 개수: {total_count}")
-    
-    updated_records = []
-
-    # 데이터를 batch_size 단위로 로드
-    for offset in range(0, total_count, batch_size):
-        all_data = collection.query(
-            expr="",
-            output_fields=["question", "answer", "embedding"],
-            limit=batch_size,
-            offset=offset
+    module_name, _, attr = path.partition(":")
+    if not attr:
+        raise ValueError(f"변환 함수 경로는 '모듈:함수' 형식이어야 합니다: {path}")
+    return getattr(importlib.import_module(module_name), attr)
+
+class RecordUpdateJob:
+    """
+    컬렉션 레코드를 배치 단위로 변환하여 upsert 하는 작업.
+    배치는 스레드 풀에서 병렬로 처리하되, 동시에 메모리에 올라가는 배치 수는 workers * 2 개로 제한합니다.
+    manifest_repo가 있으면 바뀐 답변의 해시를 적재 목록에 반영하고, 끝나면 적재 목록 버전을 올립니다.
+    """
+
+    def __init__(
+        self,
+        collection: Collection,
+        transform: Transform = clean_answer,
+        batch_size: int = 100,
+        workers: int = 4,
+        checkpoint_path: Optional[str] = None,
+        dry_run: bool = False,
+        sample_size: int = 20,
+        manifest_repo: Optional[ManifestRepository] = None,
+    ):
+        self.collection = collection
+        self.transform = transform
+        self.batch_size = batch_size
+        self.workers = workers
+        self.checkpoint_path = checkpoint_path
+        self.dry_run = dry_run
+        self.sample_size = sample_size
+        self.manifest_repo = manifest_repo
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 진행 상황
+        self.scanned = 0
+        self.changed = 0
+        self.upserted = 0
+        self.samples: List[Dict] = []
+        self._completed: Dict[int, str] = {}  # 끝난 배치 번호 -> 배치의 마지막 기본 키
+        self._next_checkpoint = 0  # 아직 끝나지 않은 가장 앞 배치 번호
+        self._last_pk: Optional[str] = None
+
+    def _run_async(self, coro):
+        # 작업은 스레드 기반이므로 적재 목록(asyncio Redis 클라이언트) 호출은 전용 이벤트 루프 하나에서 실행
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coro)
+
+    def close(self):
+        """
+        적재 목록 연결과 이벤트 루프를 정리합니다.
+        """
+        if self.manifest_repo is not None:
+            self._run_async(self.manifest_repo.close())
+        if self._loop is not None:
+            self._loop.close()
+            self._loop = None
+
+    def load_checkpoint(self) -> Optional[str]:
+        """
+        체크포인트에서 마지막으로 처리한 기본 키를 읽습니다.
+        """
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        self.scanned = checkpoint.get("scanned", 0)
+        self.changed = checkpoint.get("changed", 0)
+        self.upserted = checkpoint.get("upserted", 0)
+        return checkpoint.get("last_pk")
+
+    def _save_checkpoint(self):
+        if not self.checkpoint_path or self.dry_run:
+            return
+        checkpoint = {
+            "last_pk": self._last_pk,
+            "scanned": self.scanned,
+            "changed": self.changed,
+            "upserted": self.upserted,
+            "updated_at": time.time(),
+        }
+        directory = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _process_batch(self, rows: List[Dict]) -> Tuple[List[Dict], Dict[str, str]]:
+        """
+        배치를 변환하고 바뀐 레코드만 upsert 합니다.
+        :return: (바뀐 레코드의 변경 전/후 요약, 질문 -> 바뀐 답변의 해시)
+        """
+        updated, diffs = [], []
+        for row in rows:
+            new_row = self.transform(dict(row))
+            if new_row is None or new_row["question"] != row["question"]:
+                continue  # 기본 키는 바꿀 수 없으므로 무시
+            if new_row["answer"] == row["answer"] and new_row["embedding"] is row["embedding"]:
+                continue
+            updated.append(new_row)
+            diffs.append({"question": row["question"], "before": row["answer"][:80], "after": new_row["answer"][:80]})
+        if updated and not self.dry_run:
+            self.collection.upsert([
+                [row["question"] for row in updated],
+                [row["answer"] for row in updated],
+                [row["embedding"] for row in updated],
+            ])
+        return diffs, {row["question"]: answer_hash(row["answer"]) for row in updated}
+
+    def _on_batch_done(self, batch_no: int, last_pk: str, rows: int, diffs: List[Dict], hashes: Dict[str, str]):
+        self.scanned += rows
+        self.changed += len(diffs)
+        if not self.dry_run:
+            self.upserted += len(diffs)
+            if hashes and self.manifest_repo is not None:
+                # 적재 목록이 저장된 답변과 같아야 다음 증분 동기화가 변경분을 올바르게 판단함
+                self._run_async(self.manifest_repo.set_many(hashes))
+        self.samples.extend(diffs[:max(0, self.sample_size - len(self.samples))])
+        # 앞 배치가 모두 끝난 지점까지만 체크포인트를 전진 (병렬 처리로 완료 순서가 뒤바뀔 수 있음)
+        self._completed[batch_no] = last_pk
+        advanced = False
+        while self._next_checkpoint in self._completed:
+            self._last_pk = self._completed.pop(self._next_checkpoint)
+            self._next_checkpoint += 1
+            advanced = True
+        if advanced:
+            self._save_checkpoint()
+        print(f"🔧 처리 {self.scanned}개, 변경 {self.changed}개 (마지막 키: {self._last_pk})")
+
+    def run(self, resume: bool = False) -> Dict:
+        """
+        작업을 실행합니다.
+        :param resume: 체크포인트 이후부터 이어서 실행할지 여부
+        :return: 작업 결과 요약
+        """
+        started = time.perf_counter()
+        start_after = self.load_checkpoint() if resume else None
+        self._last_pk = start_after
+        expr = f"question > {json.dumps(start_after, ensure_ascii=False)}" if start_after else ""
+        iterator = self.collection.query_iterator(
+            batch_size=self.batch_size, expr=expr, output_fields=["question", "answer", "embedding"]
         )
-        
-        for record in all_data:
-            question = record["question"]
-            answer = clean_text(record["answer"])
-            embedding = record["embedding"]
-
-            updated_records.append([question, answer, embedding])
-            print(f"✅ 클리닝 완료: {question} -> {answer}")
-    
-    # 기존 데이터 삭제 (모든 데이터 삭제)
-    collection.delete(expr="question != ''")  # 모든 데이터를 삭제하는 조건식
-    
-    # 클리닝된 데이터 다시 삽입
-    collection.insert([[rec[0] for rec in updated_records], 
-                       [rec[1] for rec in updated_records], 
-                       [rec[2] for rec in updated_records]])
-    print(f"✅ 모든 Answer 필드 클리닝 완료 (총 {len(updated_records)}개)")
-
-clean_answers_in_milvus(batch_size=100)
+        pending: Dict[Future, tuple] = {}
+        batch_no = 0
+        previous_pk = start_after
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                while True:
+                    rows = iterator.next()
+                    if not rows:
+                        break
+                    rows = sorted(rows, key=lambda row: row["question"])
+                    if previous_pk is not None and rows[0]["question"] <= previous_pk:
+                        # 체크포인트("마지막 키 이후부터 재개")는 배치 사이에도 기본 키 순서가 지켜져야만 안전함
+                        raise RuntimeError(
+                            f"이터레이터가 기본 키 순서대로 배치를 반환하지 않아 체크포인트를 기록할 수 없습니다. "
+                            f"(이전 배치 마지막 키: {previous_pk}, 현재 배치 첫 키: {rows[0]['question']})"
+                        )
+                    previous_pk = rows[-1]["question"]
+                    future = executor.submit(self._process_batch, rows)
+                    pending[future] = (batch_no, rows[-1]["question"], len(rows))
+                    batch_no += 1
+                    if len(pending) >= self.workers * 2:
+                        # 처리 중인 배치 수를 제한하여 메모리 사용량을 일정하게 유지
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for finished in done:
+                            self._on_batch_done(*pending.pop(finished), *finished.result())
+                for finished in list(pending):
+                    self._on_batch_done(*pending.pop(finished), *finished.result())
+        finally:
+            iterator.close()
+
+        manifest_version = None
+        if not self.dry_run and self.upserted:
+            self.collection.flush()
+            if self.manifest_repo is not None:
+                # 버전이 바뀌면 각 워커가 어휘 색인을 다시 만들고 응답 캐시를 비움 (FAQService._sync_loop)
+                manifest_version = self._run_async(self.manifest_repo.bump_version())
+                print(f"🔄 적재 목록 버전 {manifest_version}: 워커들이 어휘 색인과 응답 캐시를 갱신합니다.")
+        elapsed = time.perf_counter() - started
+        summary = {
+            "dry_run": self.dry_run,
+            "scanned": self.scanned,
+            "changed": self.changed,
+            "upserted": self.upserted,
+            "last_pk": self._last_pk,
+            "manifest_version": manifest_version,
+            "elapsed_seconds": elapsed,
+            "samples": self.samples,
+        }
+        print(f"✅ 작업 완료: 처리 {self.scanned}개, 변경 {self.changed}개, upsert {self.upserted}개 ({elapsed:.1f}초)"
+              + (" [dry-run]" if self.dry_run else ""))
+        return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Milvus 레코드 스트리밍 변환 작업")
+    parser.add_argument("--collection", default=MILVUS_COLLECTION)
+    parser.add_argument("--transform", default="app.update_record:clean_answer", help="'모듈:함수' 형식의 변환 함수")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4, help="동시에 upsert 할 배치 수")
+    parser.add_argument("--checkpoint", default="update_record.checkpoint.json", help="체크포인트 파일 경로")
+    parser.add_argument("--resume", action="store_true", help="체크포인트 이후부터 이어서 실행")
+    parser.add_argument("--dry-run", action="store_true", help="변경 내역만 출력하고 반영하지 않음")
+    args = parser.parse_args()
+
+    job = RecordUpdateJob(
+        init_milvus(args.collection),
+        transform=load_transform(args.transform),
+        batch_size=args.batch_size,
+        workers=args.workers,
+        checkpoint_path=args.checkpoint,
+        dry_run=args.dry_run,
+        # 적재 목록은 서비스 컬렉션(MILVUS_COLLECTION)만 추적함
+        manifest_repo=ManifestRepository() if not args.dry_run and args.collection == MILVUS_COLLECTION else None,
+    )
+    try:
+        summary = job.run(resume=args.resume)
+    finally:
+        job.close()
+    if args.dry_run:
+        for sample in summary["samples"]:
+            print(f"- {sample['question']}\n  전: {sample['before']}\n  후: {sample['after']}")
+    elif args.checkpoint and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)  # 끝까지 처리했으면 체크포인트 정리
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Optional
+import time
+from app.metrics import observe_stage
+
+class LatencyStats:
+    """
+    단계별 처리 시간을 최근 N개 샘플 기준으로 집계합니다.
+    기록한 값은 /metrics 의 단계별 히스토그램에도 함께 반영됩니다.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self.samples: Dict[str, Deque[float]] = {}
+        self.counts: Dict[str, int] = {}
+
+    def record(self, stage: str, seconds: float, timings: Optional[Dict[str, float]] = None):
+        """
+        단계 처리 시간을 기록합니다.
+        :param stage: 단계 이름
+        :param seconds: 처리 시간(초)
+        :param timings: 요청별 단계 처리 시간(ms)을 모을 딕셔너리 (선택)
+        """
+        self.samples.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+        observe_stage(stage, seconds)
+        if timings is not None:
+            timings[stage] = round(seconds * 1000, 2)
+
+    @contextmanager
+    def measure(self, stage: str, timings: Optional[Dict[str, float]] = None, record: bool = True):
+        """
+        with 블록의 실행 시간을 기록합니다.
+        :param record: False면 집계와 히스토그램에는 넣지 않고 timings에만 적음 (나중에 merge()로 반영)
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            if record:
+                self.record(stage, seconds, timings)
+            elif timings is not None:
+                timings[stage] = round(seconds * 1000, 2)
+
+    def merge(self, pending: Dict[str, float], timings: Optional[Dict[str, float]] = None):
+        """
+        record=False로 모아 둔 단계 처리 시간(ms)을 집계에 반영합니다.
+        """
+        for stage, milliseconds in pending.items():
+            self.record(stage, milliseconds / 1000, timings)
+
+    @staticmethod
+    def _percentile(sorted_samples, q: float) -> float:
+        index = min(len(sorted_samples) - 1, int(round(q * (len(sorted_samples) - 1))))
+        return sorted_samples[index]
+
+    def get_stats(self) -> Dict:
+        """
+        단계별 호출 수와 최근 샘플의 평균/p50/p95/최대(ms)를 반환합니다.
+        """
+        stats = {}
+        for stage, samples in self.samples.items():
+            ordered = sorted(samples)
+            stats[stage] = {
+                "count": self.counts[stage],
+                "avg_ms": sum(ordered) / len(ordered) * 1000,
+                "p50_ms": self._percentile(ordered, 0.5) * 1000,
+                "p95_ms": self._percentile(ordered, 0.95) * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        return stats
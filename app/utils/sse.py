@@ -0,0 +1,111 @@
+from typing import AsyncIterator, Optional
+import asyncio
+import json
+import logging
+import time
+from app.config import SSE_COALESCE_INTERVAL_MS, SSE_COALESCE_MAX_BYTES, SSE_KEEPALIVE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE = ": keep-alive\n\n"
+
+def format_event(data: str, event: Optional[str] = None) -> str:
+    """
+    SSE 이벤트 하나를 만듭니다. 데이터의 줄마다 data: 필드를 붙이므로 개행이 있어도 이벤트가 나뉘지 않습니다.
+    (클라이언트는 data: 줄들을 개행으로 이어 붙여 원래 데이터를 복원)
+    SSE는 \r\n과 \r도 줄 끝으로 보므로, 나누기 전에 \n으로 맞춥니다. (\r이 data: 줄 중간에 남지 않음)
+    :param data: 이벤트 데이터
+    :param event: 이벤트 이름 (없으면 기본 message 이벤트)
+    """
+    lines = [f"event: {event}"] if event else []
+    normalized = data.replace("\r\n", "\n").replace("\r", "\n")
+    lines.extend(f"data: {line}" for line in normalized.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+def _next(iterator: AsyncIterator[str], pending: Optional[asyncio.Task]) -> asyncio.Task:
+    # 대기 시간이 지나도 진행 중인 __anext__를 취소하지 않고 다음 대기에서 이어받기 위해 태스크로 감쌈
+    return pending or asyncio.ensure_future(iterator.__anext__())
+
+async def _close(iterator: AsyncIterator[str], pending: Optional[asyncio.Task]):
+    if pending is not None and not pending.done():
+        pending.cancel()
+        await asyncio.gather(pending, return_exceptions=True)
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+async def coalesce_deltas(deltas: AsyncIterator[str], interval_ms: float = SSE_COALESCE_INTERVAL_MS,
+                          max_bytes: int = SSE_COALESCE_MAX_BYTES) -> AsyncIterator[str]:
+    """
+    LLM 토큰 조각을 모아 SSE 이벤트로 보냅니다.
+    첫 조각을 받은 뒤 interval_ms가 지나거나 모은 크기가 max_bytes를 넘으면 한 이벤트로 보내므로,
+    토큰마다 이벤트를 보낼 때의 쓰기/파싱 비용을 줄이면서 지연은 interval_ms 이내로 유지합니다.
+    :param deltas: 토큰 조각 비동기 이터레이터
+    :param interval_ms: 최대 대기 시간(ms, 0이면 조각마다 전송)
+    :param max_bytes: 최대 모을 크기(바이트)
+    """
+    if interval_ms <= 0:
+        async for delta in deltas:
+            yield format_event(delta)
+        return
+
+    iterator = deltas.__aiter__()
+    interval = interval_ms / 1000
+    buffer, size, deadline = [], 0, None
+    pending: Optional[asyncio.Task] = None
+    try:
+        while True:
+            pending = _next(iterator, pending)
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if done:
+                task, pending = pending, None
+                try:
+                    delta = task.result()
+                except StopAsyncIteration:
+                    break
+                except Exception:
+                    if buffer:  # 오류 전에 받은 토큰은 보낸 뒤 오류를 전달
+                        yield format_event("".join(buffer))
+                    raise
+                buffer.append(delta)
+                size += len(delta.encode("utf-8"))
+                if deadline is None:
+                    deadline = time.monotonic() + interval
+                if size < max_bytes and time.monotonic() < deadline:
+                    continue
+            yield format_event("".join(buffer))
+            buffer, size, deadline = [], 0, None
+        if buffer:
+            yield format_event("".join(buffer))
+    finally:
+        await _close(iterator, pending)
+
+async def with_keepalive(events: AsyncIterator[str], interval: float = SSE_KEEPALIVE_SECONDS) -> AsyncIterator[str]:
+    """
+    이벤트 사이가 interval초 이상 비면 keep-alive 주석을 보냅니다. (프록시/로드밸런서의 유휴 연결 끊김 방지)
+    오류가 나면 error 이벤트를 보내고, 스트림이 끝나면(오류 포함) end 이벤트를 보냅니다.
+    :param events: SSE 이벤트 비동기 이터레이터
+    :param interval: keep-alive 간격(초, 0이면 보내지 않음)
+    """
+    iterator = events.__aiter__()
+    pending: Optional[asyncio.Task] = None
+    try:
+        while True:
+            pending = _next(iterator, pending)
+            done, _ = await asyncio.wait({pending}, timeout=interval if interval > 0 else None)
+            if not done:
+                yield KEEPALIVE
+                continue
+            task, pending = pending, None
+            try:
+                event = task.result()
+            except StopAsyncIteration:
+                break
+            yield event
+    except Exception as e:
+        logger.exception("SSE 스트리밍 중 오류")
+        yield format_event(json.dumps({"error": type(e).__name__}), event="error")
+    finally:
+        await _close(iterator, pending)
+    yield format_event("{}", event="end")
@@ -0,0 +1,284 @@
+"""
+벡터 인덱스 설정 오프라인 평가.
+
+FAQ 코퍼스(임베딩 포함 Parquet)와 질의 목록으로 인덱스 종류(FLAT, IVF_FLAT, IVF_SQ8, IVF_PQ, HNSW),
+검색 파라미터(nprobe, ef), 임베딩 차원 조합을 평가합니다.
+정답은 원래 차원에서 정확한 전수 검색(내적) 상위 k개이며, 각 조합의 recall@k, 질의당 지연 시간, 인덱스 메모리를 보고합니다.
+줄인 차원은 코퍼스 임베딩의 앞부분을 잘라 다시 정규화해 만듭니다. (text-embedding-3 의 dimensions 옵션과 같은 결과)
+평가용 컬렉션은 faq_eval_* 이름으로 만들었다가 끝나면 삭제합니다.
+
+질의 목록 (--queries):
+- .txt: 한 줄에 질문 하나 (임베딩 API로 임베딩, 임베딩 캐시 사용, 코퍼스와 같은 모델이어야 함)
+- .parquet: 코퍼스와 같은 형식 (임베딩 컬럼 사용)
+- 생략: 코퍼스 질문 중 --num-queries 개를 표본으로 사용
+질의 임베딩이 코퍼스보다 크면 코퍼스 차원으로 잘라 다시 정규화하고, 작거나 모델이 다르면 중단합니다.
+
+실행 (저장소 루트에서):
+    python -m benchmarks.evaluate_index --queries query_log.txt --output index_eval.json
+    python -m benchmarks.evaluate_index --milvus-uri ./eval_milvus.db --index-types FLAT,IVF_FLAT --dimensions 1536,512
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, connections, utility
+
+from app.config import FAQ_CORPUS_FILE, MILVUS_HOST, MILVUS_PORT
+from app.repositories.corpus_repository import CorpusRepository, reduce_dimensions, supports_reduction
+from app.repositories.milvus_repository import SUPPORTED_INDEX_TYPES, build_index_params, build_search_params
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+def _load_corpus(path: str):
+    questions, embeddings = [], []
+    for batch_questions, _, _, batch_embeddings in CorpusRepository(path).iter_batches(1000):
+        questions.extend(batch_questions)
+        embeddings.append(batch_embeddings)
+    return questions, np.vstack(embeddings)
+
+def _match_dimensions(queries: np.ndarray, model: str, meta: Dict, source: str) -> np.ndarray:
+    """
+    질의 임베딩을 코퍼스(정답)와 같은 차원으로 맞춥니다.
+    :param model: 질의 임베딩 모델
+    :param source: 오류 메시지에 쓸 질의 출처
+    """
+    if model != meta["model"]:
+        raise ValueError(f"{source}의 임베딩 모델({model})이 코퍼스 모델({meta['model']})과 다릅니다.")
+    dimensions = queries.shape[1]
+    if dimensions < meta["dimensions"] or (dimensions > meta["dimensions"] and not supports_reduction(model)):
+        raise ValueError(f"{source}의 임베딩({dimensions}차원)을 코퍼스 차원({meta['dimensions']})에 맞출 수 없습니다.")
+    return reduce_dimensions(queries, meta["dimensions"])
+
+def _load_queries(path: Optional[str], embeddings: np.ndarray, meta: Dict, num_queries: int, seed: int) -> np.ndarray:
+    """
+    평가 질의 임베딩을 코퍼스 차원으로 불러옵니다.
+    """
+    if path is None:
+        rng = np.random.default_rng(seed)
+        return embeddings[rng.choice(len(embeddings), size=min(num_queries, len(embeddings)), replace=False)]
+    if path.endswith(".parquet"):
+        return _match_dimensions(_load_corpus(path)[1], CorpusRepository(path).metadata()["model"], meta, path)
+
+    from app.config import EMBEDDING_MODEL
+    from app.repositories.openai_repository import OpenAIRepository
+
+    with open(path, encoding="utf-8") as f:
+        texts = [line.strip() for line in f if line.strip()]
+
+    async def embed():
+        openai_repo = OpenAIRepository()
+        try:
+            return await openai_repo.generate_embeddings(texts)
+        finally:
+            await openai_repo.close()
+
+    # OpenAIRepository는 EMBEDDING_DIMENSIONS로 임베딩하므로 코퍼스 차원과 다르면 맞춤
+    return _match_dimensions(np.asarray(asyncio.run(embed()), dtype=np.float32), EMBEDDING_MODEL, meta, path)
+
+def exact_top_k(base: np.ndarray, queries: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    정확한 전수 검색(내적) 상위 k개의 행 번호를 점수 순으로 반환합니다.
+    """
+    scores = queries @ base.T
+    top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+def recall_at_k(found: List[List[int]], truth: np.ndarray) -> float:
+    top_k = truth.shape[1]
+    return statistics.fmean(len(set(ids[:top_k]) & set(expected)) / top_k for ids, expected in zip(found, truth))
+
+def estimate_index_bytes(index_type: str, params: Dict, count: int, dimensions: int) -> int:
+    """
+    인덱스 메모리 추정치 (Milvus가 세그먼트 메모리를 알려주지 않을 때 사용)
+    """
+    vectors = count * dimensions * 4
+    centroids = params.get("nlist", 0) * dimensions * 4
+    if index_type == "IVF_SQ8":
+        return count * dimensions + centroids
+    if index_type == "IVF_PQ":
+        m, nbits = params["m"], params.get("nbits", 8)
+        codebooks = m * (2 ** nbits) * (dimensions // m) * 4
+        return count * m * nbits // 8 + codebooks + centroids
+    if index_type == "HNSW":
+        return vectors + count * params["M"] * 2 * 4  # 0층 이웃 목록
+    return vectors + centroids
+
+def _latency_summary(samples: List[float]) -> Dict:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000,
+        "mean_ms": statistics.fmean(ordered) * 1000,
+    }
+
+def evaluate_numpy(base: np.ndarray, queries: np.ndarray, truth: np.ndarray, top_k: int) -> Dict:
+    """
+    프로세스 내 전수 검색 (VECTOR_BACKEND=local 과 같은 방식)
+    """
+    latencies, found = [], []
+    for query in queries:
+        started = time.perf_counter()
+        scores = base @ query
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        found.append(top[np.argsort(-scores[top])].tolist())
+        latencies.append(time.perf_counter() - started)
+    return {
+        "recall": recall_at_k(found, truth),
+        **_latency_summary(latencies),
+        "index_bytes": base.nbytes,
+        "memory_source": "exact",
+    }
+
+def evaluate_milvus(index_type: str, base: np.ndarray, queries: np.ndarray, truth: np.ndarray, top_k: int,
+                    search_sweep: List[Dict], keep: bool = False) -> List[Dict]:
+    """
+    평가용 컬렉션을 만들어 인덱스를 생성하고, 검색 파라미터마다 recall/지연 시간을 측정합니다.
+    """
+    dimensions = base.shape[1]
+    name = f"faq_eval_{index_type.lower()}_{dimensions}"
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    schema = CollectionSchema([
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True),
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=dimensions),
+    ])
+    collection = Collection(name, schema=schema)
+    try:
+        for start in range(0, len(base), 1000):
+            chunk = base[start:start + 1000]
+            collection.insert([list(range(start, start + len(chunk))), chunk])
+        collection.flush()
+
+        index_params = build_index_params(index_type, dimensions)
+        started = time.perf_counter()
+        collection.create_index(field_name="embedding", index_params=index_params)
+        utility.wait_for_index_building_complete(name)
+        build_seconds = time.perf_counter() - started
+        collection.load()
+
+        try:
+            index_bytes = sum(segment.mem_size for segment in utility.get_query_segment_info(name))
+            memory_source = "milvus"
+        except Exception:
+            index_bytes = 0
+        if not index_bytes:
+            index_bytes = estimate_index_bytes(index_type, index_params["params"], len(base), dimensions)
+            memory_source = "estimate"
+
+        results = []
+        for overrides in search_sweep:
+            search_params = build_search_params(index_type, overrides)
+            collection.search(data=[queries[0]], anns_field="embedding", param=search_params, limit=top_k)  # 워밍업
+            latencies, found = [], []
+            for query in queries:
+                started = time.perf_counter()
+                hits = collection.search(data=[query], anns_field="embedding", param=search_params, limit=top_k)[0]
+                latencies.append(time.perf_counter() - started)
+                found.append([hit.id for hit in hits])
+            results.append({
+                "index_params": index_params["params"],
+                "search_params": search_params["params"],
+                "recall": recall_at_k(found, truth),
+                **_latency_summary(latencies),
+                "build_seconds": build_seconds,
+                "index_bytes": index_bytes,
+                "memory_source": memory_source,
+            })
+        return results
+    finally:
+        if not keep:
+            collection.release()
+            utility.drop_collection(name)
+
+def search_sweep(index_type: str, nprobes: List[int], efs: List[int], top_k: int) -> List[Dict]:
+    if index_type.startswith("IVF"):
+        return [{"nprobe": nprobe} for nprobe in nprobes]
+    if index_type == "HNSW":
+        return [{"ef": max(ef, top_k)} for ef in efs]
+    return [{}]
+
+def main():
+    parser = argparse.ArgumentParser(description="벡터 인덱스 설정 recall/지연 시간/메모리 평가")
+    parser.add_argument("--corpus", default=FAQ_CORPUS_FILE, help="임베딩이 포함된 FAQ 코퍼스 (Parquet)")
+    parser.add_argument("--queries", default=None, help="질의 목록 (.txt 또는 .parquet, 생략 시 코퍼스 표본)")
+    parser.add_argument("--num-queries", type=int, default=200, help="--queries 생략 시 표본 질의 수")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--index-types", default=",".join(SUPPORTED_INDEX_TYPES))
+    parser.add_argument("--dimensions", default="", help="평가할 차원 목록 (예: 1536,512,256, 생략 시 코퍼스 차원)")
+    parser.add_argument("--nprobe", default="8,16,32", help="IVF 계열 nprobe 목록")
+    parser.add_argument("--ef", default="32,64,128", help="HNSW ef 목록")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--min-recall", type=float, default=0.95, help="추천 설정이 만족해야 할 최소 recall@k")
+    parser.add_argument("--milvus-uri", default=None, help="Milvus 주소 또는 Milvus Lite 파일 (생략 시 MILVUS_HOST/PORT)")
+    parser.add_argument("--keep-collections", action="store_true", help="평가용 컬렉션을 삭제하지 않음")
+    parser.add_argument("--output", default=None, help="결과 JSON 경로")
+    args = parser.parse_args()
+
+    meta = CorpusRepository(args.corpus).metadata()
+    _, embeddings = _load_corpus(args.corpus)
+    try:
+        queries = _load_queries(args.queries, embeddings, meta, args.num_queries, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    assert queries.shape[1] == embeddings.shape[1], f"질의 차원 {queries.shape[1]} != 코퍼스 차원 {embeddings.shape[1]}"
+    dimensions_list = _int_list(args.dimensions) or [meta["dimensions"]]
+    for dimensions in dimensions_list:
+        if dimensions > meta["dimensions"] or (dimensions < meta["dimensions"] and not supports_reduction(meta["model"])):
+            parser.error(f"{meta['model']} 코퍼스({meta['dimensions']}차원)로는 {dimensions}차원을 평가할 수 없습니다.")
+    print(f"📦 코퍼스 {len(embeddings)}개, 질의 {len(queries)}개, 정답: {meta['dimensions']}차원 전수 검색 상위 {args.top_k}개")
+
+    truth = exact_top_k(embeddings, queries, args.top_k)
+    if args.milvus_uri:
+        connections.connect("default", uri=args.milvus_uri)
+    else:
+        connections.connect("default", host=MILVUS_HOST, port=MILVUS_PORT)
+
+    results = []
+    for dimensions in dimensions_list:
+        base = reduce_dimensions(embeddings, dimensions)
+        reduced_queries = reduce_dimensions(queries, dimensions)
+        results.append({"backend": "numpy", "index_type": "EXACT", "dimensions": dimensions,
+                        **evaluate_numpy(base, reduced_queries, truth, args.top_k)})
+        for index_type in args.index_types.split(","):
+            sweep = search_sweep(index_type, _int_list(args.nprobe), _int_list(args.ef), args.top_k)
+            try:
+                rows = evaluate_milvus(index_type, base, reduced_queries, truth, args.top_k, sweep, args.keep_collections)
+            except Exception as e:
+                print(f"⚠️ {index_type} ({dimensions}차원) 평가 실패: {e}")
+                continue
+            results.extend({"backend": "milvus", "index_type": index_type, "dimensions": dimensions, **row} for row in rows)
+        print(f"✅ {dimensions}차원 평가 완료")
+    connections.disconnect("default")
+
+    print(f"\n{'backend':8} {'index':9} {'dim':>5} {'search':16} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'memory MB':>10}")
+    for row in sorted(results, key=lambda r: (r["index_bytes"], -r["recall"])):
+        search = ",".join(f"{k}={v}" for k, v in row.get("search_params", {}).items()) or "-"
+        memory = f"{row['index_bytes'] / 1e6:.1f}" + ("*" if row["memory_source"] == "estimate" else "")
+        print(f"{row['backend']:8} {row['index_type']:9} {row['dimensions']:>5} {search:16} {row['recall']:>7.3f} "
+              f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {memory:>10}")
+    print("(* 추정치)")
+
+    candidates = [row for row in results if row["recall"] >= args.min_recall]
+    recommended = min(candidates, key=lambda r: (r["index_bytes"], r["p95_ms"])) if candidates else None
+    if recommended:
+        print(f"\n✅ recall@{args.top_k} >= {args.min_recall} 중 메모리가 가장 작은 설정: "
+              f"{recommended['backend']} {recommended['index_type']} {recommended['dimensions']}차원 "
+              f"{recommended.get('search_params', {})} (recall {recommended['recall']:.3f}, p95 {recommended['p95_ms']:.2f}ms)")
+    else:
+        print(f"\n⚠️ recall@{args.top_k} >= {args.min_recall} 를 만족하는 설정이 없습니다.")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"corpus": meta, "queries": len(queries), "top_k": args.top_k, "results": results,
+                       "recommended": recommended}, f, ensure_ascii=False, indent=2)
+        print(f"✅ 결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
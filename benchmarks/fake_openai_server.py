@@ -0,0 +1,127 @@
+"""
+벤치마크용 OpenAI 호환 가짜 서버.
+
+/v1/embeddings 와 /v1/chat/completions (스트리밍 포함)를 설정한 지연 시간으로 응답합니다.
+임베딩은 문자 bigram을 해시하여 만든 결정적 벡터라서, 비슷한 문장은 비슷한 벡터를 갖습니다.
+
+단독 실행: python -m benchmarks.fake_openai_server --port 8100 --first-token-ms 300
+"""
+from dataclasses import dataclass
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import time
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+@dataclass
+class FakeOpenAIConfig:
+    embedding_latency_ms: float = 30.0  # 임베딩 요청 1회 지연
+    completion_latency_ms: float = 200.0  # 비스트리밍 completion 지연 (정제, 키워드 추출)
+    first_token_ms: float = 300.0  # 스트리밍 첫 토큰까지의 지연
+    token_interval_ms: float = 15.0  # 스트리밍 토큰 간격
+    answer_tokens: int = 80  # 스트리밍 답변 토큰 수
+    dimensions: int = 1536
+
+def fake_embedding(text: str, dimensions: int) -> list:
+    """
+    문자 bigram 해시로 결정적인 단위 벡터를 만듭니다.
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    compact = re.sub(r"\s+", "", text)
+    for i in range(max(1, len(compact) - 1)):
+        digest = hashlib.blake2b(compact[i:i + 2].encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        vector[value % dimensions] += 1.0 if value & (1 << 63) else -1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+def create_app(config: FakeOpenAIConfig) -> FastAPI:
+    app = FastAPI()
+    app.state.requests = {"embeddings": 0, "completions": 0, "streams": 0}
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        app.state.requests["embeddings"] += 1
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dimensions = body.get("dimensions") or config.dimensions
+        await asyncio.sleep(config.embedding_latency_ms / 1000)
+        tokens = sum(len(text) for text in inputs)
+        return {
+            "object": "list",
+            "model": body.get("model", "fake-embedding"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(text, dimensions)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake-chat")
+        prompt = body["messages"][-1]["content"]
+        created = int(time.time())
+
+        if body.get("stream"):
+            app.state.requests["streams"] += 1
+
+            async def stream():
+                await asyncio.sleep(config.first_token_ms / 1000)
+                for i in range(config.answer_tokens):
+                    chunk = {
+                        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {"content": f"토큰{i} "}, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                    await asyncio.sleep(config.token_interval_ms / 1000)
+                done = {
+                    "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                }
+                yield f"data: {json.dumps(done)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(stream(), media_type="text/event-stream")
+
+        app.state.requests["completions"] += 1
+        await asyncio.sleep(config.completion_latency_ms / 1000)
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            # 배치 키워드 추출: 번호가 매겨진 질문마다 키워드 하나씩
+            numbers = re.findall(r"^\s*(\d+)\. ", prompt, flags=re.MULTILINE)
+            content = json.dumps({n: [f"키워드{n}"] for n in numbers}, ensure_ascii=False)
+        else:
+            # 질문 정제: 현재 질문을 그대로 돌려줌
+            match = re.search(r"현재 질문: (.*)", prompt)
+            content = match.group(1).strip() if match else "키워드1, 키워드2"
+        return JSONResponse({
+            "id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt), "completion_tokens": len(content), "total_tokens": len(prompt) + len(content)},
+        })
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description="OpenAI 호환 가짜 서버")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--embedding-latency-ms", type=float, default=30.0)
+    parser.add_argument("--completion-latency-ms", type=float, default=200.0)
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--token-interval-ms", type=float, default=15.0)
+    parser.add_argument("--answer-tokens", type=int, default=80)
+    args = parser.parse_args()
+    uvicorn.run(create_app(FakeOpenAIConfig(
+        embedding_latency_ms=args.embedding_latency_ms,
+        completion_latency_ms=args.completion_latency_ms,
+        first_token_ms=args.first_token_ms,
+        token_interval_ms=args.token_interval_ms,
+        answer_tokens=args.answer_tokens,
+    )), host="127.0.0.1", port=args.port, log_level="warning")
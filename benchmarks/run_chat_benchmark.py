@@ -0,0 +1,305 @@
+"""
+/chat 엔드포인트 오프라인 부하 테스트.
+
+실제 OpenAI, Redis, Milvus 없이 다음 로컬 대체물로 FastAPI 앱 전체를 구동합니다.
+- OpenAI: benchmarks.fake_openai_server (지연 시간 설정 가능)
+- Redis: fakeredis (--redis-host 를 주면 로컬 Redis 사용)
+- 벡터 저장소: 임시 디렉터리의 로컬 NumPy 인덱스 (VECTOR_BACKEND=local)
+
+N개의 동시 SSE 클라이언트로 요청을 보내 TTFB, 전체 지연, 초당 이벤트 수, 서버 이벤트 루프 지연을 측정하고
+결과를 JSON으로 저장합니다. --baseline 을 주면 p95가 허용 범위를 넘게 느려졌을 때 종료 코드 1을 반환합니다.
+
+실행 (저장소 루트에서): python -m benchmarks.run_chat_benchmark --clients 20 --requests 200 --output bench_results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _summary(samples: List[float]) -> Dict:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def percentile(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": ordered[-1],
+    }
+
+class ServerThread(threading.Thread):
+    """
+    uvicorn 서버를 별도 스레드의 이벤트 루프에서 실행합니다. (클라이언트 부하와 서버 루프를 분리)
+    """
+
+    def __init__(self, app, port: int):
+        super().__init__(daemon=True)
+        import uvicorn
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+        self.loop = None
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.server.serve())
+
+    def wait_started(self, timeout: float = 600):
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("서버를 시작하지 못했습니다.")
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.join(timeout=30)
+
+class LoopLagMonitor:
+    """
+    서버 이벤트 루프에서 주기적으로 sleep 하여 예정 시각보다 늦게 깨어난 시간을 기록합니다.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self.running = True
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while self.running:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+def _load_questions(count: int, unique: bool, seed: int, hot_ratio: float = 0.0) -> List[str]:
+    from app.repositories.lexical_index_repository import strip_title_decorations
+    with open("final_result.pkl", "rb") as f:
+        titles = [strip_title_decorations(question) for question in pickle.load(f)]
+    rng = random.Random(seed)
+    hot_question = rng.choice(titles)
+    # 프로모션/장애 상황처럼 일부 요청이 같은 질문에 몰리는 경우를 재현
+    questions = [hot_question if rng.random() < hot_ratio else rng.choice(titles) for _ in range(count)]
+    if unique:
+        # 캐시와 어휘 빠른 경로를 피하기 위해 요청마다 다른 문장으로 만듦
+        questions = [f"요청 {i}번 문의입니다. {question}" for i, question in enumerate(questions)]
+    return questions
+
+def _use_fakeredis(faq_service):
+    """
+    서비스의 Redis 클라이언트를 하나의 fakeredis 서버를 공유하는 클라이언트로 교체합니다.
+    (앱 시작 전에 호출해야 startup()의 연결 확인부터 fakeredis를 사용)
+    """
+    import fakeredis
+    server = fakeredis.FakeServer()
+    faq_service.context_repo.client = fakeredis.FakeAsyncRedis(server=server)
+    faq_service.openai_repo.embedding_cache.client = fakeredis.FakeAsyncRedis(server=server)
+    faq_service.manifest_repo.client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    faq_service.gap_log_repo.client = fakeredis.FakeAsyncRedis(server=server)
+    faq_service.keyword_stats_repo.client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+
+def _wait_ready(base_url: str, timeout: float = 600):
+    """
+    /readyz 가 200을 반환할 때까지 기다립니다.
+    """
+    import httpx
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = httpx.get(f"{base_url}/readyz", timeout=5)
+            if response.status_code == 200:
+                return
+            if response.json().get("error"):
+                raise RuntimeError(f"서비스 초기화 실패: {response.json()['error']}")
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("서비스가 준비되지 않았습니다.")
+
+async def _run_client(client, base_url: str, client_id: int, questions: asyncio.Queue, results: List[Dict]):
+    session_id = f"bench-{client_id}"
+    while True:
+        try:
+            question = questions.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        started = time.perf_counter()
+        ttfb, events, error = None, 0, None
+        try:
+            async with client.stream("POST", f"{base_url}/chat/", json={"question": question, "session_id": session_id}) as response:
+                response.raise_for_status()
+                buffer, ended = "", False
+                async for chunk in response.aiter_text():
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - started
+                    # 빈 줄로 끝나는 SSE 이벤트 단위로 셈 (keep-alive 주석 제외)
+                    *frames, buffer = (buffer + chunk).split("\n\n")
+                    events += sum(1 for frame in frames if not frame.startswith(":"))
+                    ended = ended or any(frame.startswith("event: end") for frame in frames)
+                if not ended:
+                    raise RuntimeError("end 이벤트 없이 스트림이 끝났습니다.")
+        except Exception as e:
+            error = repr(e)
+        results.append({
+            "ttfb": ttfb,
+            "latency": time.perf_counter() - started,
+            "events": events,
+            "error": error,
+        })
+
+async def _drive(base_url: str, clients: int, questions: List[str]) -> Dict:
+    import httpx
+    queue: asyncio.Queue = asyncio.Queue()
+    for question in questions:
+        queue.put_nowait(question)
+    results: List[Dict] = []
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        await asyncio.gather(*[_run_client(client, base_url, i, queue, results) for i in range(clients)])
+    return {"results": results, "wall_seconds": time.perf_counter() - started}
+
+def _compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    regressions = []
+    for metric in ("ttfb_ms", "latency_ms"):
+        for stat in ("p50", "p95"):
+            before = baseline.get(metric, {}).get(stat)
+            after = current.get(metric, {}).get(stat)
+            if before and after and after > before * (1 + tolerance):
+                regressions.append(f"{metric}.{stat}: {before:.1f} -> {after:.1f}")
+    before, after = baseline.get("events_per_second"), current.get("events_per_second")
+    if before and after and after < before * (1 - tolerance):
+        regressions.append(f"events_per_second: {before:.1f} -> {after:.1f}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="/chat 오프라인 부하 테스트")
+    parser.add_argument("--clients", type=int, default=20, help="동시 SSE 클라이언트 수")
+    parser.add_argument("--requests", type=int, default=200, help="전체 요청 수")
+    parser.add_argument("--unique-questions", action="store_true", help="요청마다 다른 질문 사용 (캐시 미적중 측정)")
+    parser.add_argument("--hot-question-ratio", type=float, default=0.0, help="같은 질문 하나로 보낼 요청 비율 (0~1)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--embedding-latency-ms", type=float, default=30.0)
+    parser.add_argument("--completion-latency-ms", type=float, default=200.0)
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--token-interval-ms", type=float, default=15.0)
+    parser.add_argument("--answer-tokens", type=int, default=80)
+    parser.add_argument("--redis-host", help="fakeredis 대신 사용할 로컬 Redis 호스트")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--output", default="bench_results.json", help="결과 JSON 경로")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="허용하는 p50/p95 악화 비율")
+    args = parser.parse_args()
+
+    from benchmarks.fake_openai_server import FakeOpenAIConfig, create_app
+    fake_config = FakeOpenAIConfig(
+        embedding_latency_ms=args.embedding_latency_ms,
+        completion_latency_ms=args.completion_latency_ms,
+        first_token_ms=args.first_token_ms,
+        token_interval_ms=args.token_interval_ms,
+        answer_tokens=args.answer_tokens,
+    )
+    fake_app = create_app(fake_config)
+    fake_port, app_port = _free_port(), _free_port()
+    fake_server = ServerThread(fake_app, fake_port)
+    fake_server.start()
+    fake_server.wait_started()
+
+    # 앱 설정은 import 시점에 읽히므로 import 전에 환경 변수를 지정
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{fake_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "benchmark"
+    os.environ["VECTOR_BACKEND"] = "local"
+    os.environ["LOCAL_INDEX_DIR"] = tempfile.mkdtemp(prefix="bench-index-")
+    if args.redis_host:
+        os.environ["REDIS_HOST"] = args.redis_host
+        os.environ["REDIS_PORT"] = str(args.redis_port)
+
+    import_started = time.perf_counter()
+    from app.main import app
+    from app.services.faq_services import FAQService
+    faq_service = FAQService()
+    if not args.redis_host:
+        _use_fakeredis(faq_service)
+    app.state.faq_service = faq_service  # lifespan이 새로 만들지 않고 이 인스턴스를 사용
+    import_seconds = time.perf_counter() - import_started
+
+    app_server = ServerThread(app, app_port)
+    startup_started = time.perf_counter()
+    app_server.start()
+    app_server.wait_started()
+    _wait_ready(f"http://127.0.0.1:{app_port}")
+    startup_seconds = time.perf_counter() - startup_started
+
+    monitor = LoopLagMonitor()
+    monitor_future = asyncio.run_coroutine_threadsafe(monitor.run(), app_server.loop)
+
+    questions = _load_questions(args.requests, args.unique_questions, args.seed, args.hot_question_ratio)
+    run = asyncio.run(_drive(f"http://127.0.0.1:{app_port}", args.clients, questions))
+
+    monitor.running = False
+    monitor_future.result(timeout=5)
+    service_stats = faq_service.get_stats()
+    app_server.stop()
+    fake_server.stop()
+
+    ok = [r for r in run["results"] if r["error"] is None and r["ttfb"] is not None]
+    total_events = sum(r["events"] for r in ok)
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "import_seconds": import_seconds,
+        "startup_seconds": startup_seconds,
+        "requests": len(run["results"]),
+        "errors": len(run["results"]) - len(ok),
+        "error_samples": [r["error"] for r in run["results"] if r["error"]][:5],
+        "wall_seconds": run["wall_seconds"],
+        "requests_per_second": len(ok) / run["wall_seconds"],
+        "events_per_second": total_events / run["wall_seconds"],
+        "ttfb_ms": _summary([r["ttfb"] * 1000 for r in ok]),
+        "latency_ms": _summary([r["latency"] * 1000 for r in ok]),
+        "event_loop_lag_ms": _summary([lag * 1000 for lag in monitor.samples]),
+        "fake_openai_requests": dict(fake_app.state.requests),
+        "service_stats": service_stats,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+
+    print(f"📊 요청 {report['requests']}개 (오류 {report['errors']}개), {report['requests_per_second']:.1f} req/s, "
+          f"{report['events_per_second']:.1f} events/s")
+    for metric in ("ttfb_ms", "latency_ms", "event_loop_lag_ms"):
+        summary = report[metric]
+        if summary:
+            print(f"   {metric}: p50 {summary['p50']:.1f}, p95 {summary['p95']:.1f}, p99 {summary['p99']:.1f}, max {summary['max']:.1f}")
+    print(f"✅ 결과 저장: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = _compare(report, json.load(f), args.max_regression)
+        if regressions:
+            print("❌ 성능 회귀 감지:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print("✅ 기준 대비 성능 회귀 없음")
+
+
+if __name__ == "__main__":
+    main()
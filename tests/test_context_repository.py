@@ -0,0 +1,165 @@
+import asyncio
+import json
+import fakeredis
+import pytest
+from app.repositories import context_repository
+from app.repositories.context_repository import ContextRepository, decode_message, encode_message
+
+def run(coro):
+    return asyncio.run(coro)
+
+def make_repo(**kwargs) -> ContextRepository:
+    repo = ContextRepository(**kwargs)
+    repo.client = fakeredis.FakeAsyncRedis()
+    return repo
+
+def test_create_session_returns_unique_ids():
+    async def scenario():
+        repo = make_repo()
+        first, second = await repo.create_session(), await repo.create_session()
+        assert first.startswith("session_") and second.startswith("session_")
+        assert first != second
+        assert await repo.client.keys("*") == []  # 세션 생성은 Redis 키를 만들지 않음
+    run(scenario())
+
+def test_get_context_of_unknown_session_is_empty():
+    async def scenario():
+        repo = make_repo()
+        assert await repo.get_context("session_unknown") == ""
+    run(scenario())
+
+def test_save_user_message_keeps_sliding_window():
+    async def scenario():
+        repo = make_repo(cache_size=0)
+        session_id = await repo.create_session()
+        for i in range(ContextRepository.WINDOW_SIZE + 2):
+            await repo.save_user_message(session_id, f"질문 {i}", f"답변 {i}")
+
+        key = repo._key(session_id)
+        assert await repo.client.llen(key) == ContextRepository.WINDOW_SIZE
+        expected = [f"질문 {i}" for i in range(2, ContextRepository.WINDOW_SIZE + 2)]
+        assert await repo.get_context(session_id) == "\n".join(expected)
+        assert await repo.get_important_context(session_id) == "\n".join(expected)
+    run(scenario())
+
+def test_session_ttl_is_set_on_write_and_refreshed_on_read():
+    async def scenario():
+        repo = make_repo(ttl_seconds=100, cache_size=0)
+        await repo.save_user_message("s1", "질문", "답변")
+        key = repo._key("s1")
+        assert 0 < await repo.client.ttl(key) <= 100
+        await repo.client.expire(key, 5)
+        await repo.get_context("s1")
+        assert await repo.client.ttl(key) > 5
+    run(scenario())
+
+@pytest.mark.parametrize("mode", ["full", "summary", "digest", "none"])
+def test_encode_decode_round_trip(mode):
+    question, response = "스마트스토어 정산은 언제 되나요?", "구매확정 후 다음 영업일에 정산됩니다." * 20
+    decoded = decode_message(encode_message(question, response, mode))
+    assert decoded["question"] == question
+    if mode == "full":
+        assert decoded["response"] == response
+    elif mode == "summary":
+        assert response.startswith(decoded["response"]) and decoded["response"]
+    elif mode == "digest":
+        assert len(decoded["response"]) == 16  # 8바이트 해시의 hex
+    else:
+        assert decoded["response"] == ""
+
+def test_decode_reads_legacy_json():
+    raw = json.dumps({"question": "이전 질문", "response": "이전 답변"}, ensure_ascii=False).encode("utf-8")
+    assert decode_message(raw) == {"question": "이전 질문", "response": "이전 답변"}
+
+def test_migrate_sessions_converts_legacy_keys():
+    async def scenario():
+        repo = make_repo(ttl_seconds=100, response_mode="full", cache_size=0)
+        legacy_key = repo._key("legacy")
+        for i in range(2):
+            await repo.client.rpush(legacy_key, json.dumps({"question": f"질문 {i}", "response": f"답변 {i}"}, ensure_ascii=False))
+        await repo.save_user_message("current", "새 질문", "새 답변")
+        await repo.client.persist(repo._key("current"))
+        await repo.client.set("session_id_counter", 10)
+
+        result = await repo.migrate_sessions()
+
+        assert result == {"scanned": 2, "migrated": 1}
+        messages = await repo.client.lrange(legacy_key, 0, -1)
+        assert all(message[:1] != b"{" for message in messages)
+        assert [decode_message(message) for message in messages] == [
+            {"question": "질문 0", "response": "답변 0"},
+            {"question": "질문 1", "response": "답변 1"},
+        ]
+        assert 0 < await repo.client.ttl(legacy_key) <= 100
+        assert 0 < await repo.client.ttl(repo._key("current")) <= 100
+        assert not await repo.client.exists("session_id_counter")
+    run(scenario())
+
+def test_local_cache_sees_turns_saved_by_other_workers():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        worker_a, worker_b = make_repo(), make_repo()
+        worker_a.client = fakeredis.FakeAsyncRedis(server=server)
+        worker_b.client = fakeredis.FakeAsyncRedis(server=server)
+
+        await worker_b.save_user_message("s1", "질문 1", "답변 1")
+        assert await worker_b.get_context("s1") == "질문 1"
+        await worker_b.save_user_message("s1", "질문 2", "답변 2")
+        assert await worker_b.get_context("s1") == "질문 1\n질문 2"  # 자기 저장은 캐시에 이어서 반영
+        await worker_a.save_user_message("s1", "질문 3", "답변 3")
+
+        assert await worker_b.get_context("s1") == "질문 1\n질문 2\n질문 3"
+        assert await worker_b.get_context("s1") == "질문 1\n질문 2\n질문 3"
+        assert worker_b.local_hits == 2
+    run(scenario())
+
+def test_local_cache_hit_refreshes_ttl():
+    async def scenario():
+        repo = make_repo(ttl_seconds=100)
+        await repo.save_user_message("s1", "질문", "답변")
+        await repo.get_context("s1")
+        await repo.client.expire(repo._key("s1"), 5)
+        await repo.get_context("s1")
+        assert repo.local_hits == 1
+        assert await repo.client.ttl(repo._key("s1")) > 5
+    run(scenario())
+
+def test_migrate_sessions_keeps_turns_saved_during_migration(monkeypatch):
+    async def scenario():
+        server = fakeredis.FakeServer()
+        migrator, worker = make_repo(response_mode="full", cache_size=0), make_repo(response_mode="full", cache_size=0)
+        migrator.client = fakeredis.FakeAsyncRedis(server=server)
+        worker.client = fakeredis.FakeAsyncRedis(server=server)
+        key = migrator._key("s1")
+        await migrator.client.rpush(key, json.dumps({"question": "이전 질문", "response": "이전 답변"}, ensure_ascii=False))
+
+        # 이전 작업이 LRANGE로 읽은 뒤 다시 쓰기 전에 다른 워커가 같은 세션에 저장하는 상황을 재현
+        pending_saves = [worker.save_user_message("s1", "새 질문", "새 답변")]
+
+        def decode_then_save(raw):
+            if pending_saves:
+                asyncio.ensure_future(pending_saves.pop())
+            return decode_message(raw)
+
+        monkeypatch.setattr(context_repository, "decode_message", decode_then_save)
+
+        original_pipeline = migrator.client.pipeline
+
+        def pipeline(*args, **kwargs):
+            pipe = original_pipeline(*args, **kwargs)
+            execute = pipe.execute
+
+            async def execute_after_other_worker(*a, **k):
+                await asyncio.sleep(0.01)  # 다른 워커의 저장이 먼저 끝나도록 양보
+                return await execute(*a, **k)
+
+            pipe.execute = execute_after_other_worker
+            return pipe
+
+        migrator.client.pipeline = pipeline
+        result = await migrator.migrate_sessions()
+
+        assert result == {"scanned": 1, "migrated": 1}
+        messages = [decode_message(message) for message in await migrator.client.lrange(key, 0, -1)]
+        assert [message["question"] for message in messages] == ["이전 질문", "새 질문"]
+    run(scenario())
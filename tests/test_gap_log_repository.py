@@ -0,0 +1,61 @@
+import asyncio
+import fakeredis
+import numpy as np
+from app.repositories.gap_log_repository import GapLogRepository
+
+def run(coro):
+    return asyncio.run(coro)
+
+def make_repo(server: fakeredis.FakeServer, **kwargs) -> GapLogRepository:
+    repo = GapLogRepository(**kwargs)
+    repo.client = fakeredis.FakeAsyncRedis(server=server)
+    return repo
+
+def unit(*values) -> list:
+    vector = np.asarray(values, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+def test_workers_accumulate_into_the_same_centroid():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        worker_a, worker_b = make_repo(server), make_repo(server)
+        await worker_a.record_many({"배송 언제 와요": unit(1, 0, 0)})
+        await worker_b.record_many({"배송 얼마나 걸려요": unit(1, 0.1, 0)})
+        # a의 캐시는 b가 더한 합을 모르는 상태에서 기록함
+        await worker_a.record_many({"배송 조회": unit(1, 0, 0.1)})
+
+        clusters = await worker_a.top_clusters()
+        assert len(clusters) == 1 and clusters[0]["count"] == 3
+        assert len(clusters[0]["samples"]) == 3
+        raw = await worker_a.client.hget(GapLogRepository.CENTROIDS_KEY, clusters[0]["id"])
+        expected = np.sum([unit(1, 0, 0), unit(1, 0.1, 0), unit(1, 0, 0.1)], axis=0)
+        assert np.allclose(np.frombuffer(raw, dtype=np.float32), expected, atol=1e-6)
+    run(scenario())
+
+def test_concurrent_batches_are_not_lost():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        workers = [make_repo(server) for _ in range(4)]
+        await workers[0].record_many({"환불 문의": unit(0, 1, 0)})
+        await asyncio.gather(*[
+            worker.record_many({f"환불 문의 {i}-{j}": unit(0, 1, 0.01 * j) for j in range(3)})
+            for i, worker in enumerate(workers)
+        ])
+
+        clusters = await workers[0].top_clusters()
+        assert len(clusters) == 1 and clusters[0]["count"] == 13
+        raw = await workers[0].client.hget(GapLogRepository.CENTROIDS_KEY, clusters[0]["id"])
+        assert np.frombuffer(raw, dtype=np.float32)[1] > 12.9  # 단위 벡터 13개의 합
+    run(scenario())
+
+def test_eviction_keeps_cluster_count_under_limit():
+    async def scenario():
+        repo = make_repo(fakeredis.FakeServer(), max_clusters=2)
+        await repo.record_many({"배송": unit(1, 0, 0), "환불": unit(0, 1, 0)})
+        await repo.record_many({"배송 문의": unit(1, 0, 0)})
+        await repo.record_many({"포인트": unit(0, 0, 1)})
+        assert await repo.client.hlen(GapLogRepository.CENTROIDS_KEY) == 2
+        assert await repo.count_clusters() == 2
+        assert [c["question"] for c in await repo.top_clusters()] == ["배송", "포인트"]
+        assert repo.get_stats()["evicted"] == 1
+    run(scenario())
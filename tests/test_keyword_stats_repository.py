@@ -0,0 +1,73 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+import fakeredis
+from app.repositories.keyword_stats_repository import DAY, HOUR, KeywordStatsRepository, to_epoch
+
+NOW = 1_750_000_000.0  # 기준 시각 (UTC 정시가 아님)
+
+def run(coro):
+    return asyncio.run(coro)
+
+def make_repo(**kwargs) -> KeywordStatsRepository:
+    repo = KeywordStatsRepository(**kwargs)
+    repo.client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    return repo
+
+def at(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+def test_keyword_counts_are_recorded():
+    async def scenario():
+        repo = make_repo()
+        await repo.record(["배송", "환불", "배송"])
+        await repo.record(["배송"])
+        assert await repo.top(limit=2) == [{"keyword": "배송", "count": 3}, {"keyword": "환불", "count": 1}]
+    run(scenario())
+
+def test_top_counts_only_buckets_inside_the_range():
+    async def scenario():
+        repo = make_repo()
+        now = time.time()
+        await repo.record(["배송"], timestamp=now - 2 * HOUR)
+        await repo.record(["환불", "환불"], timestamp=now - 3 * DAY)
+        assert await repo.top(start=at(now - 5 * HOUR)) == [{"keyword": "배송", "count": 1}]
+        assert await repo.top(start=at(now - 5 * DAY)) == [{"keyword": "환불", "count": 2}, {"keyword": "배송", "count": 1}]
+        assert await repo.top(start=at(now - 5 * DAY), end=at(now - 2 * DAY)) == [{"keyword": "환불", "count": 2}]
+        assert await repo.client.keys("keywords:tmp:*") == []  # 합친 임시 키는 남지 않음
+    run(scenario())
+
+def test_plan_keys_uses_day_buckets_for_whole_days():
+    repo = make_repo()
+    day = int(NOW // DAY) - 3
+    keys = repo._plan_keys(day * DAY - 2 * HOUR, (day + 1) * DAY + HOUR, now=NOW)
+    hour_keys = lambda hours: [f"{KeywordStatsRepository.HOUR_PREFIX}:{h}" for h in hours]
+    assert keys == (
+        hour_keys([day * 24 - 2, day * 24 - 1])
+        + [f"{KeywordStatsRepository.DAY_PREFIX}:{day}"]
+        + hour_keys([(day + 1) * 24])
+    )
+
+def test_plan_keys_falls_back_to_day_buckets_past_hourly_retention():
+    repo = make_repo(hourly_retention_hours=24)
+    day = int(NOW // DAY) - 5
+    keys = repo._plan_keys(day * DAY + 5 * HOUR, day * DAY + 7 * HOUR, now=NOW)
+    assert keys == [f"{KeywordStatsRepository.DAY_PREFIX}:{day}"]
+
+def test_plan_keys_clamps_start_to_daily_retention():
+    repo = make_repo(hourly_retention_hours=48, daily_retention_days=30)
+    keys = repo._plan_keys(to_epoch(datetime(1, 1, 1), 0), NOW, now=NOW)
+    assert len(keys) <= 30 + 1 + 48
+    assert keys[0] == f"{KeywordStatsRepository.DAY_PREFIX}:{int(NOW // DAY) - 30}"
+
+def test_plan_keys_caps_end_at_now():
+    repo = make_repo()
+    keys = repo._plan_keys(NOW - HOUR, NOW + 365 * DAY, now=NOW)
+    assert keys == [f"{KeywordStatsRepository.HOUR_PREFIX}:{h}" for h in (int(NOW // HOUR) - 1, int(NOW // HOUR))]
+
+def test_top_with_unbounded_start_reads_only_retained_buckets():
+    async def scenario():
+        repo = make_repo(daily_retention_days=3)
+        await repo.record(["배송"])
+        assert await repo.top(start=datetime(1, 1, 1)) == [{"keyword": "배송", "count": 1}]
+    run(scenario())
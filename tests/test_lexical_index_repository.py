@@ -0,0 +1,43 @@
+from app.repositories.lexical_index_repository import LexicalIndexRepository
+
+FAQS = [("배송비는 얼마인가요", "기본 배송비는 3000원입니다."), ("환불은 어떻게 하나요", "구매 내역에서 환불을 신청합니다.")]
+
+def questions(index: LexicalIndexRepository):
+    return sorted(doc["question"] for doc in index._state.docs if doc is not None)
+
+def test_build_replaces_index():
+    index = LexicalIndexRepository()
+    index.add_many(["예전 질문"], ["예전 답변"])
+    index.build(FAQS)
+    assert questions(index) == ["배송비는 얼마인가요", "환불은 어떻게 하나요"]
+    assert index.match("배송비는 얼마인가요")["answer"] == "기본 배송비는 3000원입니다."
+
+def test_changes_made_during_build_survive_the_swap():
+    index = LexicalIndexRepository()
+
+    def faqs_with_concurrent_changes():
+        yield FAQS[0]
+        # build가 도는 동안 이벤트 루프에서 적재/삭제/답변 갱신이 들어온 상황
+        index.add_many(["포인트 적립 기준", "배송비는 얼마인가요"], ["결제 금액의 1%입니다.", "배송비는 무료입니다."])
+        index.remove_many(["환불은 어떻게 하나요"])
+        yield FAQS[1]
+
+    index.build(faqs_with_concurrent_changes())
+    assert questions(index) == ["배송비는 얼마인가요", "포인트 적립 기준"]
+    assert index.match("배송비는 얼마인가요")["answer"] == "배송비는 무료입니다."
+    assert not index._build_logs
+
+def test_failed_build_keeps_current_index():
+    index = LexicalIndexRepository()
+    index.build(FAQS)
+
+    def broken():
+        yield FAQS[0]
+        raise RuntimeError("저장소 읽기 실패")
+
+    try:
+        index.build(broken())
+    except RuntimeError:
+        pass
+    assert questions(index) == ["배송비는 얼마인가요", "환불은 어떻게 하나요"]
+    assert not index._build_logs
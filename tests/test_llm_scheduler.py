@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+from app.repositories.llm_scheduler import LLMOverloadedError, LLMScheduler
+
+def run(coro):
+    return asyncio.run(coro)
+
+def make_scheduler(**kwargs) -> LLMScheduler:
+    options = {"max_concurrency": 1, "limits": {}, "tokens_per_minute": 0, "queue_timeout": 1.0}
+    options.update(kwargs)
+    return LLMScheduler(**options)
+
+def test_waiter_cancelled_after_handoff_returns_the_slot():
+    async def scenario():
+        scheduler = make_scheduler(tokens_per_minute=1000)
+        entered = []
+
+        async def waiter():
+            async with scheduler.slot("answer", estimated_tokens=100):
+                entered.append(True)
+
+        async with scheduler.slot("answer", estimated_tokens=100):
+            task = asyncio.create_task(waiter())
+            await asyncio.sleep(0)  # 대기열에 들어감
+            assert scheduler.waiting() == 1
+        # 슬롯 반납 시 _dispatch가 대기 호출에 슬롯을 넘겼지만 태스크는 아직 재개되지 않음
+        assert scheduler.get_stats()["active_total"] == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert not entered
+        assert scheduler.get_stats()["active_total"] == 0
+        assert scheduler._tokens > 1000 - 200  # 취소된 호출의 추정 토큰은 돌려받음
+        async with scheduler.slot("answer"):  # 슬롯이 새지 않았으므로 바로 얻음
+            pass
+    run(scenario())
+
+def test_waiter_cancelled_while_queued_leaves_the_queue():
+    async def scenario():
+        scheduler = make_scheduler()
+        async with scheduler.slot("answer"):
+            task = asyncio.create_task(scheduler.slot("answer").__aenter__())
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert scheduler.waiting() == 0
+        assert scheduler.get_stats()["active_total"] == 0
+    run(scenario())
+
+def test_queue_timeout_raises_overloaded():
+    async def scenario():
+        scheduler = make_scheduler(queue_timeout=0.05)
+        async with scheduler.slot("answer"):
+            with pytest.raises(LLMOverloadedError):
+                async with scheduler.slot("answer"):
+                    pass
+        assert scheduler.timeouts == 1
+        assert scheduler.get_stats()["active_total"] == 0
+    run(scenario())
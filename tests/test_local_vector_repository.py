@@ -0,0 +1,27 @@
+from app.repositories.local_vector_repository import LocalVectorRepository
+
+def make_repo(index_dir) -> LocalVectorRepository:
+    repo = LocalVectorRepository(index_dir=str(index_dir), dimensions=2)
+    repo.initialize()
+    return repo
+
+def answers(repo: LocalVectorRepository) -> dict:
+    return dict(repo.iter_faqs())
+
+def test_answer_update_survives_newer_snapshot_from_another_worker(tmp_path):
+    worker_a = make_repo(tmp_path)
+    worker_a.insert_faqs(["배송"], ["3일 걸립니다."], [[1.0, 0.0]])
+    worker_a.flush()
+    worker_b = make_repo(tmp_path)
+
+    worker_b.update_answers(["배송"], ["2일 걸립니다."])
+    # b가 flush하기 전에 a가 더 새 스냅샷을 씀
+    worker_a.insert_faqs(["환불"], ["7일 이내 가능합니다."], [[0.0, 1.0]])
+    worker_a.flush()
+    worker_b.reload(force=True)
+    assert answers(worker_b) == {"배송": "2일 걸립니다.", "환불": "7일 이내 가능합니다."}
+
+    worker_b.flush()
+    worker_a.reload(force=True)
+    assert answers(worker_a) == {"배송": "2일 걸립니다.", "환불": "7일 이내 가능합니다."}
+    assert worker_b._pending_answers == {}
@@ -0,0 +1,11 @@
+import pytest
+from app.utils.sse import format_event
+
+def test_format_event_splits_lines_into_data_fields():
+    assert format_event("a\nb", event="message") == "event: message\ndata: a\ndata: b\n\n"
+
+@pytest.mark.parametrize("data", ["a\r\nb", "a\rb", "a\nb"])
+def test_format_event_normalizes_line_endings(data):
+    event = format_event(data)
+    assert event == "data: a\ndata: b\n\n"
+    assert "\r" not in event
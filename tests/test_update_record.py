@@ -0,0 +1,45 @@
+import json
+import pytest
+from app.update_record import RecordUpdateJob
+
+class FakeIterator:
+    def __init__(self, batches):
+        self.batches = list(batches)
+
+    def next(self):
+        return self.batches.pop(0) if self.batches else []
+
+    def close(self):
+        pass
+
+class FakeCollection:
+    def __init__(self, batches):
+        self.batches = batches
+        self.upserted = []
+
+    def query_iterator(self, batch_size, expr, output_fields):
+        return FakeIterator(self.batches)
+
+    def upsert(self, columns):
+        self.upserted.extend(columns[1])
+
+    def flush(self):
+        pass
+
+def row(question: str, answer: str = "답변&nbsp;입니다.") -> dict:
+    return {"question": question, "answer": answer, "embedding": [0.0]}
+
+def test_checkpoint_follows_key_order(tmp_path):
+    checkpoint = tmp_path / "checkpoint.json"
+    collection = FakeCollection([[row("b"), row("a")], [row("d"), row("c")]])
+    summary = RecordUpdateJob(collection, batch_size=2, workers=1, checkpoint_path=str(checkpoint)).run()
+    assert summary["upserted"] == 4 and collection.upserted == ["답변 입니다."] * 4
+    assert json.loads(checkpoint.read_text())["last_pk"] == "d"
+
+def test_out_of_order_batches_stop_before_checkpoint_passes_them(tmp_path):
+    checkpoint = tmp_path / "checkpoint.json"
+    collection = FakeCollection([[row("c"), row("d")], [row("a"), row("e")]])
+    job = RecordUpdateJob(collection, batch_size=2, workers=1, checkpoint_path=str(checkpoint))
+    with pytest.raises(RuntimeError):
+        job.run()
+    assert job._last_pk in (None, "d")